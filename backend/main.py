@@ -20,7 +20,7 @@ ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
-from routers import system, context_menu, disk, downloads, playback, cleanup, image_gallery, ffmpeg
+from routers import system, context_menu, disk, downloads, playback, cleanup, image_gallery, ffmpeg, tasks
 
 # ── 本地安全 Token ──────────────────────────────────────────────────────────
 # 启动时生成，Electron 主进程通过环境变量读取后注入前端
@@ -84,6 +84,7 @@ app.include_router(playback.router,      prefix="/api/playback",     tags=["play
 app.include_router(cleanup.router,       prefix="/api/cleanup",      tags=["cleanup"])
 app.include_router(image_gallery.router, prefix="/api/gallery",      tags=["gallery"])
 app.include_router(ffmpeg.router,        prefix="/api/ffmpeg",       tags=["ffmpeg"])
+app.include_router(tasks.router,         prefix="/api/tasks",        tags=["tasks"])
 
 
 # ── 本地文件代理（供播放器使用）──────────────────────────────────────────────
@@ -1,4 +1,4 @@
-from routers import system, context_menu, disk, downloads, playback, cleanup, image_gallery, ffmpeg
+from routers import system, context_menu, disk, downloads, playback, cleanup, image_gallery, ffmpeg, tasks
 
 __all__ = [
     "system",
@@ -9,4 +9,5 @@ __all__ = [
     "cleanup",
     "image_gallery",
     "ffmpeg",
+    "tasks",
 ]
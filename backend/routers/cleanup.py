@@ -1,29 +1,43 @@
 import asyncio
 import os
-import shutil
 import sys
-import uuid
-from typing import List, Optional
+import threading
+import time
+from functools import partial
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, WebSocket
 from pydantic import BaseModel
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
-from core.cleanup_rules import CleanupScanner, get_all_cleanup_rules
-from core.disk_cleanup_diagnosis import diagnose_c_drive, run_cleanup_diagnosis_action
+from core.artifact_scan import load_artifact_scan_settings, save_artifact_scan_settings
+from core.cleanup_rules import CleanupScanner, ScanCache, get_all_cleanup_rules
+from core.delete_engine import DeleteEngine, DeleteResult
+from core.disk_cleanup_diagnosis import (clear_diagnosis_cache, diagnose_c_drive, is_diagnosis_action,
+                                         run_cleanup_diagnosis_action)
+from core.task_manager import BackgroundTask, TaskManager
+from routers.tasks import stream_task
 
 
 router = APIRouter()
 
-_scan_queues: dict[str, asyncio.Queue] = {}
-_exec_queues: dict[str, asyncio.Queue] = {}
+# 清理扫描期间推送 progress 心跳的间隔（秒），WebSocket 读取超时在每条消息后重新计时
+SCAN_HEARTBEAT_INTERVAL = 5.0
+# 体检动作（DISM 等长时间无输出的命令）期间推送心跳的间隔（秒）
+ACTION_HEARTBEAT_INTERVAL = 5.0
+# C 盘体检（单个冷探测项可能很久才出结果）期间推送心跳的间隔（秒）
+DIAGNOSE_HEARTBEAT_INTERVAL = 5.0
+
+# 规则扫描结果缓存：根目录未变化的规则在 TTL 内重复扫描时直接复用；执行删除后清空
+_scan_cache = ScanCache()
 
 
 class ScanRequest(BaseModel):
     rule_names: Optional[List[str]] = None
+    force: bool = False   # True 时忽略缓存，全部重新遍历
 
 
 class ExecuteRequest(BaseModel):
@@ -32,81 +46,22 @@ class ExecuteRequest(BaseModel):
 
 class DiagnosisActionRequest(BaseModel):
     action: str
+    dry_run: bool = False
+    full_file_list: bool = False   # 预演时返回将删除的全部文件（默认只列最大的若干个）
 
 
-def _get_all_rules():
-    return get_all_cleanup_rules()
-
-
-def _get_path_size(path: str) -> int:
-    if not os.path.exists(path):
-        return 0
-    if os.path.isfile(path):
-        try:
-            return os.path.getsize(path)
-        except OSError:
-            return 0
-
-    total = 0
-    stack = [path]
-    while stack:
-        current = stack.pop()
-        try:
-            with os.scandir(current) as entries:
-                for entry in entries:
-                    try:
-                        if entry.is_file(follow_symlinks=False):
-                            total += entry.stat(follow_symlinks=False).st_size
-                        elif entry.is_dir(follow_symlinks=False):
-                            stack.append(entry.path)
-                    except OSError:
-                        continue
-        except OSError:
-            continue
-    return total
-
-
-def _clear_directory_contents(path: str) -> tuple[int, int, int]:
-    before = _get_path_size(path)
-    deleted = 0
-    failed = 0
-
-    try:
-        entries = list(os.scandir(path))
-    except OSError:
-        return 0, 0, 1
-
-    for entry in entries:
-        try:
-            if entry.is_dir(follow_symlinks=False):
-                shutil.rmtree(entry.path, ignore_errors=False)
-            elif entry.is_file(follow_symlinks=False):
-                os.remove(entry.path)
-            else:
-                continue
-            deleted += 1
-        except OSError:
-            failed += 1
-
-    return max(0, before - _get_path_size(path)), deleted, failed
-
-
-def _delete_cleanup_path(path: str) -> tuple[int, int, int]:
-    if not os.path.exists(path):
-        return 0, 0, 1
-
-    if os.path.isfile(path):
-        size = _get_path_size(path)
-        try:
-            os.remove(path)
-            return size, 1, 0
-        except OSError:
-            return 0, 0, 1
+class ArtifactSettingsBody(BaseModel):
+    roots: Optional[List[str]] = None
+    max_depth: Optional[int] = None
+    parallelism: Optional[int] = None
+    skip_dirs: Optional[List[str]] = None
+    artifacts: Optional[List[Dict[str, Any]]] = None
+    paths: Optional[List[Dict[str, Any]]] = None
+    android_system_images: Optional[List[str]] = None
 
-    if os.path.isdir(path):
-        return _clear_directory_contents(path)
 
-    return 0, 0, 1
+def _get_all_rules():
+    return get_all_cleanup_rules()
 
 
 @router.get("/rules")
@@ -122,134 +77,253 @@ async def list_rules():
     ]
 
 
+@router.get("/artifact-settings")
+async def get_artifact_settings():
+    """构建产物扫描配置（项目根、产物目录名、遍历深度、并发数、固定缓存路径）"""
+    return load_artifact_scan_settings()
+
+
+@router.put("/artifact-settings")
+async def update_artifact_settings(body: ArtifactSettingsBody):
+    try:
+        settings = save_artifact_scan_settings(body.model_dump(exclude_none=True))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    # 规则集随配置变化，旧的扫描结果不再可靠
+    _scan_cache.clear()
+    return settings
+
+
 @router.get("/diagnose")
-async def diagnose():
-    return diagnose_c_drive()
+async def diagnose(refresh: bool = False):
+    """C 盘体检；探测项大小默认复用缓存，refresh=true 时全部重新计算"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, partial(diagnose_c_drive, refresh=refresh))
+
+
+@router.post("/diagnose/start")
+async def start_diagnose(refresh: bool = False):
+    """
+    后台执行 C 盘体检，通过 WebSocket 逐项推送探测结果；refresh=true 时不使用探测项缓存。
+    探测期间定时推送 {"type": "progress", "stage": "heartbeat", "elapsed"} 心跳
+    """
+    def _do_diagnose(task: BackgroundTask):
+        started = time.monotonic()
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(DIAGNOSE_HEARTBEAT_INTERVAL):
+                task.emit({"type": "progress", "stage": "heartbeat",
+                           "elapsed": round(time.monotonic() - started, 1)})
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            result = diagnose_c_drive(
+                lambda event: task.emit({"type": "progress", **event}),
+                cancel_event=task.cancel_event,
+                refresh=refresh,
+            )
+        finally:
+            finished.set()
+        task.check_cancelled()
+        return {"type": "done", "result": result}
+
+    task = TaskManager.get_instance().submit("cleanup_diagnose", _do_diagnose, label="C 盘体检")
+    return {"task_id": task.task_id}
+
+
+@router.websocket("/diagnose/ws/{task_id}")
+async def diagnose_ws(websocket: WebSocket, task_id: str):
+    await stream_task(websocket, task_id, timeout=120.0, timeout_message="体检超时",
+                      missing_message="task_id does not exist")
 
 
 @router.post("/diagnose/action")
 async def run_diagnosis_action(body: DiagnosisActionRequest):
     loop = asyncio.get_event_loop()
+    if not body.dry_run:
+        _scan_cache.clear()
     try:
-        return await loop.run_in_executor(None, run_cleanup_diagnosis_action, body.action)
+        return await loop.run_in_executor(None, partial(run_cleanup_diagnosis_action, body.action, body.dry_run,
+                                                        full_file_list=body.full_file_list))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
+@router.post("/diagnose/action/start")
+async def start_diagnosis_action(body: DiagnosisActionRequest):
+    """
+    后台执行体检动作。WebSocket 依次收到：
+    - plan：全部步骤（key / label / after）
+    - step_start / step_done：步骤开始与结束，step_done 带状态、释放字节数、耗时与累计释放字节数
+    - step_progress：删除或迁移过程中的进度；output：命令输出（逐行）
+    - progress：定时心跳（已执行秒数）
+    done 消息的 result 与 /diagnose/action 的返回值相同
+    """
+    if not is_diagnosis_action(body.action):
+        raise HTTPException(status_code=400, detail=f"未知动作: {body.action}")
+
+    def _do_action(task: BackgroundTask):
+        started = time.monotonic()
+        finished = threading.Event()
+
+        def heartbeat():
+            while not finished.wait(ACTION_HEARTBEAT_INTERVAL):
+                task.emit({"type": "progress", "action": body.action,
+                           "elapsed": round(time.monotonic() - started, 1)})
+
+        if not body.dry_run:
+            _scan_cache.clear()
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            result = run_cleanup_diagnosis_action(body.action, body.dry_run, emit=task.emit,
+                                                  cancel_event=task.cancel_event,
+                                                  full_file_list=body.full_file_list)
+        finally:
+            finished.set()
+        return {"type": "done", "result": result, "cancelled": task.cancelled}
+
+    task = TaskManager.get_instance().submit("cleanup_action", _do_action, label=f"体检动作 {body.action}")
+    return {"task_id": task.task_id}
+
+
+@router.websocket("/diagnose/action/ws/{task_id}")
+async def diagnosis_action_ws(websocket: WebSocket, task_id: str):
+    await stream_task(websocket, task_id, timeout=120.0, timeout_message="动作执行超时",
+                      missing_message="task_id does not exist")
+
+
+def _scan_items(entry: dict) -> list[dict]:
+    rule = entry["rule"]
+    return [
+        {
+            "path": path,
+            "size": size,
+            "rule_name": rule.name,
+            "category": rule.category,
+            "risk_level": rule.risk_level,
+        }
+        for path, size in zip(entry["paths"], entry["sizes"])
+    ]
+
+
 @router.post("/scan")
 async def start_scan(body: ScanRequest):
-    task_id = str(uuid.uuid4())
-    queue: asyncio.Queue = asyncio.Queue()
-    _scan_queues[task_id] = queue
-    loop = asyncio.get_event_loop()
-
-    def _do_scan():
-        try:
-            all_rules = _get_all_rules()
-            rules = [rule for rule in all_rules if rule.name in body.rule_names] if body.rule_names else all_rules
-
-            scanner = CleanupScanner(rules)
-            scan_results = scanner.scan()
-
-            result_items = []
-            total_size = 0
-            for entry in scan_results:
-                rule = entry["rule"]
-                for path in entry.get("paths", []):
-                    size = rule.get_size(path)
-                    result_items.append({
-                        "path": path,
-                        "size": size,
-                        "rule_name": rule.name,
-                        "category": rule.category,
-                        "risk_level": rule.risk_level,
+    """
+    启动清理扫描：每条规则扫描完推送一条 rule_result（含该规则的全部条目），
+    期间定时推送 progress 心跳，最后的 done 只包含汇总数据
+    """
+    def _do_scan(task: BackgroundTask):
+        all_rules = _get_all_rules()
+        rules = [rule for rule in all_rules if rule.name in body.rule_names] if body.rule_names else all_rules
+        total = len(rules)
+        state = {"done": 0, "total_size": 0, "item_count": 0, "current": ""}
+        lock = threading.Lock()
+        finished = threading.Event()
+
+        def progress_message() -> dict:
+            return {"type": "progress", "done": state["done"], "total": total, "current": state["current"]}
+
+        def on_progress(message: str):
+            state["current"] = message
+
+        def on_rule_done(entry, timing):
+            with lock:
+                state["done"] += 1
+                if entry:
+                    items = _scan_items(entry)
+                    state["total_size"] += entry["total_size"]
+                    state["item_count"] += len(items)
+                    task.emit({
+                        "type": "rule_result",
+                        "rule_name": entry["rule"].name,
+                        "items": items,
+                        "total_size": entry["total_size"],
+                        "file_count": entry["file_count"],
+                        **{key: timing[key] for key in ("elapsed", "entries_visited", "bytes_counted", "cached")},
                     })
-                    total_size += size
+                task.emit(progress_message())
 
-            loop.call_soon_threadsafe(
-                queue.put_nowait,
-                {"type": "done", "items": result_items, "total_size": total_size},
-            )
-        except Exception as exc:
-            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "message": str(exc)})
+        def heartbeat():
+            while not finished.wait(SCAN_HEARTBEAT_INTERVAL):
+                task.emit(progress_message())
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            scanner = CleanupScanner(rules, cancel_event=task.cancel_event, cache=_scan_cache)
+            scanner.scan(on_progress, on_rule_done, force=body.force)
+        finally:
+            finished.set()
+        task.check_cancelled()
+
+        return {
+            "type": "done",
+            "total_size": state["total_size"],
+            "item_count": state["item_count"],
+            "rule_count": total,
+            "rule_timings": scanner.rule_timings,
+        }
 
-    loop.run_in_executor(None, _do_scan)
-    return {"task_id": task_id}
+    task = TaskManager.get_instance().submit("cleanup_scan", _do_scan, label="清理扫描")
+    return {"task_id": task.task_id}
 
 
 @router.websocket("/scan/ws/{task_id}")
 async def scan_ws(websocket: WebSocket, task_id: str):
-    await websocket.accept()
-    queue = _scan_queues.get(task_id)
-    if queue is None:
-        await websocket.send_json({"type": "error", "message": "task_id does not exist"})
-        await websocket.close()
-        return
-
-    try:
-        while True:
-            msg = await asyncio.wait_for(queue.get(), timeout=120.0)
-            await websocket.send_json(msg)
-            if msg.get("type") in ("done", "error"):
-                break
-    except (asyncio.TimeoutError, WebSocketDisconnect):
-        pass
-    finally:
-        _scan_queues.pop(task_id, None)
-        await websocket.close()
+    await stream_task(websocket, task_id, timeout=120.0, missing_message="task_id does not exist")
 
 
 @router.post("/execute")
 async def start_execute(body: ExecuteRequest):
-    task_id = str(uuid.uuid4())
-    queue: asyncio.Queue = asyncio.Queue()
-    _exec_queues[task_id] = queue
-    loop = asyncio.get_event_loop()
-
-    def _do_execute():
-        deleted = 0
-        failed = 0
-        freed_bytes = 0
-        for index, path in enumerate(body.paths):
-            freed, deleted_count, failed_count = _delete_cleanup_path(path)
-            freed_bytes += freed
-            deleted += deleted_count
-            failed += failed_count
-
-            if (index + 1) % 20 == 0 or index + 1 == len(body.paths):
-                loop.call_soon_threadsafe(
-                    queue.put_nowait,
-                    {"type": "progress", "deleted": deleted, "failed": failed, "total": len(body.paths)},
-                )
-
-        loop.call_soon_threadsafe(
-            queue.put_nowait,
-            {"type": "done", "summary": {"deleted": deleted, "failed": failed, "freed_bytes": freed_bytes}},
+    def _do_execute(task: BackgroundTask):
+        _scan_cache.clear()
+        total = DeleteResult("")
+        state = {"processed": 0}
+
+        def progress_message(snapshot: Optional[dict] = None) -> dict:
+            return {
+                "type": "progress",
+                "deleted": total.deleted,
+                "failed": total.failed,
+                "processed": state["processed"],
+                "total": len(body.paths),
+                "freed_bytes": snapshot["freed_bytes"] if snapshot else total.freed_bytes,
+                "files_deleted": snapshot["files_deleted"] if snapshot else total.files_deleted,
+            }
+
+        # 大目录清理期间按文件批次推送，避免长时间没有消息
+        engine = DeleteEngine(
+            cancel_event=task.cancel_event,
+            progress_callback=lambda snapshot: task.emit(progress_message(snapshot)),
         )
-
-    loop.run_in_executor(None, _do_execute)
-    return {"task_id": task_id}
+        try:
+            for path in body.paths:
+                task.check_cancelled()
+                total.merge(engine.delete_path(path))
+                state["processed"] += 1
+                if state["processed"] % 20 == 0 or state["processed"] == len(body.paths):
+                    task.emit(progress_message())
+        finally:
+            # 删除期间并发的扫描可能写回了删除前的结果
+            _scan_cache.clear()
+            clear_diagnosis_cache()
+        task.check_cancelled()
+
+        return {"type": "done", "summary": {
+            "deleted": total.deleted,
+            "failed": total.failed,
+            "freed_bytes": total.freed_bytes,
+            "locked": total.locked,
+        }}
+
+    task = TaskManager.get_instance().submit(
+        "cleanup_execute", _do_execute, label=f"清理 {len(body.paths)} 项", priority=1,
+    )
+    return {"task_id": task.task_id}
 
 
 @router.websocket("/execute/ws/{task_id}")
 async def execute_ws(websocket: WebSocket, task_id: str):
-    await websocket.accept()
-    queue = _exec_queues.get(task_id)
-    if queue is None:
-        await websocket.send_json({"type": "error", "message": "task_id does not exist"})
-        await websocket.close()
-        return
-
-    try:
-        while True:
-            msg = await asyncio.wait_for(queue.get(), timeout=300.0)
-            await websocket.send_json(msg)
-            if msg.get("type") in ("done", "error"):
-                break
-    except (asyncio.TimeoutError, WebSocketDisconnect):
-        pass
-    finally:
-        _exec_queues.pop(task_id, None)
-        await websocket.close()
+    await stream_task(websocket, task_id, timeout=300.0, missing_message="task_id does not exist")
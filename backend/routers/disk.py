@@ -5,95 +5,360 @@
 import os
 import sys
 import asyncio
-import uuid
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+import threading
+from collections import OrderedDict
+from typing import Optional
+from fastapi import APIRouter, WebSocket, HTTPException, Query
 from pydantic import BaseModel
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
+from core.fs_walker import DirListing, ParallelWalker, WalkStats, path_size
+from core.size_index import IndexedDir, SizeIndex
+from core.task_manager import BackgroundTask, TaskManager
+from routers.tasks import stream_task
+
 router = APIRouter()
 
-# 存储进行中的扫描任务 {task_id: asyncio.Queue}
-_scan_tasks: dict[str, asyncio.Queue] = {}
+# 已完成扫描的完整大小树总内存上限（MB），超出后按 LRU 淘汰最久未访问的扫描
+TREE_CACHE_MB = int(os.environ.get("TOOLPACK_DISK_TREE_CACHE_MB", 512))
+
+# 增量结果推送的最小间隔（秒），期间完成的子项合并到同一条消息
+PARTIAL_INTERVAL = 0.1
+
+# 目录大小索引（持久化在配置目录），重复扫描同一目录时只重新列举变化的部分
+_size_index = SizeIndex()
 
 
 class ScanRequest(BaseModel):
     path: str
+    refresh: bool = False   # True 时忽略索引，完整重扫
 
 
 def _get_dir_size(path: str) -> int:
     """递归计算目录大小"""
-    total = 0
+    return path_size(path)
+
+
+class _SizeNode:
+    """目录大小树节点（目录的 size 为子树聚合值）"""
+
+    __slots__ = ("name", "path", "size", "is_dir", "is_link", "children")
+
+    def __init__(self, name: str, path: str, is_dir: bool, size: int = 0, is_link: bool = False):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.is_dir = is_dir
+        self.is_link = is_link
+        self.children: list["_SizeNode"] = []
+
+
+def _node_from_entry(entry: os.DirEntry) -> _SizeNode:
+    """由 DirEntry 构造节点；目录节点的 size 待自底向上聚合"""
+    if entry.is_dir(follow_symlinks=False):
+        return _SizeNode(entry.name, entry.path, True)
+    if entry.is_file(follow_symlinks=False):
+        return _SizeNode(entry.name, entry.path, False, entry.stat(follow_symlinks=False).st_size)
+    # 符号链接 / junction：只作为直接子项展示，不计入父目录总量（与旧实现一致）
+    return _SizeNode(entry.name, entry.path, entry.is_dir(), entry.stat().st_size, is_link=True)
+
+
+def _assemble_subtree(node: _SizeNode, listings: dict[str, DirListing],
+                      cached: dict[str, IndexedDir]) -> list[IndexedDir]:
+    """
+    用本次列举结果（优先）或索引中 mtime 未变的目录拼出 node 子树，并自底向上汇总大小。
+    返回需要写回索引的目录记录（新列举的，或聚合大小发生变化的）。
+    """
+    order: list[tuple[_SizeNode, float, list, list, list, bool]] = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        listing = listings.get(current.path)
+        if listing is not None:
+            files = [(name, size) for name, size, _ in listing.files]
+            dirs, links, mtime, fresh = listing.dirs, listing.others, listing.mtime, True
+        elif current.path in cached:
+            item = cached[current.path]
+            files, dirs, links, mtime, fresh = item.files, item.dirs, item.links, item.mtime, False
+        else:
+            continue
+        order.append((current, mtime, files, dirs, links, fresh))
+        for name, size in files:
+            current.children.append(_SizeNode(name, os.path.join(current.path, name), False, size))
+        # 深层的符号链接不跟随，作为大小为 0 的叶子展示
+        for name in links:
+            current.children.append(_SizeNode(name, os.path.join(current.path, name), False, is_link=True))
+        for name in dirs:
+            child = _SizeNode(name, os.path.join(current.path, name), True)
+            current.children.append(child)
+            stack.append(child)
+
+    # order 为前序，逆序处理保证子目录先于父目录汇总
+    rows = []
+    for current, mtime, files, dirs, links, fresh in reversed(order):
+        current.size = sum(child.size for child in current.children if not child.is_link)
+        if fresh or cached[current.path].size != current.size:
+            rows.append(IndexedDir(current.path, mtime, current.size, files, dirs, links))
+    return rows
+
+
+def _build_size_tree(path: str, on_child=None, index: SizeIndex | None = None,
+                     refresh: bool = False, cancel_event: threading.Event | None = None) -> _SizeNode:
+    """
+    并行遍历构建 path 的完整大小树。
+    每当一批顶层子项的子树完整算出时回调 on_child(nodes, done, total)（在工作线程中调用）。
+    传入 index 时只重新列举 mtime 变化或新出现的目录，其余直接复用索引；
+    refresh=True 时忽略索引完整重扫（结果仍写回索引）。
+    cancel_event 被置位时尽快返回不完整的树，且不写回索引。
+    """
+    root = _SizeNode(os.path.basename(os.path.normpath(path)) or path, path, True)
     try:
-        with os.scandir(path) as it:
-            for entry in it:
-                try:
-                    if entry.is_file(follow_symlinks=False):
-                        total += entry.stat().st_size
-                    elif entry.is_dir(follow_symlinks=False):
-                        total += _get_dir_size(entry.path)
-                except Exception:
-                    continue
+        entries = list(os.scandir(path))
     except Exception:
-        pass
+        return root
+
+    dir_nodes = []
+    for entry in entries:
+        try:
+            child = _node_from_entry(entry)
+        except Exception:
+            continue
+        root.children.append(child)
+        if child.is_dir and not child.is_link:
+            dir_nodes.append(child)
+
+    cached = index.load(path) if index and not refresh else {}
+    unchanged, changed = SizeIndex.validate(cached) if cached else (set(), set())
+    known = unchanged | changed
+    reusable = {key: cached[key] for key in unchanged}
+    walk_roots = [node.path for node in dir_nodes if node.path not in known]
+    walk_roots.extend(sorted(changed))
+
+    # 每个遍历根归属到一个顶层子目录，顶层子目录下的根全部完成才算该子项完成
+    top_prefix = os.path.join(path, "")
+    def top_of(walk_root: str) -> str:
+        return os.path.join(path, walk_root[len(top_prefix):].split(os.sep, 1)[0])
+
+    pending: dict[str, int] = {node.path: 0 for node in dir_nodes}
+    for walk_root in walk_roots:
+        top = top_of(walk_root)
+        if top in pending:
+            pending[top] += 1
+
+    listings: dict[str, DirListing] = {}
+    rows: list[IndexedDir] = []
+    nodes_by_path = {node.path: node for node in dir_nodes}
+    total = len(entries)
+    done_lock = threading.Lock()
+
+    # 文件、链接以及整棵子树都能从索引复用的目录，一开始就是完整的
+    ready = [child for child in root.children if child.path not in pending or not pending[child.path]]
+    for node in ready:
+        if node.path in pending:
+            rows.extend(_assemble_subtree(node, listings, reusable))
+    done = [total - (len(dir_nodes) - sum(1 for node in ready if node.path in pending))]
+    if on_child and ready:
+        on_child(ready, done[0], total)
+
+    def on_root_done(walk_root: str, _stats: WalkStats):
+        top = top_of(walk_root)
+        with done_lock:
+            if top not in pending:
+                return
+            pending[top] -= 1
+            if pending[top]:
+                return
+            node = nodes_by_path[top]
+            rows.extend(_assemble_subtree(node, listings, reusable))
+            done[0] += 1
+            finished = done[0]
+        if on_child:
+            on_child([node], finished, total)
+
+    # 已索引的目录要么复用、要么作为独立遍历根，遍历时不重复进入
+    walker = ParallelWalker(on_dir=lambda listing: listings.__setitem__(listing.path, listing),
+                            descend=(lambda entry, _depth: entry.path not in known) if known else None,
+                            on_root_done=on_root_done,
+                            cancel_event=cancel_event)
+    walker.walk(walk_roots)
+
+    root.size = sum(child.size for child in root.children if not child.is_link)
+    if index and not walker.cancelled():
+        index.store(path, rows, _tree_dir_paths(dir_nodes))
+    return root
+
+
+def _tree_dir_paths(nodes: list[_SizeNode]) -> set[str]:
+    paths = set()
+    stack = list(nodes)
+    while stack:
+        current = stack.pop()
+        if current.is_dir and not current.is_link:
+            paths.add(current.path)
+            stack.extend(current.children)
+    return paths
+
+
+def _children_items(node: _SizeNode, limit: int) -> list[dict]:
+    """node 的直接子项，按大小倒序取前 limit 个"""
+    results = []
+    for child in node.children:
+        if child.size > 0:
+            results.append({
+                "name": child.name,
+                "path": child.path,
+                "size": child.size,
+                "type": "dir" if child.is_dir else "file",
+                "percentage": round(child.size / node.size * 100, 2),
+            })
+    results.sort(key=lambda x: x["size"], reverse=True)
+    return results[:limit]
+
+
+def _tree_footprint(tree: _SizeNode) -> int:
+    """粗略估算大小树占用的内存（字节）：节点对象 + 子项列表 + name/path 字符串"""
+    total = 0
+    stack = [tree]
+    while stack:
+        current = stack.pop()
+        total += 250 + len(current.name) + len(current.path)
+        stack.extend(current.children)
     return total
 
 
-async def _run_scan(path: str, queue: asyncio.Queue):
-    """在线程池中执行扫描，通过 queue 推送结果"""
-    loop = asyncio.get_event_loop()
+def _find_node(tree: _SizeNode, path: str) -> _SizeNode | None:
+    """在大小树中定位 path 对应的目录节点"""
+    try:
+        rel = os.path.relpath(os.path.normpath(path), os.path.normpath(tree.path))
+    except ValueError:   # Windows 下跨盘符
+        return None
+    if rel == os.curdir:
+        return tree
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+        return None
+
+    node = tree
+    for part in rel.split(os.sep):
+        key = os.path.normcase(part)
+        node = next(
+            (child for child in node.children
+             if child.is_dir and not child.is_link and os.path.normcase(child.name) == key),
+            None,
+        )
+        if node is None:
+            return None
+    return node
 
-    def scan():
-        try:
-            total_size = _get_dir_size(path)
-            if total_size == 0:
-                return {"type": "done", "items": [], "total_size": 0}
-
-            items = []
-            try:
-                entries = list(os.scandir(path))
-            except PermissionError:
-                entries = []
-
-            results = []
-            for i, entry in enumerate(entries):
-                try:
-                    if entry.is_dir(follow_symlinks=False):
-                        size = _get_dir_size(entry.path)
-                    else:
-                        size = entry.stat().st_size
-                    if size > 0:
-                        results.append({
-                            "name": entry.name,
-                            "path": entry.path,
-                            "size": size,
-                            "type": "dir" if entry.is_dir() else "file",
-                            "percentage": round(size / total_size * 100, 2),
-                        })
-                except Exception:
-                    continue
-
-                # 每处理 10 个条目发一次进度
-                if (i + 1) % 10 == 0:
-                    loop.call_soon_threadsafe(
-                        queue.put_nowait,
-                        {"type": "progress", "scanned": i + 1, "total": len(entries)},
-                    )
-
-            results.sort(key=lambda x: x["size"], reverse=True)
-            return {
-                "type": "done",
-                "items": results[:50],   # 最多返回前 50 个
-                "total_size": total_size,
-                "path": path,
-            }
-        except Exception as e:
-            return {"type": "error", "message": str(e)}
-
-    result = await loop.run_in_executor(None, scan)
-    await queue.put(result)
+
+class _TreeCache:
+    """已完成扫描的大小树，按估算内存做 LRU 淘汰"""
+
+    def __init__(self, max_mb: int):
+        self.max_bytes = max_mb * 1024 * 1024
+        self._trees: OrderedDict[str, tuple[_SizeNode, int]] = OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def put(self, task_id: str, tree: _SizeNode):
+        footprint = _tree_footprint(tree)
+        if footprint > self.max_bytes:
+            return
+        with self._lock:
+            while self._trees and self._used + footprint > self.max_bytes:
+                _, (_, evicted) = self._trees.popitem(last=False)
+                self._used -= evicted
+            self._trees[task_id] = (tree, footprint)
+            self._used += footprint
+
+    def get(self, task_id: str) -> _SizeNode | None:
+        with self._lock:
+            entry = self._trees.get(task_id)
+            if entry is None:
+                return None
+            self._trees.move_to_end(task_id)
+            return entry[0]
+
+
+_tree_cache = _TreeCache(TREE_CACHE_MB)
+
+
+class _PartialEmitter:
+    """
+    把扫描线程里陆续完成的顶层子项合并成节流的 progress 消息（最多每 PARTIAL_INTERVAL 秒一条），
+    所有状态只在事件循环线程中读写
+    """
+
+    def __init__(self, task: BackgroundTask):
+        self.loop = task.loop
+        self.task = task
+        self.items: list[dict] = []
+        self.scanned = 0
+        self.total = 0
+        self.scanned_size = 0
+        self.last_flush = 0.0
+        self.handle: asyncio.TimerHandle | None = None
+
+    def add(self, nodes: list[_SizeNode], scanned: int, total: int):
+        """线程安全：由扫描线程调用"""
+        items = [
+            {"name": node.name, "path": node.path, "size": node.size, "type": "dir" if node.is_dir else "file"}
+            for node in nodes if node.size > 0
+        ]
+        counted = sum(node.size for node in nodes if not node.is_link)
+        self.loop.call_soon_threadsafe(self._add, items, counted, scanned, total)
+
+    def _add(self, items: list[dict], counted: int, scanned: int, total: int):
+        self.items.extend(items)
+        self.scanned = max(self.scanned, scanned)
+        self.total = total
+        self.scanned_size += counted
+        if self.handle is None:
+            delay = max(0.0, self.last_flush + PARTIAL_INTERVAL - self.loop.time())
+            self.handle = self.loop.call_later(delay, self.flush)
+
+    def flush(self):
+        self.handle = None
+        self.last_flush = self.loop.time()
+        items, self.items = self.items, []
+        self.task.emit({
+            "type": "progress",
+            "scanned": self.scanned,
+            "total": self.total,
+            "scanned_size": self.scanned_size,
+            "items": items,   # 本次新完成的顶层子项（增量）
+        })
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+
+def _run_scan(task: BackgroundTask, path: str, refresh: bool = False) -> dict:
+    """在扫描工作池中执行，顶层子项算完即推送增量结果"""
+    emitter = _PartialEmitter(task)
+    try:
+        tree = _build_size_tree(path, emitter.add, _size_index, refresh, task.cancel_event)
+    finally:
+        # 尚未发出的增量直接丢弃，完整结果由 done 给出
+        task.loop.call_soon_threadsafe(emitter.cancel)
+    task.check_cancelled()
+
+    total_size = tree.size
+    if total_size == 0:
+        return {"type": "done", "items": [], "total_size": 0}
+
+    # 保留完整树，供 /tree 下钻时直接读取
+    _tree_cache.put(task.task_id, tree)
+    return {
+        "type": "done",
+        "items": _children_items(tree, 50),   # 最多返回前 50 个
+        "total_size": total_size,
+        "path": path,
+    }
 
 
 @router.post("/scan")
@@ -102,35 +367,31 @@ async def start_scan(body: ScanRequest):
     if not os.path.isdir(body.path):
         raise HTTPException(status_code=400, detail=f"路径不存在或不是目录: {body.path}")
 
-    task_id = str(uuid.uuid4())
-    queue: asyncio.Queue = asyncio.Queue()
-    _scan_tasks[task_id] = queue
+    task = TaskManager.get_instance().submit(
+        "disk_scan", lambda task: _run_scan(task, body.path, body.refresh), label=body.path,
+    )
+    return {"task_id": task.task_id}
 
-    asyncio.create_task(_run_scan(body.path, queue))
-    return {"task_id": task_id}
+
+@router.get("/tree/{task_id}")
+async def get_tree(task_id: str, path: Optional[str] = None, limit: int = Query(50, ge=1, le=10000)):
+    """从已完成扫描的大小树中读取任意子目录的子项（不产生磁盘 IO）"""
+    tree = _tree_cache.get(task_id)
+    if tree is None:
+        raise HTTPException(status_code=404, detail="扫描结果不存在或已过期，请重新扫描")
+
+    node = _find_node(tree, path) if path else tree
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"路径不在扫描结果中: {path}")
+
+    return {
+        "path": node.path,
+        "total_size": node.size,
+        "items": _children_items(node, limit) if node.size > 0 else [],
+    }
 
 
 @router.websocket("/ws/{task_id}")
 async def scan_ws(websocket: WebSocket, task_id: str):
     """WebSocket：推送扫描进度和结果"""
-    await websocket.accept()
-
-    queue = _scan_tasks.get(task_id)
-    if queue is None:
-        await websocket.send_json({"type": "error", "message": "task_id 不存在"})
-        await websocket.close()
-        return
-
-    try:
-        while True:
-            msg = await asyncio.wait_for(queue.get(), timeout=60.0)
-            await websocket.send_json(msg)
-            if msg.get("type") in ("done", "error"):
-                break
-    except asyncio.TimeoutError:
-        await websocket.send_json({"type": "error", "message": "扫描超时"})
-    except WebSocketDisconnect:
-        pass
-    finally:
-        _scan_tasks.pop(task_id, None)
-        await websocket.close()
+    await stream_task(websocket, task_id, timeout=60.0, timeout_message="扫描超时")
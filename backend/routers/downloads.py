@@ -6,12 +6,10 @@ import os
 import sys
 import json
 import shutil
-import asyncio
 import uuid
-import threading
 from pathlib import Path
 from typing import Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import APIRouter, WebSocket, HTTPException
 from pydantic import BaseModel
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,6 +17,8 @@ if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
 from core.system_detector import SystemConfig
+from core.task_manager import BackgroundTask, TaskManager
+from routers.tasks import stream_task
 
 router = APIRouter()
 
@@ -46,10 +46,8 @@ ANDROID_UA = (
 )
 BROWSER_UA_MAP = {"桌面": DESKTOP_UA, "安卓": ANDROID_UA}
 
-# ── 内存中的下载队列 ──────────────────────────────────────────────────────────
+# ── 下载任务记录（进度队列与取消令牌由 TaskManager 管理）────────────────────────
 _tasks: dict[str, dict] = {}
-_task_queues: dict[str, asyncio.Queue] = {}
-_cancel_flags: dict[str, threading.Event] = {}
 
 # 持久化的字段（运行时字段如 speed/eta 不保存）
 _PERSIST_KEYS = ("task_id", "url", "title", "status", "progress", "save_dir", "error", "output_file")
@@ -191,12 +189,7 @@ class SettingsBody(BaseModel):
 @router.post("/fetch-info")
 async def fetch_info(body: FetchInfoRequest):
     """启动视频信息获取，返回 task_id，通过 WebSocket 接收结果"""
-    task_id = str(uuid.uuid4())
-    queue: asyncio.Queue = asyncio.Queue()
-    _task_queues[task_id] = queue
-    loop = asyncio.get_event_loop()
-
-    def _do_fetch():
+    def _do_fetch(task: BackgroundTask):
         try:
             import yt_dlp
             settings = _load_settings()
@@ -229,33 +222,18 @@ async def fetch_info(body: FetchInfoRequest):
                     "ffmpeg_available": ffmpeg_available,
                 },
             }
-            loop.call_soon_threadsafe(queue.put_nowait, result)
+            return result
         except Exception as exc:
-            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "message": str(exc)})
+            return {"type": "error", "message": str(exc)}
 
-    threading.Thread(target=_do_fetch, daemon=True).start()
-    return {"task_id": task_id}
+    task = TaskManager.get_instance().submit("download_info", _do_fetch, label=body.url, priority=1)
+    return {"task_id": task.task_id}
 
 
 @router.websocket("/fetch-info/ws/{task_id}")
 async def fetch_info_ws(websocket: WebSocket, task_id: str):
     """WebSocket：推送视频信息获取结果"""
-    await websocket.accept()
-    queue = _task_queues.get(task_id)
-    if queue is None:
-        await websocket.send_json({"type": "error", "message": "task_id 不存在"})
-        await websocket.close()
-        return
-    try:
-        msg = await asyncio.wait_for(queue.get(), timeout=60.0)
-        await websocket.send_json(msg)
-    except asyncio.TimeoutError:
-        await websocket.send_json({"type": "error", "message": "获取超时"})
-    except WebSocketDisconnect:
-        pass
-    finally:
-        _task_queues.pop(task_id, None)
-        await websocket.close()
+    await stream_task(websocket, task_id, timeout=60.0, timeout_message="获取超时")
 
 
 # ── 下载任务管理 ──────────────────────────────────────────────────────────────
@@ -268,11 +246,6 @@ async def create_task(body: CreateTaskRequest):
     os.makedirs(save_dir, exist_ok=True)
 
     task_id = str(uuid.uuid4())
-    cancel_flag = threading.Event()
-    _cancel_flags[task_id] = cancel_flag
-    queue: asyncio.Queue = asyncio.Queue()
-    _task_queues[task_id] = queue
-
     _tasks[task_id] = {
         "task_id": task_id,
         "url": body.url,
@@ -286,9 +259,8 @@ async def create_task(body: CreateTaskRequest):
         "output_file": "",
     }
 
-    loop = asyncio.get_event_loop()
-
-    def _do_download():
+    def _do_download(task: BackgroundTask):
+        cancel_flag = task.cancel_event
         try:
             import yt_dlp
             ffmpeg_path = _get_ffmpeg_path()
@@ -324,12 +296,12 @@ async def create_task(body: CreateTaskRequest):
                         "eta": f"{eta}s" if eta else "-",
                         "filename": os.path.basename(fname),
                     }
-                    loop.call_soon_threadsafe(queue.put_nowait, msg)
+                    task.emit(msg)
                 elif data.get("status") == "finished":
                     fname = data.get("filename", "")
                     if fname:
                         _last_filename[0] = fname
-                    loop.call_soon_threadsafe(queue.put_nowait, {
+                    task.emit({
                         "type": "progress",
                         "task_id": task_id,
                         "progress": 100,
@@ -379,49 +351,32 @@ async def create_task(body: CreateTaskRequest):
             _tasks[task_id]["progress"] = 100
             _tasks[task_id]["output_file"] = output_file
             _save_tasks()
-            loop.call_soon_threadsafe(queue.put_nowait, {
+            return {
                 "type": "done",
                 "task_id": task_id,
                 "output_file": output_file,
-            })
+            }
         except Exception as exc:
             status = "已取消" if cancel_flag.is_set() else "失败"
             _tasks[task_id]["status"] = status
             _tasks[task_id]["error"] = str(exc)
             _save_tasks()
-            loop.call_soon_threadsafe(queue.put_nowait, {
+            return {
                 "type": "error",
                 "task_id": task_id,
                 "message": str(exc),
                 "status": status,
-            })
+                "cancelled": cancel_flag.is_set(),
+            }
 
-    threading.Thread(target=_do_download, daemon=True).start()
+    TaskManager.get_instance().submit("download", _do_download, label=body.url, task_id=task_id)
     return {"task_id": task_id}
 
 
 @router.websocket("/tasks/ws/{task_id}")
 async def task_ws(websocket: WebSocket, task_id: str):
     """WebSocket：推送下载进度"""
-    await websocket.accept()
-    queue = _task_queues.get(task_id)
-    if queue is None:
-        await websocket.send_json({"type": "error", "message": "task_id 不存在"})
-        await websocket.close()
-        return
-    try:
-        while True:
-            msg = await asyncio.wait_for(queue.get(), timeout=3600.0)
-            await websocket.send_json(msg)
-            if msg.get("type") in ("done", "error"):
-                break
-    except asyncio.TimeoutError:
-        await websocket.send_json({"type": "error", "message": "下载超时"})
-    except WebSocketDisconnect:
-        pass
-    finally:
-        _task_queues.pop(task_id, None)
-        await websocket.close()
+    await stream_task(websocket, task_id, timeout=3600.0, timeout_message="下载超时")
 
 
 @router.get("/tasks")
@@ -432,9 +387,14 @@ async def list_tasks():
 
 @router.post("/tasks/{task_id}/cancel")
 async def cancel_task(task_id: str):
-    flag = _cancel_flags.get(task_id)
-    if flag:
-        flag.set()
+    manager = TaskManager.get_instance()
+    task = manager.get(task_id)
+    if task is not None:
+        if task.status == "queued" and task_id in _tasks:
+            # 还在排队，不会再开始执行，直接记为已取消
+            _tasks[task_id]["status"] = "已取消"
+            _save_tasks()
+        manager.cancel(task_id)
         return {"success": True}
     # 任务可能已不在内存（重启后残留），允许直接标记
     if task_id in _tasks:
@@ -450,7 +410,6 @@ async def clear_finished():
     to_remove = [tid for tid, t in _tasks.items() if t["status"] in ("完成", "失败", "已取消")]
     for tid in to_remove:
         _tasks.pop(tid, None)
-        _cancel_flags.pop(tid, None)
     _save_tasks()
     return {"removed": len(to_remove)}
 
@@ -5,13 +5,16 @@ ffmpeg 状态检测与安装
 import os
 import sys
 import shutil
-import asyncio
-import uuid
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket
 
-router = APIRouter()
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.task_manager import BackgroundTask, TaskManager
+from routers.tasks import stream_task
 
-_install_queues: dict[str, asyncio.Queue] = {}
+router = APIRouter()
 
 
 def _get_ffmpeg_path() -> str:
@@ -53,53 +56,30 @@ async def ffmpeg_status():
 @router.post("/install")
 async def install_ffmpeg():
     """通过 pip 安装 imageio-ffmpeg，返回 task_id，通过 WebSocket 接收进度"""
-    task_id = str(uuid.uuid4())
-    queue: asyncio.Queue = asyncio.Queue()
-    _install_queues[task_id] = queue
-    loop = asyncio.get_event_loop()
-
-    def _do_install():
+    def _do_install(task: BackgroundTask):
         import subprocess
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "pip", "install", "imageio-ffmpeg", "--quiet"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
         try:
-            proc = subprocess.Popen(
-                [sys.executable, "-m", "pip", "install", "imageio-ffmpeg", "--quiet"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-            )
             for line in proc.stdout:
-                loop.call_soon_threadsafe(
-                    queue.put_nowait,
-                    {"type": "progress", "message": line.rstrip()},
-                )
+                task.check_cancelled()
+                task.emit({"type": "progress", "message": line.rstrip()})
             proc.wait()
-            if proc.returncode == 0:
-                loop.call_soon_threadsafe(queue.put_nowait, {"type": "done"})
-            else:
-                loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "message": "安装失败"})
-        except Exception as e:
-            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "message": str(e)})
+        finally:
+            if proc.poll() is None:
+                proc.terminate()
+        if proc.returncode == 0:
+            return {"type": "done"}
+        return {"type": "error", "message": "安装失败"}
 
-    loop.run_in_executor(None, _do_install)
-    return {"task_id": task_id}
+    task = TaskManager.get_instance().submit("ffmpeg_install", _do_install, label="安装 imageio-ffmpeg")
+    return {"task_id": task.task_id}
 
 
 @router.websocket("/install/ws/{task_id}")
 async def install_ws(websocket: WebSocket, task_id: str):
-    await websocket.accept()
-    queue = _install_queues.get(task_id)
-    if queue is None:
-        await websocket.send_json({"type": "error", "message": "task_id 不存在"})
-        await websocket.close()
-        return
-    try:
-        while True:
-            msg = await asyncio.wait_for(queue.get(), timeout=120.0)
-            await websocket.send_json(msg)
-            if msg.get("type") in ("done", "error"):
-                break
-    except (asyncio.TimeoutError, WebSocketDisconnect):
-        pass
-    finally:
-        _install_queues.pop(task_id, None)
-        await websocket.close()
+    await stream_task(websocket, task_id, timeout=120.0)
@@ -6,16 +6,18 @@ import os
 import sys
 import io
 import asyncio
-import uuid
 import hashlib
 from typing import Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi import APIRouter, WebSocket, HTTPException, Query
 from fastapi.responses import Response
 
 ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
+from core.task_manager import BackgroundTask, TaskManager
+from routers.tasks import stream_task
+
 router = APIRouter()
 
 SUPPORTED_FORMATS = {
@@ -24,8 +26,6 @@ SUPPORTED_FORMATS = {
 }
 MAX_IMAGES = 400
 
-_scan_queues: dict[str, asyncio.Queue] = {}
-
 
 @router.post("/scan")
 async def start_scan(path: str, recursive: bool = True):
@@ -33,39 +33,15 @@ async def start_scan(path: str, recursive: bool = True):
     if not os.path.isdir(path):
         raise HTTPException(status_code=400, detail=f"路径不存在: {path}")
 
-    task_id = str(uuid.uuid4())
-    queue: asyncio.Queue = asyncio.Queue()
-    _scan_queues[task_id] = queue
-    loop = asyncio.get_event_loop()
-
-    def _do_scan():
-        try:
-            images = []
-            if recursive:
-                for root, _, files in os.walk(path):
-                    for fname in files:
-                        ext = os.path.splitext(fname)[1].lower()
-                        if ext in SUPPORTED_FORMATS:
-                            fpath = os.path.join(root, fname)
-                            try:
-                                stat = os.stat(fpath)
-                                images.append({
-                                    "path": fpath,
-                                    "name": fname,
-                                    "size": stat.st_size,
-                                    "modified": int(stat.st_mtime),
-                                })
-                            except Exception:
-                                continue
-                        if len(images) >= MAX_IMAGES:
-                            break
-                    if len(images) >= MAX_IMAGES:
-                        break
-            else:
-                for fname in os.listdir(path):
+    def _do_scan(task: BackgroundTask):
+        images = []
+        if recursive:
+            for root, _, files in os.walk(path):
+                task.check_cancelled()
+                for fname in files:
                     ext = os.path.splitext(fname)[1].lower()
                     if ext in SUPPORTED_FORMATS:
-                        fpath = os.path.join(path, fname)
+                        fpath = os.path.join(root, fname)
                         try:
                             stat = os.stat(fpath)
                             images.append({
@@ -78,40 +54,35 @@ async def start_scan(path: str, recursive: bool = True):
                             continue
                     if len(images) >= MAX_IMAGES:
                         break
-
-            loop.call_soon_threadsafe(
-                queue.put_nowait,
-                {"type": "done", "images": images, "count": len(images)},
-            )
-        except Exception as e:
-            loop.call_soon_threadsafe(
-                queue.put_nowait,
-                {"type": "error", "message": str(e)},
-            )
-
-    loop.run_in_executor(None, _do_scan)
-    return {"task_id": task_id}
+                if len(images) >= MAX_IMAGES:
+                    break
+        else:
+            for fname in os.listdir(path):
+                ext = os.path.splitext(fname)[1].lower()
+                if ext in SUPPORTED_FORMATS:
+                    fpath = os.path.join(path, fname)
+                    try:
+                        stat = os.stat(fpath)
+                        images.append({
+                            "path": fpath,
+                            "name": fname,
+                            "size": stat.st_size,
+                            "modified": int(stat.st_mtime),
+                        })
+                    except Exception:
+                        continue
+                if len(images) >= MAX_IMAGES:
+                    break
+
+        return {"type": "done", "images": images, "count": len(images)}
+
+    task = TaskManager.get_instance().submit("gallery_scan", _do_scan, label=path)
+    return {"task_id": task.task_id}
 
 
 @router.websocket("/scan/ws/{task_id}")
 async def scan_ws(websocket: WebSocket, task_id: str):
-    await websocket.accept()
-    queue = _scan_queues.get(task_id)
-    if queue is None:
-        await websocket.send_json({"type": "error", "message": "task_id 不存在"})
-        await websocket.close()
-        return
-    try:
-        while True:
-            msg = await asyncio.wait_for(queue.get(), timeout=60.0)
-            await websocket.send_json(msg)
-            if msg.get("type") in ("done", "error"):
-                break
-    except (asyncio.TimeoutError, WebSocketDisconnect):
-        pass
-    finally:
-        _scan_queues.pop(task_id, None)
-        await websocket.close()
+    await stream_task(websocket, task_id, timeout=60.0)
 
 
 @router.get("/thumbnail")
@@ -0,0 +1,67 @@
+"""
+后台任务 — 任务列表 / 取消 API，以及各路由共用的 WebSocket 进度推送
+"""
+
+import os
+import sys
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.task_manager import TaskManager
+
+router = APIRouter()
+
+
+async def stream_task(websocket: WebSocket, task_id: str, timeout: float,
+                      timeout_message: Optional[str] = None, missing_message: str = "task_id 不存在"):
+    """
+    把任务队列中的消息推送到 WebSocket，直到终态消息。
+    任务已结束且消息已被读走时（例如断线重连）补发终态消息；
+    timeout_message 为 None 时超时直接关闭连接。
+    """
+    await websocket.accept()
+
+    task = TaskManager.get_instance().get(task_id)
+    if task is None:
+        await websocket.send_json({"type": "error", "message": missing_message})
+        await websocket.close()
+        return
+
+    try:
+        while True:
+            if task.queue.empty() and task.result is not None:
+                await websocket.send_json(task.result)
+                break
+            msg = await asyncio.wait_for(task.queue.get(), timeout=timeout)
+            await websocket.send_json(msg)
+            if msg is task.result:
+                break
+    except asyncio.TimeoutError:
+        if timeout_message is not None:
+            await websocket.send_json({"type": "error", "message": timeout_message})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+
+@router.get("")
+async def list_tasks(kind: Optional[str] = None):
+    """列出当前进行中以及近期结束的后台任务"""
+    return {"tasks": TaskManager.get_instance().list(kind)}
+
+
+@router.post("/{task_id}/cancel")
+async def cancel_task(task_id: str):
+    """取消任务：排队中的任务直接结束，运行中的任务在下一个检查点退出"""
+    if not TaskManager.get_instance().cancel(task_id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return {"success": True}
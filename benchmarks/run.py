@@ -0,0 +1,277 @@
+"""
+遍历 / 扫描 / 删除吞吐量基准测试
+
+在临时目录生成可复现的合成目录树（见 synthetic_trees），分别测量：
+- disk._get_dir_size                 磁盘分析的目录大小统计
+- CleanupScanner.scan                清理扫描（整目录规则与带过滤条件的规则）
+- CleanupScanner._collect_candidates 单个根的候选收集（后来改名为 _scan_path，按当前版本自动选择）
+- _delete_cleanup_path               /api/cleanup/execute 使用的删除路径（引入 DeleteEngine 之后即
+                                     DeleteEngine.delete_path）
+- _delete_path_contents              C 盘体检动作使用的目录清空
+
+被测函数按当前检出版本中实际存在的实现选择，FileFilter / DeleteEngine 等后加入的模块缺失时
+退回旧实现，同一个脚本可以在各个提交上运行并对比结果。
+
+用法（在仓库根目录）：
+    python -m benchmarks.run --scale small --output bench.json
+    python -m benchmarks.run --scale small --compare bench.json   # 吞吐下降超过阈值时返回码为 1
+
+遍历类测试在刚生成的树上运行（元数据已在系统缓存中），测的是遍历器本身的开销；
+删除类测试每轮重新生成目录树，生成耗时不计入。
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, "backend")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from benchmarks.synthetic_trees import SCALES, TREE_KINDS, TreeInfo, build_tree
+from core.cleanup_rules import CleanupRule, CleanupScanner
+from core.disk_cleanup_diagnosis import _delete_path_contents
+
+try:
+    from core.cleanup_rules import FileFilter
+except ImportError:  # 声明式过滤条件之前的版本：过滤规则改用 should_delete 覆盖
+    FileFilter = None
+
+try:
+    from core import delete_engine
+    from core.delete_engine import DeleteEngine
+except ImportError:  # 删除引擎之前的版本：删除走 routers.cleanup._delete_cleanup_path
+    delete_engine = None
+    DeleteEngine = None
+
+try:
+    from routers.disk import _get_dir_size as disk_get_dir_size
+except ImportError:  # 缺少 fastapi 等后端依赖时该项记为错误，其余照常
+    disk_get_dir_size = None
+
+try:
+    from routers.cleanup import _delete_cleanup_path as cleanup_delete_path
+except ImportError:  # 该函数已并入 DeleteEngine，或缺少后端依赖
+    cleanup_delete_path = None
+
+
+# 对比基线时，files/s 下降超过该比例视为回退
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+
+# 带过滤条件的规则命中部分文件，覆盖逐文件匹配的路径
+_BENCH_EXTENSIONS = (".js", ".bin", ".dat")
+
+
+class _BenchRule(CleanupRule):
+    """指向合成目录树的清理规则；filtered=True 时只命中 _BENCH_EXTENSIONS"""
+
+    def __init__(self, name: str, root: str, filtered: bool = False):
+        super().__init__(name=name, description=name, category="cache", risk_level="safe")
+        self.root = root
+        self.filtered = filtered
+        if filtered and FileFilter is not None:
+            self.file_filter = FileFilter(extensions=_BENCH_EXTENSIONS)
+
+    def get_paths(self):
+        return [self.root]
+
+    if FileFilter is None:
+        def should_delete(self, path: str) -> bool:
+            return not self.filtered or path.endswith(_BENCH_EXTENSIONS)
+
+
+def _get_dir_size(info: TreeInfo):
+    if disk_get_dir_size is None:
+        raise RuntimeError("无法导入 routers.disk")
+    disk_get_dir_size(info.root)
+
+
+def _scanner_scan(info: TreeInfo):
+    CleanupScanner([_BenchRule(f"bench-{info.kind}", info.root)]).scan()
+
+
+def _scanner_scan_filtered(info: TreeInfo):
+    CleanupScanner([_BenchRule(f"bench-{info.kind}", info.root, filtered=True)]).scan()
+
+
+def _collect_candidates(info: TreeInfo):
+    """CleanupScanner 的单根候选收集：早期为 _collect_candidates(rule, path)，之后为 _scan_path"""
+    rule = _BenchRule(f"bench-{info.kind}", info.root, filtered=True)
+    scanner = CleanupScanner([rule])
+    collect = getattr(scanner, "_collect_candidates", None)
+    if collect is not None:
+        collect(rule, info.root)
+        return
+    scan_path = scanner._scan_path
+    if len(inspect.signature(scan_path).parameters) >= 3:
+        scan_path(rule, info.root, rule.compile_matcher(time.time()))
+    else:
+        scan_path(rule, info.root)
+
+
+def _delete_cleanup_path(info: TreeInfo):
+    """/api/cleanup/execute 的单路径删除"""
+    if cleanup_delete_path is not None:
+        cleanup_delete_path(info.root)
+    elif DeleteEngine is not None:
+        DeleteEngine().delete_path(info.root)
+    else:
+        raise RuntimeError("无法导入 routers.cleanup")
+
+
+def _delete_path_contents_bench(info: TreeInfo):
+    _delete_path_contents(info.root)
+
+
+# (名称, 函数, 是否破坏目录树)
+BENCHMARKS: list[tuple[str, Callable[[TreeInfo], None], bool]] = [
+    ("get_dir_size", _get_dir_size, False),
+    ("cleanup_scan", _scanner_scan, False),
+    ("cleanup_scan_filtered", _scanner_scan_filtered, False),
+    ("collect_candidates", _collect_candidates, False),
+    ("delete_cleanup_path", _delete_cleanup_path, True),
+    ("delete_path_contents", _delete_path_contents_bench, True),
+]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _measure(fn: Callable[[TreeInfo], None], info: TreeInfo) -> float:
+    started = time.perf_counter()
+    fn(info)
+    return time.perf_counter() - started
+
+
+def run_benchmarks(scale: str, repeat: int, seed: int, workdir: str,
+                   only: Optional[list[str]] = None, kinds: Optional[list[str]] = None) -> dict:
+    spec = SCALES[scale]
+    kinds = kinds or list(TREE_KINDS)
+    selected = [bench for bench in BENCHMARKS if not only or bench[0] in only]
+    results = []
+
+    for kind in kinds:
+        shared_root = os.path.join(workdir, "shared", kind)
+        shared = build_tree(kind, shared_root, spec, seed)
+        print(f"[{kind}] {shared.files} files, {shared.bytes / 1024 ** 2:.1f} MB, {shared.dirs} dirs",
+              file=sys.stderr)
+
+        for name, fn, destructive in selected:
+            timings = []
+            error = ""
+            for round_index in range(repeat):
+                if destructive:
+                    info = build_tree(kind, os.path.join(workdir, f"{name}-{round_index}", kind), spec, seed)
+                else:
+                    info = shared
+                try:
+                    timings.append(_measure(fn, info))
+                except Exception as exc:  # 老版本缺少被测函数时记录原因，其余测试照常进行
+                    error = f"{type(exc).__name__}: {exc}"
+                    break
+                finally:
+                    if destructive:
+                        shutil.rmtree(os.path.dirname(info.root), ignore_errors=True)
+
+            entry = {"benchmark": name, "tree": kind, "files": shared.files, "bytes": shared.bytes}
+            if timings:
+                seconds = statistics.median(timings)
+                entry.update({
+                    "seconds": round(seconds, 6),
+                    "seconds_all": [round(value, 6) for value in timings],
+                    "files_per_second": round(shared.files / seconds, 1) if seconds else None,
+                    "mb_per_second": round(shared.bytes / 1024 ** 2 / seconds, 2) if seconds else None,
+                })
+            if error:
+                entry["error"] = error
+            results.append(entry)
+            print(f"  {name:<24} {entry.get('files_per_second', '-'):>12} files/s "
+                  f"{entry.get('mb_per_second', '-'):>10} MB/s {error}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "scale": scale,
+            "seed": seed,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """返回吞吐下降超过 threshold 的条目描述"""
+    previous = {(item["benchmark"], item["tree"]): item for item in baseline.get("results", [])}
+    regressions = []
+    for item in current["results"]:
+        before = previous.get((item["benchmark"], item["tree"]))
+        if not before or not before.get("files_per_second") or not item.get("files_per_second"):
+            continue
+        change = item["files_per_second"] / before["files_per_second"] - 1
+        line = f"{item['benchmark']}/{item['tree']}: {before['files_per_second']} -> {item['files_per_second']} files/s ({change:+.1%})"
+        print(line, file=sys.stderr)
+        if change < -threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="遍历 / 扫描 / 删除吞吐量基准测试")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", choices=[bench[0] for bench in BENCHMARKS])
+    parser.add_argument("--trees", nargs="*", choices=TREE_KINDS)
+    parser.add_argument("--workdir", help="生成目录树的位置（默认系统临时目录）")
+    parser.add_argument("--output", help="结果 JSON 写入路径（默认输出到 stdout）")
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="wtp-bench-", dir=args.workdir)
+    # 删除引擎会记录实测吞吐量，基准测试写到临时目录，不影响用户的耗时预估
+    if delete_engine is not None and hasattr(delete_engine, "THROUGHPUT_FILE_NAME"):
+        delete_engine._throughput_file = lambda: os.path.join(workdir, delete_engine.THROUGHPUT_FILE_NAME)
+    try:
+        report = run_benchmarks(args.scale, max(1, args.repeat), args.seed, workdir, args.only, args.trees)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 项吞吐下降超过 {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
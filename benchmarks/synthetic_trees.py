@@ -0,0 +1,128 @@
+"""
+基准测试用的合成目录树
+同一 scale + seed 生成的目录结构、文件名与大小完全一致，不同提交之间的结果可以直接对比
+"""
+
+import os
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class TreeSpec:
+    node_modules_packages: int   # node_modules 树的包数量（含嵌套依赖）
+    node_modules_depth: int      # 嵌套 node_modules 的最大层数
+    tiny_files: int              # 小文件树的文件数
+    tiny_files_per_dir: int
+    huge_files: int              # 大文件个数
+    huge_file_mb: int            # 单个大文件大小（MB）
+    long_paths: int              # 深层长路径的分支数
+    long_path_depth: int         # 每个分支的目录层数
+
+
+SCALES = {
+    "small": TreeSpec(200, 3, 20_000, 500, 2, 32, 50, 12),
+    "medium": TreeSpec(2_000, 4, 200_000, 1_000, 4, 128, 200, 16),
+    "large": TreeSpec(10_000, 5, 1_000_000, 1_000, 8, 512, 1_000, 20),
+}
+
+TREE_KINDS = ("node_modules", "tiny_files", "huge_files", "long_paths")
+
+
+@dataclass
+class TreeInfo:
+    kind: str
+    root: str
+    files: int = 0
+    bytes: int = 0
+    dirs: int = 0
+
+
+def _write(info: TreeInfo, path: str, size: int):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    info.files += 1
+    info.bytes += size
+
+
+def _makedirs(info: TreeInfo, path: str):
+    os.makedirs(path, exist_ok=True)
+    info.dirs += 1
+
+
+def _build_node_modules(info: TreeInfo, spec: TreeSpec, rng: random.Random):
+    """模拟 npm 依赖树：每个包含 package.json、若干 js/map 文件，部分包带嵌套 node_modules"""
+    queue = [(os.path.join(info.root, "node_modules"), 0)]
+    remaining = spec.node_modules_packages
+    while queue and remaining > 0:
+        base, depth = queue.pop(0)
+        _makedirs(info, base)
+        for _ in range(min(remaining, rng.randint(5, 40))):
+            remaining -= 1
+            package = os.path.join(base, f"pkg-{remaining:06d}")
+            lib = os.path.join(package, "lib")
+            _makedirs(info, lib)
+            _write(info, os.path.join(package, "package.json"), rng.randint(300, 3_000))
+            _write(info, os.path.join(package, "README.md"), rng.randint(500, 8_000))
+            for index in range(rng.randint(3, 20)):
+                _write(info, os.path.join(lib, f"m{index}.js"), rng.randint(200, 40_000))
+                if rng.random() < 0.5:
+                    _write(info, os.path.join(lib, f"m{index}.js.map"), rng.randint(200, 80_000))
+            if depth + 1 < spec.node_modules_depth and rng.random() < 0.2:
+                queue.append((os.path.join(package, "node_modules"), depth + 1))
+
+
+def _build_tiny_files(info: TreeInfo, spec: TreeSpec, rng: random.Random):
+    """大量 0~4KB 的小文件，按固定数量分目录（类似包管理器缓存）"""
+    for index in range(spec.tiny_files):
+        if index % spec.tiny_files_per_dir == 0:
+            directory = os.path.join(info.root, f"{index // spec.tiny_files_per_dir:04x}")
+            _makedirs(info, directory)
+        _write(info, os.path.join(directory, f"{index:08x}.bin"), rng.randint(0, 4_096))
+
+
+def _build_huge_files(info: TreeInfo, spec: TreeSpec, rng: random.Random):
+    """少量大文件（逐块写入真实数据，避免稀疏文件让删除吞吐失真）"""
+    chunk = b"\0" * (1024 * 1024)
+    _makedirs(info, info.root)
+    for index in range(spec.huge_files):
+        path = os.path.join(info.root, f"huge-{index}.bin")
+        with open(path, "wb") as f:
+            for _ in range(spec.huge_file_mb):
+                f.write(chunk)
+        info.files += 1
+        info.bytes += spec.huge_file_mb * len(chunk)
+    # 大文件旁边放少量小文件，贴近真实的缓存目录
+    for index in range(20):
+        _write(info, os.path.join(info.root, f"meta-{index}.json"), rng.randint(100, 2_000))
+
+
+def _build_long_paths(info: TreeInfo, spec: TreeSpec, rng: random.Random):
+    """深层长目录名分支，完整路径接近 Windows 260 字符限制（不超过，避免依赖长路径支持）"""
+    limit = 240
+    for branch in range(spec.long_paths):
+        path = os.path.join(info.root, f"b{branch:04d}")
+        for depth in range(spec.long_path_depth):
+            name = f"d{depth:02d}-" + "x" * rng.randint(4, 16)
+            if len(os.path.join(path, name, "f00.dat")) > limit:
+                break
+            path = os.path.join(path, name)
+            _makedirs(info, path)
+            for index in range(rng.randint(1, 4)):
+                _write(info, os.path.join(path, f"f{index:02d}.dat"), rng.randint(100, 20_000))
+
+
+_BUILDERS = {
+    "node_modules": _build_node_modules,
+    "tiny_files": _build_tiny_files,
+    "huge_files": _build_huge_files,
+    "long_paths": _build_long_paths,
+}
+
+
+def build_tree(kind: str, root: str, spec: TreeSpec, seed: int = 0) -> TreeInfo:
+    """在 root 下生成指定类型的目录树；同一 (kind, spec, seed) 结果完全一致"""
+    info = TreeInfo(kind, root)
+    os.makedirs(root, exist_ok=True)
+    _BUILDERS[kind](info, spec, random.Random(f"{kind}:{seed}"))
+    return info
@@ -0,0 +1,129 @@
+"""
+多步骤动作执行器
+C 盘体检的清理动作由若干步骤组成（清空目录、调用包管理器命令、启停服务等）。
+步骤之间用 after 声明依赖：没有依赖关系的步骤并发执行（受 workers 限制），
+有依赖的步骤等依赖全部结束后才开始，例如 net stop → 清空下载目录 → net start。
+依赖只约束先后、不要求前一步成功：停止服务失败时依然要把服务启动回来。
+取消后尚未开始的步骤不再执行，但标记了 always_run 的收尾步骤（重新启动服务等）照常执行。
+结果按步骤声明顺序返回，与逐个串行执行时一致。
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+
+# 同时执行的步骤数
+ACTION_WORKERS = int(os.environ.get("TOOLPACK_ACTION_WORKERS", 4))
+
+
+@dataclass(frozen=True)
+class ActionStep:
+    key: str                          # 动作内唯一
+    label: str
+    run: Callable[[], dict[str, Any]]
+    after: tuple[str, ...] = ()       # 必须先结束的步骤
+    always_run: bool = False          # 收尾步骤：取消后依然执行
+
+
+def _check_graph(steps: list[ActionStep]):
+    """检查步骤键唯一、依赖存在且无环"""
+    keys = [step.key for step in steps]
+    if len(set(keys)) != len(keys):
+        raise ValueError("步骤键重复")
+    known = set(keys)
+    waiting = {}
+    for step in steps:
+        missing = [key for key in step.after if key not in known]
+        if missing:
+            raise ValueError(f"步骤 {step.key} 依赖不存在的步骤：{', '.join(missing)}")
+        waiting[step.key] = set(step.after)
+    while waiting:
+        ready = [key for key, deps in waiting.items() if not deps]
+        if not ready:
+            raise ValueError(f"步骤依赖存在环：{', '.join(waiting)}")
+        for key in ready:
+            del waiting[key]
+        for deps in waiting.values():
+            deps.difference_update(ready)
+
+
+def _placeholder(step: ActionStep, status: str, message: str) -> dict[str, Any]:
+    """未执行或执行出错的步骤结果；字节数字段置零，汇总时与正常结果同样累加"""
+    return {"label": step.label, "status": status, "message": message, "freed_bytes": 0, "freed_gb": 0}
+
+
+class ActionExecutor:
+    """
+    按依赖关系并发执行动作步骤
+
+    - workers：同时执行的步骤数
+    - cancel_event：置位后不再开始新步骤，尚未开始的步骤记为 skipped（always_run 的步骤除外）
+    - on_start(step) / on_finish(step, result, seconds)：在执行步骤的线程中回调
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+        on_start: Optional[Callable[[ActionStep], None]] = None,
+        on_finish: Optional[Callable[[ActionStep, dict[str, Any], float], None]] = None,
+    ):
+        self.workers = max(1, workers or ACTION_WORKERS)
+        self.cancel_event = cancel_event
+        self.on_start = on_start
+        self.on_finish = on_finish
+
+    def cancelled(self) -> bool:
+        return bool(self.cancel_event and self.cancel_event.is_set())
+
+    def run(self, steps: Iterable[ActionStep]) -> list[dict[str, Any]]:
+        steps = list(steps)
+        _check_graph(steps)
+        by_key = {step.key: step for step in steps}
+        waiting = {step.key: set(step.after) for step in steps}
+        results: dict[str, dict[str, Any]] = {}
+        running: dict[Future, str] = {}
+
+        def release(key: str):
+            for deps in waiting.values():
+                deps.discard(key)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while waiting or running:
+                # 按声明顺序启动已就绪的步骤；取消后跳过的步骤会立即解除后续依赖
+                while True:
+                    ready = [step.key for step in steps if step.key in waiting and not waiting[step.key]]
+                    if not ready:
+                        break
+                    for key in ready:
+                        del waiting[key]
+                        if self.cancelled() and not by_key[key].always_run:
+                            results[key] = _placeholder(by_key[key], "skipped", "已取消")
+                            release(key)
+                        else:
+                            running[pool.submit(self._run_step, by_key[key])] = key
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    results[key] = future.result()
+                    release(key)
+
+        return [results[step.key] for step in steps]
+
+    def _run_step(self, step: ActionStep) -> dict[str, Any]:
+        if self.on_start:
+            self.on_start(step)
+        started = time.monotonic()
+        try:
+            result = step.run()
+        except Exception as exc:  # 单个步骤出错不影响其余步骤
+            result = _placeholder(step, "failed", str(exc))
+        if self.on_finish:
+            self.on_finish(step, result, time.monotonic() - started)
+        return result
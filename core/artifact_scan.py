@@ -0,0 +1,357 @@
+"""
+项目构建产物扫描配置
+扫描哪些项目根、识别哪些产物目录、遍历深度和并发数都来自配置文件（配置目录下的 JSON），
+清理规则（cleanup_rules）与 C 盘体检的探测项（disk_cleanup_diagnosis）都由这份配置生成。
+默认配置与原先写死的 D 盘规则一致；根目录不存在时不做任何遍历。
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from core.project_index import (ARTIFACT_NAMES, DEFAULT_MAX_DEPTH, DEFAULT_SKIP_DIRS, D_PROJECTS_ROOT,
+                                ProjectArtifact, ProjectIndex, name_matcher)
+from core.system_detector import SystemConfig
+
+
+SETTINGS_FILE_NAME = "artifact_scan_settings.json"
+
+# 同时遍历的项目根数
+DEFAULT_PARALLELISM = 4
+MAX_PARALLELISM = 32
+MAX_DEPTH_LIMIT = 32
+
+RISK_LEVELS = ("safe", "low", "medium", "high")
+# 生成的规则加入哪个规则集（get_extended_cleanup_rules / get_aggressive_cleanup_rules）
+RULE_SETS = ("extended", "aggressive")
+
+DEFAULT_ARTIFACT_SCAN_SETTINGS: dict[str, Any] = {
+    "roots": [D_PROJECTS_ROOT],
+    "max_depth": DEFAULT_MAX_DEPTH,
+    "parallelism": DEFAULT_PARALLELISM,
+    "skip_dirs": sorted(DEFAULT_SKIP_DIRS),
+    # 在各项目根下按目录名查找的构建产物
+    "artifacts": [
+        {
+            "rule_name": "D盘 Rust/Tauri target",
+            "patterns": ["target"],
+            "label": "Rust/Tauri target",
+            "description": "D:\\Projects 下可重建的 Rust/Tauri target 构建产物",
+            "details": "Rust/Tauri 构建产物，可由 cargo/tauri 重新生成。",
+            "category": "D盘构建缓存",
+            "risk": "low",
+            "rule_set": "extended",
+        },
+    ],
+    # 固定路径的缓存目录
+    "paths": [
+        {
+            "rule_name": "D盘 visualize_ta 部署产物",
+            "description": "D:\\Projects\\visualize_ta\\deploy 下的 .stage 暂存包和 releases 历史包",
+            "category": "D盘缓存",
+            "risk": "medium",
+            "rule_set": "aggressive",
+            "items": [
+                {
+                    "path": r"D:\Projects\visualize_ta\deploy\.stage",
+                    "label": "visualize_ta 上传暂存包",
+                    "details": "上传/部署过程产生的暂存软件包，确认没有任务正在使用时可清理。",
+                },
+                {
+                    "path": r"D:\Projects\visualize_ta\deploy\releases",
+                    "label": "visualize_ta 历史 release 包",
+                    "details": "已生成的历史发布包，删除后不影响源码，但历史安装包需要重新打包。",
+                },
+            ],
+        },
+        {
+            "rule_name": "D盘 企业微信缓存",
+            "description": "D:\\tmp\\WXWork 下的企业微信文件缓存、CEF 缓存和临时数据",
+            "category": "D盘缓存",
+            "risk": "medium",
+            "rule_set": "extended",
+            "items": [
+                {
+                    "path": r"D:\tmp\WXWork",
+                    "label": "企业微信 D盘缓存",
+                    "details": "企业微信文件缓存、CEF 缓存和临时数据，正在下载或打开的文件可能被占用。",
+                },
+            ],
+        },
+    ],
+    # Android Emulator system images 所在目录（每个子目录是一个镜像）；体积大但只提示，不自动清理
+    "android_system_images": [r"D:\Software\SDK\system-images"],
+}
+
+
+@dataclass(frozen=True)
+class ArtifactSpec:
+    """一类构建产物：生成一条清理规则，每个找到的目录生成一个探测项"""
+    rule_name: str
+    patterns: tuple[str, ...]
+    label: str
+    description: str
+    details: str
+    category: str      # 体检探测项的分类
+    risk: str
+    rule_set: str
+
+
+@dataclass(frozen=True)
+class CachePath:
+    path: str
+    label: str
+    details: str
+
+
+@dataclass(frozen=True)
+class CachePathGroup:
+    """一组固定路径：生成一条清理规则，每个存在的路径生成一个探测项"""
+    rule_name: str
+    description: str
+    category: str
+    risk: str
+    rule_set: str
+    items: tuple[CachePath, ...]
+
+
+@dataclass(frozen=True)
+class ArtifactScanConfig:
+    roots: tuple[str, ...]
+    max_depth: int
+    parallelism: int
+    skip_dirs: tuple[str, ...]
+    artifacts: tuple[ArtifactSpec, ...]
+    paths: tuple[CachePathGroup, ...]
+    android_system_images: tuple[str, ...] = ()
+
+    @property
+    def patterns(self) -> frozenset[str]:
+        """全部产物目录名；遍历时还会在默认产物目录处停下，与其他规则共用同一份索引"""
+        return frozenset(pattern for spec in self.artifacts for pattern in spec.patterns)
+
+
+def _text(data: dict, key: str, default: str = "") -> str:
+    value = data.get(key, default)
+    if not isinstance(value, str):
+        raise ValueError(f"{key} 必须是字符串")
+    return value.strip()
+
+
+def _choice(data: dict, key: str, choices: tuple[str, ...], default: str) -> str:
+    value = _text(data, key, default) or default
+    if value not in choices:
+        raise ValueError(f"{key} 只能是 {', '.join(choices)}")
+    return value
+
+
+def _text_list(value: Any, key: str) -> tuple[str, ...]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{key} 必须是字符串列表")
+    return tuple(dict.fromkeys(item.strip() for item in value if item.strip()))
+
+
+def _int(data: dict, key: str, default: int, low: int, high: int) -> int:
+    value = data.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{key} 必须是整数")
+    if not low <= value <= high:
+        raise ValueError(f"{key} 应在 {low}~{high} 之间")
+    return value
+
+
+def parse_artifact_scan_settings(data: dict) -> ArtifactScanConfig:
+    """校验并解析配置；格式不对时抛出 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("配置必须是对象")
+    rule_names: set[str] = set()
+
+    def rule_name(entry: dict) -> str:
+        name = _text(entry, "rule_name")
+        if not name:
+            raise ValueError("rule_name 不能为空")
+        if name in rule_names:
+            raise ValueError(f"规则名重复：{name}")
+        rule_names.add(name)
+        return name
+
+    artifacts = []
+    for entry in data.get("artifacts", []):
+        if not isinstance(entry, dict):
+            raise ValueError("artifacts 的每一项必须是对象")
+        patterns = _text_list(entry.get("patterns", []), "patterns")
+        if not patterns:
+            raise ValueError("patterns 不能为空")
+        name = rule_name(entry)
+        artifacts.append(ArtifactSpec(
+            rule_name=name,
+            patterns=patterns,
+            label=_text(entry, "label") or patterns[0],
+            description=_text(entry, "description") or name,
+            details=_text(entry, "details"),
+            category=_text(entry, "category") or "构建缓存",
+            risk=_choice(entry, "risk", RISK_LEVELS, "low"),
+            rule_set=_choice(entry, "rule_set", RULE_SETS, "extended"),
+        ))
+
+    groups = []
+    for entry in data.get("paths", []):
+        if not isinstance(entry, dict):
+            raise ValueError("paths 的每一项必须是对象")
+        items = []
+        for item in entry.get("items", []):
+            if not isinstance(item, dict) or not _text(item, "path"):
+                raise ValueError("items 的每一项必须包含 path")
+            path = _text(item, "path")
+            items.append(CachePath(path, _text(item, "label") or os.path.basename(path), _text(item, "details")))
+        name = rule_name(entry)
+        groups.append(CachePathGroup(
+            rule_name=name,
+            description=_text(entry, "description") or name,
+            category=_text(entry, "category") or "缓存",
+            risk=_choice(entry, "risk", RISK_LEVELS, "medium"),
+            rule_set=_choice(entry, "rule_set", RULE_SETS, "extended"),
+            items=tuple(items),
+        ))
+
+    return ArtifactScanConfig(
+        roots=_text_list(data.get("roots", []), "roots"),
+        max_depth=_int(data, "max_depth", DEFAULT_MAX_DEPTH, 1, MAX_DEPTH_LIMIT),
+        parallelism=_int(data, "parallelism", DEFAULT_PARALLELISM, 1, MAX_PARALLELISM),
+        skip_dirs=_text_list(data.get("skip_dirs", []), "skip_dirs"),
+        artifacts=tuple(artifacts),
+        paths=tuple(groups),
+        android_system_images=_text_list(data.get("android_system_images", []), "android_system_images"),
+    )
+
+
+def _settings_file() -> str:
+    return os.path.join(SystemConfig.get_config_dir(), SETTINGS_FILE_NAME)
+
+
+def load_artifact_scan_settings() -> dict[str, Any]:
+    """读取配置原文（缺省字段取默认值）"""
+    settings = json.loads(json.dumps(DEFAULT_ARTIFACT_SCAN_SETTINGS))
+    try:
+        with open(_settings_file(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            settings.update({key: value for key, value in data.items() if key in settings})
+    except (OSError, ValueError):
+        pass
+    return settings
+
+
+def save_artifact_scan_settings(update: dict[str, Any]) -> dict[str, Any]:
+    """合并并保存配置；校验失败时抛出 ValueError，不写文件"""
+    settings = load_artifact_scan_settings()
+    settings.update({key: value for key, value in update.items() if key in settings})
+    parse_artifact_scan_settings(settings)
+    path = _settings_file()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(settings, f, ensure_ascii=False, indent=2)
+    global _config_cache
+    with _config_lock:
+        _config_cache = None
+    return settings
+
+
+_config_lock = threading.Lock()
+_config_cache: Optional[tuple[Optional[int], ArtifactScanConfig]] = None
+
+
+def get_artifact_scan_config() -> ArtifactScanConfig:
+    """解析后的配置，按配置文件 mtime 缓存；文件内容无效时退回默认配置"""
+    global _config_cache
+    try:
+        mtime: Optional[int] = os.stat(_settings_file()).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _config_lock:
+        if _config_cache is not None and _config_cache[0] == mtime:
+            return _config_cache[1]
+    try:
+        config = parse_artifact_scan_settings(load_artifact_scan_settings())
+    except ValueError:
+        config = parse_artifact_scan_settings(DEFAULT_ARTIFACT_SCAN_SETTINGS)
+    with _config_lock:
+        _config_cache = (mtime, config)
+    return config
+
+
+def scan_artifacts(config: Optional[ArtifactScanConfig] = None,
+                   spec: Optional[ArtifactSpec] = None) -> list[ProjectArtifact]:
+    """
+    并发遍历全部项目根（每个根内部再用并行遍历器），返回命中 spec（None 表示全部产物类型）的目录。
+    结果来自 ProjectIndex，根下目录没有变化时不会重新遍历。
+    """
+    config = config or get_artifact_scan_config()
+    patterns = spec.patterns if spec else config.patterns
+    roots = [root for root in config.roots if os.path.isdir(root)]
+    if not roots or not patterns:
+        return []
+
+    index = ProjectIndex.get_instance()
+    stop = ARTIFACT_NAMES | config.patterns
+
+    def scan_root(root: str) -> list[ProjectArtifact]:
+        return index.artifacts([root], names=patterns, max_depth=config.max_depth,
+                               skip_dirs=config.skip_dirs, artifact_names=stop)
+
+    if len(roots) == 1 or config.parallelism <= 1:
+        per_root = [scan_root(root) for root in roots]
+    else:
+        with ThreadPoolExecutor(max_workers=min(config.parallelism, len(roots))) as pool:
+            per_root = list(pool.map(scan_root, roots))
+    return sorted((artifact for artifacts in per_root for artifact in artifacts), key=lambda artifact: artifact.path)
+
+
+def artifact_matches(spec: ArtifactSpec, path: str) -> bool:
+    return name_matcher(spec.patterns)(os.path.basename(os.path.normpath(path)))
+
+
+def existing_cache_paths(group: CachePathGroup) -> list[CachePath]:
+    return [item for item in group.items if os.path.isdir(item.path)]
+
+
+def existing_android_image_dirs(config: Optional[ArtifactScanConfig] = None) -> list[str]:
+    """配置中存在的 Android 模拟器镜像目录"""
+    config = config or get_artifact_scan_config()
+    return [path for path in config.android_system_images if os.path.isdir(path)]
+
+
+def cleanup_labels(config: Optional[ArtifactScanConfig] = None) -> list[str]:
+    """配置内可清理内容的名称（产物类型 + 固定路径），用于汇总提示"""
+    config = config or get_artifact_scan_config()
+    labels = [spec.label for spec in config.artifacts]
+    labels.extend(item.label for group in config.paths for item in group.items)
+    return list(dict.fromkeys(labels))
+
+
+def cleanup_commands(config: Optional[ArtifactScanConfig] = None) -> list[str]:
+    """与配置等价的手动清理 PowerShell 命令"""
+    config = config or get_artifact_scan_config()
+    commands = []
+    for spec in config.artifacts:
+        for root in config.roots:
+            for pattern in spec.patterns:
+                commands.append(f"Get-ChildItem {root} -Directory -Recurse -Depth {config.max_depth} "
+                                f"-Filter {pattern} | Remove-Item -Recurse -Force")
+    for group in config.paths:
+        for item in group.items:
+            contents = item.path.rstrip("\\/") + "\\*"
+            commands.append(f"Remove-Item {contents} -Recurse -Force")
+    return commands
+
+
+def configured_cleanup_paths(config: Optional[ArtifactScanConfig] = None) -> list[str]:
+    """配置内全部可清理目录：扫描到的产物目录 + 存在的固定路径"""
+    config = config or get_artifact_scan_config()
+    paths = [artifact.path for artifact in scan_artifacts(config)]
+    for group in config.paths:
+        paths.extend(item.path for item in existing_cache_paths(group))
+    return [path for path in paths if os.path.isdir(path)]
@@ -0,0 +1,545 @@
+"""
+开发缓存迁移引擎
+把已有缓存目录的内容搬到新位置（如 C 盘的 npm / pnpm / pip / Hugging Face 缓存 → D:\\DevCache）：
+- 源与目标在同一卷时直接 rename，不复制数据；
+- 跨卷时多线程分块复制，复制时计算源文件哈希，写完后重读目标文件比对，一致才算迁移成功；
+- 已校验的文件记录在检查点里，中断后再次迁移只处理剩余文件；
+- 符号链接在目标位置按原链接内容重建（指向源目录内部的绝对链接改指目标内的对应位置）；
+- 全部文件迁移成功后才释放源目录：只删除已校验过的文件（大小与 mtime 未变）与已重建的链接，再清理空目录；
+  遍历时无法读取的目录或条目同样算作失败，有任何失败时源目录保持原样（同卷时不做任何改名）。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from core.delete_engine import LOCKED_SAMPLE_LIMIT, DeleteEngine, DeleteResult
+from core.fs_walker import ParallelWalker
+from core.system_detector import SystemConfig
+
+
+# 同时复制 / rename 的文件数
+MIGRATION_WORKERS = int(os.environ.get("TOOLPACK_MIGRATION_WORKERS", 4))
+# 分块复制的块大小
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+# 检查点与进度的最短写入 / 推送间隔（秒）
+CHECKPOINT_INTERVAL = 2.0
+PROGRESS_INTERVAL = 0.5
+
+CHECKPOINT_DIR_NAME = "cache_migration"
+# 复制中的临时文件后缀，校验通过后才改名为正式文件名
+PART_SUFFIX = ".toolpack-part"
+
+
+@dataclass
+class MigrationResult:
+    source: str
+    target: str
+    method: str = ""             # rename：同卷改名；copy：跨卷复制并校验
+    status: str = "done"         # done / partial / failed / skipped
+    files_total: int = 0
+    bytes_total: int = 0
+    files_moved: int = 0         # 本次迁移成功的文件（含检查点里已完成的）
+    bytes_moved: int = 0
+    files_resumed: int = 0       # 检查点里已校验、本次跳过的文件
+    files_failed: int = 0
+    bytes_copied: int = 0        # 本次实际写入目标的字节数
+    freed_bytes: int = 0         # 源目录释放的字节数（同卷改名时为 0）
+    seconds: float = 0.0
+    cancelled: bool = False
+    failures: list[dict] = field(default_factory=list)
+    message: str = ""
+
+    @property
+    def bytes_per_second(self) -> float:
+        return round(self.bytes_copied / self.seconds, 1) if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "target": self.target,
+            "method": self.method,
+            "status": self.status,
+            "files_total": self.files_total,
+            "bytes_total": self.bytes_total,
+            "files_moved": self.files_moved,
+            "bytes_moved": self.bytes_moved,
+            "files_resumed": self.files_resumed,
+            "files_failed": self.files_failed,
+            "freed_bytes": self.freed_bytes,
+            "seconds": round(self.seconds, 3),
+            "bytes_per_second": self.bytes_per_second,
+            "cancelled": self.cancelled,
+            "failures": self.failures,
+            "message": self.message,
+        }
+
+
+def _normalized(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _inside(path: str, parent: str) -> bool:
+    path, parent = _normalized(path), _normalized(parent)
+    return path == parent or path.startswith(parent.rstrip(os.sep) + os.sep)
+
+
+def same_volume(source: str, target: str) -> bool:
+    """target 可以尚不存在，按最近的已存在上级目录判断"""
+    probe = os.path.abspath(target)
+    while not os.path.exists(probe):
+        parent = os.path.dirname(probe)
+        if parent == probe:
+            return False
+        probe = parent
+    try:
+        return os.stat(source).st_dev == os.stat(probe).st_dev
+    except OSError:
+        return False
+
+
+def _file_digest(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.digest()
+
+
+class _Checkpoint:
+    """已校验文件的记录：相对路径 -> [大小, 源文件 mtime_ns]；源文件变化后对应记录失效"""
+
+    def __init__(self, source: str, target: str):
+        key = hashlib.sha1(f"{_normalized(source)}|{_normalized(target)}".encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(SystemConfig.get_config_dir(), CHECKPOINT_DIR_NAME, f"{key}.json")
+        self.source = source
+        self.target = target
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        self.files: dict[str, list[int]] = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if _normalized(data.get("source", "")) == _normalized(source):
+                self.files = {rel: list(value) for rel, value in data.get("files", {}).items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            pass
+
+    def verified(self, rel: str, size: int, mtime_ns: int) -> bool:
+        with self._lock:
+            return self.files.get(rel) == [size, mtime_ns]
+
+    def add(self, rel: str, size: int, mtime_ns: int):
+        with self._lock:
+            self.files[rel] = [size, mtime_ns]
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= CHECKPOINT_INTERVAL
+        if due:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"source": self.source, "target": self.target, "files": dict(self.files)}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp = self.path + ".tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp, self.path)
+        except OSError:
+            pass
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+@dataclass(frozen=True)
+class _SourceFile:
+    rel: str
+    size: int
+    mtime_ns: int
+    link: str = ""      # 符号链接的链接内容（os.readlink）；普通文件为空
+
+
+def _link_value(source: str, target: str, value: str) -> str:
+    """目标位置的链接内容：相对链接原样保留，指向源目录内部的绝对链接改指目标内的对应位置"""
+    if os.path.isabs(value) and _inside(value, source):
+        return os.path.join(target, os.path.relpath(value, source))
+    return value
+
+
+class CacheMigrator:
+    """
+    缓存目录迁移
+
+    - workers：同时处理的文件数
+    - cancel_event：置位后不再开始新文件；已迁移的部分保留在检查点，下次继续
+    - progress_callback(snapshot)：最多每 PROGRESS_INTERVAL 秒调用一次（在工作线程中），
+      snapshot 为 {"source", "target", "method", "files_done", "files_total", "bytes_done",
+      "bytes_total", "bytes_copied", "bytes_per_second"}；bytes_done 只计已完成校验的文件，
+      bytes_copied 含正在复制的大文件已写入的部分
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        chunk_size: int = COPY_CHUNK_SIZE,
+    ):
+        self.workers = max(1, workers or MIGRATION_WORKERS)
+        self.cancel_event = cancel_event
+        self.progress_callback = progress_callback
+        self.chunk_size = max(64 * 1024, chunk_size)
+        self._lock = threading.Lock()
+
+    def cancelled(self) -> bool:
+        return bool(self.cancel_event and self.cancel_event.is_set())
+
+    # ── 对外接口 ──────────────────────────────────────────────────────────────
+
+    def migrate(self, source: str, target: str) -> MigrationResult:
+        """把 source 目录下的全部内容迁到 target（target 已有的同名文件需内容一致）"""
+        started = time.monotonic()
+        result = MigrationResult(source, target)
+        if not source or not os.path.isdir(source):
+            result.status = "skipped"
+            result.message = "源目录不存在"
+            return result
+        if _inside(target, source) or _inside(source, target):
+            result.status = "failed"
+            result.message = "源目录与目标目录不能互相包含"
+            return result
+        try:
+            os.makedirs(target, exist_ok=True)
+        except OSError as exc:
+            result.status = "failed"
+            result.message = f"无法创建目标目录：{exc}"
+            return result
+
+        files, others, unreadable = self._collect(source)
+        result.files_total = len(files)
+        result.bytes_total = sum(item.size for item in files)
+        for path in others[:LOCKED_SAMPLE_LIMIT]:
+            result.failures.append({"path": path, "error": "不支持迁移的条目（设备文件等）"})
+        for path, error in unreadable[:LOCKED_SAMPLE_LIMIT - len(result.failures)]:
+            result.failures.append({"path": path, "error": f"无法读取：{error}"})
+        # 没列举到的文件既没复制也没校验，源目录不能释放
+        result.files_failed = len(others) + len(unreadable)
+
+        self._result = result
+        self._verified: set[_SourceFile] = set()
+        self._started = started
+        self._reported_at = 0.0
+        if same_volume(source, target):
+            result.method = "rename"
+            # 改名会直接搬走源目录里的内容；有条目没列举到时一项也不动，保证源目录原样
+            if not result.files_failed:
+                self._rename_tree(source, target, files)
+        else:
+            result.method = "copy"
+            self._copy_tree(source, target, files)
+        result.cancelled = self.cancelled()
+        self._report(force=True)
+
+        if result.cancelled or result.files_failed:
+            result.status = "partial" if result.files_moved else "failed"
+            if result.method == "copy" or not result.files_moved:
+                remark = "源目录保持不变，再次执行会从中断处继续。"
+            else:
+                remark = "已改名的文件已在目标位置，其余文件留在源目录，再次执行会继续迁移。"
+            result.message = (
+                f"已迁移 {result.files_moved}/{result.files_total} 个文件，"
+                + ("已取消" if result.cancelled else f"{result.files_failed} 个失败")
+                + "；" + remark
+            )
+        else:
+            cleared = self._release_source(source)
+            result.freed_bytes = cleared.freed_bytes
+            try:
+                with os.scandir(source) as entries:
+                    leftover = sum(1 for _ in entries)
+            except OSError:
+                leftover = 0
+            if cleared.files_failed or cleared.error:
+                result.status = "partial"
+                result.message = f"迁移已完成并校验，但源目录有 {cleared.files_failed} 个文件未能删除。"
+            elif leftover:
+                result.message = (f"已迁移 {result.files_moved} 个文件到 {target}；"
+                                  f"源目录中迁移开始后新增或被修改的 {leftover} 项已保留。")
+            else:
+                result.message = f"已迁移 {result.files_moved} 个文件到 {target}。"
+            _Checkpoint(source, target).remove()
+        result.seconds = time.monotonic() - started
+        return result
+
+    # ── 内部实现 ──────────────────────────────────────────────────────────────
+
+    def _collect(self, source: str) -> tuple[list[_SourceFile], list[str], list[tuple[str, str]]]:
+        """(普通文件与符号链接, 不支持的条目, 无法读取的 (路径, 错误))"""
+        lock = threading.Lock()
+        files: list[_SourceFile] = []
+        others: list[str] = []
+        unreadable: list[tuple[str, str]] = []
+
+        def on_file(_root, entry, st):
+            with lock:
+                files.append(_SourceFile(os.path.relpath(entry.path, source), st.st_size, st.st_mtime_ns))
+
+        def on_other(_root, entry):
+            if not entry.is_symlink():
+                with lock:
+                    others.append(entry.path)
+                return
+            try:
+                item = _SourceFile(os.path.relpath(entry.path, source), 0,
+                                   entry.stat(follow_symlinks=False).st_mtime_ns, os.readlink(entry.path))
+            except OSError as exc:
+                on_error(_root, entry.path, exc)
+                return
+            with lock:
+                files.append(item)
+
+        def on_error(_root, path, exc):
+            with lock:
+                unreadable.append((path, str(exc)))
+
+        ParallelWalker(workers=self.workers, on_file=on_file, on_other=on_other, on_error=on_error,
+                       cancel_event=self.cancel_event).walk([source])
+        files.sort(key=lambda item: item.rel)
+        return files, sorted(others), sorted(unreadable)
+
+    def _release_source(self, source: str) -> DeleteResult:
+        """
+        只删除本次确认已在目标就位的文件（大小与 mtime 与收集时一致）和已重建的链接（链接内容未变）；
+        收集之后新增或被修改的文件保留，所在目录随之保留，其余空目录清理掉（同卷改名后只剩空目录）
+        """
+        verified = {(item.rel, item.size, item.mtime_ns) for item in self._verified if not item.link}
+        links = {item.rel: item.link for item in self._verified if item.link}
+
+        def moved(path: str, st: os.stat_result) -> bool:
+            rel = os.path.relpath(path, source)
+            if stat.S_ISLNK(st.st_mode):
+                try:
+                    return links.get(rel) == os.readlink(path)
+                except OSError:
+                    return False
+            return (rel, st.st_size, st.st_mtime_ns) in verified
+
+        engine = DeleteEngine(workers=self.workers, cancel_event=self.cancel_event, file_filter=moved)
+        # 带过滤条件清空目录时链接一律保留，已重建的链接先逐个删除
+        result = DeleteResult(source)
+        for rel in sorted(links):
+            path = os.path.join(source, rel)
+            if os.path.islink(path):
+                result.merge(engine.delete_path(path))
+        cleared = engine.clear_directory(source)
+        result.merge(cleared)
+        result.error = cleared.error
+        return result
+
+    def _rename_tree(self, source: str, target: str, files: list[_SourceFile]):
+        """同卷：目标为空时整项改名顶层条目，否则逐文件改名（目标已有的同名文件需内容一致）"""
+        try:
+            with os.scandir(target) as entries:
+                target_empty = next(entries, None) is None
+        except OSError:
+            target_empty = False
+
+        remaining = files
+        if target_empty:
+            by_top: dict[str, list[_SourceFile]] = {}
+            for item in files:
+                by_top.setdefault(item.rel.split(os.sep, 1)[0], []).append(item)
+            remaining = []
+            try:
+                with os.scandir(source) as entries:
+                    names = [entry.name for entry in entries]
+            except OSError:
+                names = []
+            for name in names:
+                if self.cancelled():
+                    break
+                moved = by_top.pop(name, [])
+                if any(item.link and _link_value(source, target, item.link) != item.link for item in moved):
+                    remaining.extend(moved)   # 含需要改写的绝对链接，逐项处理
+                    continue
+                try:
+                    os.rename(os.path.join(source, name), os.path.join(target, name))
+                except OSError:
+                    remaining.extend(moved)   # 被占用等原因整项改名失败时退回逐文件处理
+                    continue
+                self._done(moved)
+            for items in by_top.values():
+                remaining.extend(items)
+
+        self._run_parallel(remaining, lambda item: self._rename_file(source, target, item))
+
+    def _rename_file(self, source: str, target: str, item: _SourceFile):
+        if item.link:
+            self._place_link(source, target, item)
+            return
+        src = os.path.join(source, item.rel)
+        dst = os.path.join(target, item.rel)
+        if os.path.lexists(dst):
+            self._accept_existing(src, dst, item)
+            return
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.rename(src, dst)
+        self._done([item])
+
+    def _copy_tree(self, source: str, target: str, files: list[_SourceFile]):
+        checkpoint = _Checkpoint(source, target)
+        try:
+            self._run_parallel(files, lambda item: self._copy_file(source, target, item, checkpoint))
+        finally:
+            checkpoint.save()
+
+    def _copy_file(self, source: str, target: str, item: _SourceFile, checkpoint: _Checkpoint):
+        if item.link:
+            self._place_link(source, target, item)
+            return
+        src = os.path.join(source, item.rel)
+        dst = os.path.join(target, item.rel)
+        if checkpoint.verified(item.rel, item.size, item.mtime_ns) and self._size(dst) == item.size:
+            with self._lock:
+                self._result.files_resumed += 1
+            self._done([item])
+            return
+        if os.path.lexists(dst):
+            if self._accept_existing(src, dst, item):
+                checkpoint.add(item.rel, item.size, item.mtime_ns)
+            return
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        part = dst + PART_SUFFIX
+        digest = hashlib.sha256()
+        try:
+            with open(src, "rb") as reader, open(part, "wb") as writer:
+                while chunk := reader.read(self.chunk_size):
+                    if self.cancelled():
+                        raise InterruptedError("已取消")
+                    digest.update(chunk)
+                    writer.write(chunk)
+                    self._copied(len(chunk))
+                writer.flush()
+                os.fsync(writer.fileno())
+            if _file_digest(part) != digest.digest():
+                raise OSError("目标文件校验失败")
+            st = os.stat(src)
+            if st.st_size != item.size or st.st_mtime_ns != item.mtime_ns:
+                raise OSError("复制期间源文件被修改")
+            shutil.copystat(src, part)
+            os.replace(part, dst)
+        except BaseException:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            raise
+        checkpoint.add(item.rel, item.size, item.mtime_ns)
+        self._done([item])
+
+    def _place_link(self, source: str, target: str, item: _SourceFile):
+        """在目标位置重建符号链接（源链接随源目录一起释放）；目标已有内容相同的链接视为已迁移"""
+        src = os.path.join(source, item.rel)
+        dst = os.path.join(target, item.rel)
+        value = _link_value(source, target, item.link)
+        if os.path.lexists(dst):
+            if os.path.islink(dst) and os.readlink(dst) == value:
+                self._done([item])
+            else:
+                self._failed(src, "目标位置已存在内容不同的同名条目")
+            return
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.symlink(value, dst, target_is_directory=os.path.isdir(src))
+        self._done([item])
+
+    def _accept_existing(self, src: str, dst: str, item: _SourceFile) -> bool:
+        """目标已存在同名文件：内容一致视为已迁移（源文件随源目录一起释放），否则记为失败"""
+        if self._size(dst) == item.size and _file_digest(dst) == _file_digest(src):
+            self._done([item])
+            return True
+        self._failed(src, "目标位置已存在内容不同的同名文件")
+        return False
+
+    def _run_parallel(self, items: list[_SourceFile], fn: Callable[[_SourceFile], None]):
+        def run(item: _SourceFile):
+            if self.cancelled():
+                return
+            try:
+                fn(item)
+            except InterruptedError:
+                pass
+            except OSError as exc:
+                self._failed(os.path.join(self._result.source, item.rel), str(exc))
+
+        if self.workers == 1 or len(items) <= 1:
+            for item in items:
+                run(item)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(run, items, chunksize=64))
+
+    @staticmethod
+    def _size(path: str) -> int:
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return -1
+
+    def _copied(self, size: int):
+        with self._lock:
+            self._result.bytes_copied += size
+        self._report()
+
+    def _done(self, items: list[_SourceFile]):
+        with self._lock:
+            self._verified.update(items)
+            self._result.files_moved += len(items)
+            self._result.bytes_moved += sum(item.size for item in items)
+        self._report()
+
+    def _failed(self, path: str, error: str):
+        with self._lock:
+            self._result.files_failed += 1
+            if len(self._result.failures) < LOCKED_SAMPLE_LIMIT:
+                self._result.failures.append({"path": path, "error": error})
+
+    def _report(self, force: bool = False):
+        if not self.progress_callback:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._reported_at < PROGRESS_INTERVAL:
+                return
+            self._reported_at = now
+            result = self._result
+            elapsed = now - self._started
+            snapshot = {
+                "source": result.source,
+                "target": result.target,
+                "method": result.method,
+                "files_done": result.files_moved,
+                "files_total": result.files_total,
+                "bytes_done": result.bytes_moved,
+                "bytes_total": result.bytes_total,
+                "bytes_copied": result.bytes_copied,
+                "bytes_per_second": round(result.bytes_copied / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+        self.progress_callback(snapshot)
@@ -3,15 +3,66 @@
 定义可以安全清理的文件和文件夹
 """
 
+import fnmatch
 import glob
 import os
-from typing import List, Dict, Callable
+import re
+import stat
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Dict, Callable, Optional
 from pathlib import Path
 
+from core.artifact_scan import (ArtifactSpec, CachePathGroup, artifact_matches, existing_android_image_dirs,
+                                existing_cache_paths, get_artifact_scan_config, scan_artifacts)
+from core.delete_engine import DeleteEngine
+from core.fs_walker import DEFAULT_WORKERS, ParallelWalker, WalkStats, path_size, walk_stats
+from core.project_index import ProjectIndex
+
+
+@dataclass(frozen=True)
+class FileFilter:
+    """
+    声明式文件过滤条件，已设置的条件需同时满足；只匹配文件，不匹配目录。
+    compile() 生成直接使用遍历时已有 stat 数据的匹配函数，避免逐文件再 stat。
+    """
+    extensions: tuple[str, ...] = ()   # 小写后缀（可含多段，如 '.persist.log'）
+    globs: tuple[str, ...] = ()        # 文件名通配符，不区分大小写
+    min_age_days: float = 0            # 修改时间早于 N 天（严格大于）
+    min_size: int = 0                  # 文件大小下限（字节）
+
+    def compile(self, now: Optional[float] = None) -> Callable[[str, os.stat_result], bool]:
+        extensions = tuple(ext.lower() for ext in self.extensions)
+        pattern = re.compile("|".join(fnmatch.translate(g) for g in self.globs), re.IGNORECASE) if self.globs else None
+        threshold = (now if now is not None else time.time()) - self.min_age_days * 86400 if self.min_age_days else None
+        min_size = self.min_size
+
+        def matches(path: str, st: os.stat_result) -> bool:
+            if min_size and st.st_size < min_size:
+                return False
+            if threshold is not None and st.st_mtime >= threshold:
+                return False
+            if extensions or pattern:
+                name = os.path.basename(path)
+                if extensions and not name.lower().endswith(extensions):
+                    return False
+                if pattern and not pattern.match(name):
+                    return False
+            return True
+
+        return matches
+
 
 class CleanupRule:
     """清理规则基类"""
 
+    # 声明式过滤条件；设置后 should_delete 只接受匹配的文件，扫描时直接用 DirEntry 的 stat 判断
+    file_filter: Optional[FileFilter] = None
+    _matcher: Optional[Callable[[str, os.stat_result], bool]] = None   # should_delete 用的 file_filter 编译结果
+
     def __init__(self, name: str, description: str, category: str, risk_level: str):
         self.name = name
         self.description = description
@@ -24,32 +75,31 @@ class CleanupRule:
 
     def should_delete(self, path: str) -> bool:
         """判断某个路径是否应该删除"""
-        return True
+        if self.file_filter is None:
+            return True
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return False
+        if self._matcher is None:
+            # 规则实例按次扫描创建，首次调用时编译一次即可，年龄阈值在本次扫描内保持一致
+            self._matcher = self.file_filter.compile()
+        return stat.S_ISREG(st.st_mode) and self._matcher(path, st)
+
+    def compile_matcher(self, now: Optional[float] = None) -> Callable[[str, os.stat_result], bool]:
+        """
+        返回扫描用的文件匹配函数 matcher(path, stat)。
+        子类自定义了 should_delete 时退回逐文件调用，否则使用 file_filter 编译结果。
+        """
+        if type(self).should_delete is not CleanupRule.should_delete:
+            return lambda path, _st: self.should_delete(path)
+        if self.file_filter is None:
+            return lambda _path, _st: True
+        return self.file_filter.compile(now)
 
     def get_size(self, path: str) -> int:
         """获取路径大小"""
-        if not os.path.exists(path):
-            return 0
-
-        if os.path.isfile(path):
-            try:
-                return os.path.getsize(path)
-            except:
-                return 0
-
-        total = 0
-        try:
-            for entry in os.scandir(path):
-                try:
-                    if entry.is_file(follow_symlinks=False):
-                        total += entry.stat().st_size
-                    elif entry.is_dir(follow_symlinks=False):
-                        total += self.get_size(entry.path)
-                except:
-                    continue
-        except:
-            pass
-        return total
+        return path_size(path)
 
 
 class TempFilesRule(CleanupRule):
@@ -145,6 +195,9 @@ class UnityCacheRule(CleanupRule):
 class AppLogRule(CleanupRule):
     """应用程序日志文件"""
 
+    # 只删除 .log 文件，并且超过30天没修改的
+    file_filter = FileFilter(extensions=('.log',), min_age_days=30)
+
     def __init__(self):
         super().__init__(
             name="应用程序日志",
@@ -164,19 +217,6 @@ class AppLogRule(CleanupRule):
                 paths.append(base_path)
         return paths
 
-    def should_delete(self, path: str) -> bool:
-        """只删除 .log 文件，并且超过30天没修改的"""
-        if not path.lower().endswith('.log'):
-            return False
-
-        try:
-            import time
-            mtime = os.path.getmtime(path)
-            age_days = (time.time() - mtime) / 86400
-            return age_days > 30  # 只删除30天以上的日志
-        except:
-            return False
-
 
 class RecycleBinRule(CleanupRule):
     """回收站"""
@@ -222,6 +262,9 @@ class WindowsUpdateCacheRule(CleanupRule):
 class ThumbnailCacheRule(CleanupRule):
     """缩略图缓存"""
 
+    # 只删除缩略图数据库文件
+    file_filter = FileFilter(extensions=('.db',))
+
     def __init__(self):
         super().__init__(
             name="缩略图缓存",
@@ -240,10 +283,6 @@ class ThumbnailCacheRule(CleanupRule):
             paths.append(thumb_path)
         return paths
 
-    def should_delete(self, path: str) -> bool:
-        """只删除缩略图数据库文件"""
-        return path.lower().endswith('.db')
-
 
 # ==================== 预定义清理规则集 ====================
 
@@ -1134,6 +1173,8 @@ class DockerBuildkitRule(CleanupRule):
 class WindowsCbsLogRule(CleanupRule):
     """Windows CBS/DISM 日志（仅 .log/.cab，需要管理员）"""
 
+    file_filter = FileFilter(extensions=('.log', '.cab', '.etl'))
+
     def __init__(self):
         super().__init__(
             name="Windows CBS/DISM 日志",
@@ -1153,10 +1194,6 @@ class WindowsCbsLogRule(CleanupRule):
                 paths.append(p)
         return paths
 
-    def should_delete(self, path: str) -> bool:
-        ext = os.path.splitext(path)[1].lower()
-        return ext in ('.log', '.cab', '.etl', '.persist.log')
-
 
 class WindowsOldRule(CleanupRule):
     """Windows.old（上次升级残留，激进）"""
@@ -1228,6 +1265,7 @@ class TempAgedRule(CleanupRule):
             risk_level="safe",
         )
         self.days = days
+        self.file_filter = FileFilter(min_age_days=days)
 
     def get_paths(self) -> List[str]:
         paths = []
@@ -1236,15 +1274,6 @@ class TempAgedRule(CleanupRule):
                 paths.append(p)
         return paths
 
-    def should_delete(self, path: str) -> bool:
-        try:
-            import time
-            mtime = os.path.getmtime(path)
-            age_days = (time.time() - mtime) / 86400
-            return age_days > self.days
-        except OSError:
-            return False
-
 
 class NodeModulesAgedRule(CleanupRule):
     """废弃项目的 node_modules（>180 天未修改，激进）"""
@@ -1259,8 +1288,7 @@ class NodeModulesAgedRule(CleanupRule):
         self.days = days
 
     def get_paths(self) -> List[str]:
-        """直接返回符合条件的 node_modules 目录列表，绕过 _collect_candidates 的逐文件扫描。"""
-        import time
+        """直接返回符合条件的 node_modules 目录列表，绕过 _scan_path 的逐文件扫描。"""
         user = os.environ.get('USERPROFILE', '')
         if not user:
             return []
@@ -1273,31 +1301,15 @@ class NodeModulesAgedRule(CleanupRule):
 
         threshold = time.time() - self.days * 86400
         matches = []
-        for root in roots:
-            stack = [root]
-            depth_limit = 4
-            depth_map = {root: 0}
-            while stack:
-                current = stack.pop()
-                cur_depth = depth_map.get(current, 0)
-                try:
-                    with os.scandir(current) as entries:
-                        for entry in entries:
-                            if not entry.is_dir(follow_symlinks=False):
-                                continue
-                            if entry.name == 'node_modules':
-                                try:
-                                    mtime = entry.stat(follow_symlinks=False).st_mtime
-                                    if mtime < threshold:
-                                        matches.append(entry.path)
-                                except OSError:
-                                    pass
-                                continue
-                            if cur_depth < depth_limit and entry.name not in ('node_modules', '.git'):
-                                stack.append(entry.path)
-                                depth_map[entry.path] = cur_depth + 1
-                except OSError:
-                    continue
+        # 与原先的遍历覆盖范围一致：只跳过 .git，只在 node_modules 处停下（Unity 工程的 Assets 等目录照常进入）
+        artifacts = ProjectIndex.get_instance().artifacts(roots, names=('node_modules',), max_depth=4,
+                                                          skip_dirs=('.git',), artifact_names=('node_modules',))
+        for artifact in artifacts:
+            try:
+                if os.stat(artifact.path, follow_symlinks=False).st_mtime < threshold:
+                    matches.append(artifact.path)
+            except OSError:
+                continue
         return matches
 
     def should_delete(self, path: str) -> bool:
@@ -1305,86 +1317,47 @@ class NodeModulesAgedRule(CleanupRule):
         return True
 
 
-class DDriveTauriTargetRule(CleanupRule):
-    """D:\\Projects 下 Rust/Tauri 项目的 target 构建产物。"""
+class ProjectArtifactRule(CleanupRule):
+    """按构建产物扫描配置生成：配置的项目根下命中 patterns 的产物目录。"""
 
-    def __init__(self):
+    def __init__(self, spec: ArtifactSpec):
         super().__init__(
-            name="D盘 Rust/Tauri target",
-            description="D:\\Projects 下可重建的 Rust/Tauri target 构建产物",
+            name=spec.rule_name,
+            description=spec.description,
             category="cache",
-            risk_level="low",
+            risk_level=spec.risk,
         )
+        self.spec = spec
 
     def get_paths(self) -> List[str]:
-        root = r"D:\Projects"
-        if not os.path.isdir(root):
-            return []
-
-        matches = []
-        stack = [(root, 0)]
-        max_depth = 5
-        skip_dirs = {
-            ".git", ".svn", ".hg", "node_modules", "Library", "Temp",
-            "Logs", "Assets", "Art", "dist", "build",
-        }
-
-        while stack:
-            current, depth = stack.pop()
-            try:
-                with os.scandir(current) as entries:
-                    for entry in entries:
-                        if not entry.is_dir(follow_symlinks=False):
-                            continue
-                        if entry.name == "target":
-                            matches.append(entry.path)
-                            continue
-                        if depth < max_depth and entry.name not in skip_dirs:
-                            stack.append((entry.path, depth + 1))
-            except OSError:
-                continue
-
-        return matches
+        return [artifact.path for artifact in scan_artifacts(spec=self.spec)]
 
     def should_delete(self, path: str) -> bool:
-        return os.path.basename(path) == "target"
+        return artifact_matches(self.spec, path)
 
 
-class DDriveVisualizeDeployCacheRule(CleanupRule):
-    """visualize_ta 的部署暂存和历史 release 产物。"""
+class ConfiguredCachePathRule(CleanupRule):
+    """按构建产物扫描配置生成：一组固定路径的缓存目录。"""
 
-    def __init__(self):
+    def __init__(self, group: CachePathGroup):
         super().__init__(
-            name="D盘 visualize_ta 部署产物",
-            description="D:\\Projects\\visualize_ta\\deploy 下的 .stage 暂存包和 releases 历史包",
+            name=group.rule_name,
+            description=group.description,
             category="cache",
-            risk_level="medium",
+            risk_level=group.risk,
         )
+        self.group = group
 
     def get_paths(self) -> List[str]:
-        return [
-            path for path in (
-                r"D:\Projects\visualize_ta\deploy\.stage",
-                r"D:\Projects\visualize_ta\deploy\releases",
-            )
-            if os.path.isdir(path)
-        ]
-
+        return [item.path for item in existing_cache_paths(self.group)]
 
-class DDriveWxWorkCacheRule(CleanupRule):
-    """D:\\tmp 下的企业微信缓存。"""
-
-    def __init__(self):
-        super().__init__(
-            name="D盘 企业微信缓存",
-            description="D:\\tmp\\WXWork 下的企业微信文件缓存、CEF 缓存和临时数据",
-            category="cache",
-            risk_level="medium",
-        )
 
-    def get_paths(self) -> List[str]:
-        path = r"D:\tmp\WXWork"
-        return [path] if os.path.isdir(path) else []
+def get_artifact_cleanup_rules(rule_set: str) -> List[CleanupRule]:
+    """由构建产物扫描配置生成的规则（产物规则在前，固定路径规则在后）"""
+    config = get_artifact_scan_config()
+    rules: List[CleanupRule] = [ProjectArtifactRule(spec) for spec in config.artifacts if spec.rule_set == rule_set]
+    rules.extend(ConfiguredCachePathRule(group) for group in config.paths if group.rule_set == rule_set)
+    return rules
 
 
 class DDriveAndroidSystemImagesRule(CleanupRule):
@@ -1393,23 +1366,21 @@ class DDriveAndroidSystemImagesRule(CleanupRule):
     def __init__(self):
         super().__init__(
             name="D盘 Android 模拟器镜像",
-            description="D:\\Software\\SDK\\system-images 下的 Android Emulator 镜像，建议确认不用后再删",
+            description="构建产物扫描配置中 Android SDK system-images 目录下的模拟器镜像，建议确认不用后再删",
             category="cache",
             risk_level="high",
         )
 
     def get_paths(self) -> List[str]:
-        root = r"D:\Software\SDK\system-images"
-        if not os.path.isdir(root):
-            return []
         paths = []
-        try:
-            with os.scandir(root) as entries:
-                for entry in entries:
-                    if entry.is_dir(follow_symlinks=False):
-                        paths.append(entry.path)
-        except OSError:
-            return []
+        for root in existing_android_image_dirs():
+            try:
+                with os.scandir(root) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            paths.append(entry.path)
+            except OSError:
+                continue
         return paths
 
 
@@ -1421,7 +1392,7 @@ def get_aggressive_cleanup_rules() -> List[CleanupRule]:
         LMStudioCacheRule(),
         WindowsOldRule(),
         NodeModulesAgedRule(180),
-        DDriveVisualizeDeployCacheRule(),
+        *get_artifact_cleanup_rules("aggressive"),
         DDriveAndroidSystemImagesRule(),
     ]
 
@@ -1446,119 +1417,515 @@ def get_extended_cleanup_rules() -> List[CleanupRule]:
         DefenderScanHistoryRule(),
         MemoryDumpRule(),
         TempAgedRule(7),
-        DDriveTauriTargetRule(),
-        DDriveWxWorkCacheRule(),
+        *get_artifact_cleanup_rules("extended"),
     ]
 
 
+# 同时扫描的规则数；大多数规则落在互不相交的目录树上
+RULE_WORKERS = 4
+
+_MIXED = -1   # 目录下的文件归属于不止一条规则
+
+# 扫描结果缓存的有效期（秒），以及最多缓存的根分组数
+SCAN_CACHE_TTL = float(os.environ.get("TOOLPACK_CLEANUP_SCAN_CACHE_TTL", 600))
+SCAN_CACHE_MAX_ENTRIES = 1024
+
+
+@dataclass
+class _RootClaim:
+    """某条规则声明的一个清理根"""
+    rule_index: int
+    order: int      # 在该规则 get_paths() 中的位置
+    path: str
+    key: str        # normcase 后的路径，用于祖先匹配
+    is_file: bool
+    whole: bool     # 目录本身命中 should_delete，整个目录可删
+
+
+def _path_parts(key: str) -> tuple:
+    return tuple(part for part in key.split(os.sep) if part)
+
+
+def _group_overlapping_claims(claims: List[_RootClaim]) -> List[List[_RootClaim]]:
+    """
+    把互为祖先/相同的清理根合并为一组（每组的第一个元素是组内最外层的根）。
+    按路径分量排序，保证子孙路径紧跟在祖先之后。
+    """
+    groups: List[List[_RootClaim]] = []
+    top_parts: tuple = ()
+    for claim in sorted(claims, key=lambda c: (_path_parts(c.key), c.rule_index, c.order)):
+        parts = _path_parts(claim.key)
+        if groups and parts[:len(top_parts)] == top_parts:
+            groups[-1].append(claim)
+        else:
+            groups.append([claim])
+            top_parts = parts
+    return groups
+
+
+@dataclass
+class _GroupPiece:
+    """
+    重叠分组按清理根切开后的一段遍历：只遍历 root 的子树，遇到组内更深的清理根即停下，
+    那些子树由各自的分段并行遍历；文件仍按整条祖先链上的规则归属。
+    """
+    claims: List[_RootClaim]   # 覆盖该子树的清理根（由外到内），含 root 所在路径上的全部规则
+    root: _RootClaim
+    stop_dirs: frozenset       # 组内位于 root 之下的其它清理根（normcase 路径），不进入
+    stop_files: frozenset
+    shared: frozenset          # 跨越多个分段的目录（normcase 路径），不能整体作为候选
+
+
+def _split_overlapping_group(group: List[_RootClaim]) -> List[_GroupPiece]:
+    """把一个重叠分组按组内每个不同的清理根切成互不相交的分段（单根分组原样成为一段）"""
+    claims_by_key: Dict[str, List[_RootClaim]] = {}
+    for claim in group:
+        claims_by_key.setdefault(claim.key, []).append(claim)
+    top_key = group[0].key
+
+    shared = set()
+    for key in claims_by_key:
+        if key == top_key:
+            continue
+        current = os.path.dirname(key)
+        while len(current) >= len(top_key) and current not in shared:
+            shared.add(current)
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            current = parent
+    shared = frozenset(shared)
+
+    pieces = []
+    for key, claims in claims_by_key.items():
+        parts = _path_parts(key)
+        below = [other for other in claims_by_key
+                 if other != key and _path_parts(other)[:len(parts)] == parts]
+        pieces.append(_GroupPiece(
+            claims=[claim for claim in group if parts[:len(_path_parts(claim.key))] == _path_parts(claim.key)],
+            root=claims[0],
+            stop_dirs=frozenset(other for other in below if not claims_by_key[other][0].is_file),
+            stop_files=frozenset(other for other in below if claims_by_key[other][0].is_file),
+            shared=shared,
+        ))
+    return pieces
+
+
+class ScanCache:
+    """
+    清理扫描结果缓存：以分组切出的遍历分段为单位，键为覆盖该分段的每个清理根的 (规则名, 路径, 根 mtime)。
+    任一根的 mtime 变化、规则组合变化或超过 TTL 时该分段重新遍历，其余分段直接复用。
+    根 mtime 只反映直接子项的增删，更深层的变化依赖 TTL 兜底；执行删除后应调用 clear()。
+    """
+
+    def __init__(self, ttl: float = SCAN_CACHE_TTL, max_entries: int = SCAN_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple[float, Dict[str, tuple]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def group_key(piece: "_GroupPiece", rules: List[CleanupRule]) -> Optional[tuple]:
+        """分段的缓存键（含停下的子树）；任一根无法 stat 时返回 None（不缓存）"""
+        parts = []
+        for claim in piece.claims:
+            try:
+                mtime = os.stat(claim.path).st_mtime_ns
+            except OSError:
+                return None
+            parts.append((rules[claim.rule_index].name, claim.key, claim.order, claim.whole, mtime))
+        return (piece.root.key, tuple(parts), tuple(sorted(piece.stop_dirs | piece.stop_files)))
+
+    def get(self, key: tuple) -> Optional[Dict[str, tuple]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: tuple, value: Dict[str, tuple]):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _RuleAccumulator:
+    """汇总一条规则在各个根分组中的扫描结果"""
+
+    def __init__(self):
+        self.pending = 0
+        self.groups = 0
+        self.cached_groups = 0
+        self.units: Dict[str, list] = {}   # 候选路径 -> [大小, 文件数, 根序号]
+        self.elapsed = 0.0
+        self.entries = 0
+        self.bytes = 0
+
+    def add(self, path: str, size: int, count: int, order: int):
+        unit = self.units.get(path)
+        if unit is None:
+            self.units[path] = [size, count, order]
+        else:
+            unit[0] += size
+            unit[1] += count
+
+
 class CleanupScanner:
-    """清理扫描器 - 扫描并计算可清理项目"""
+    """
+    清理扫描器 - 扫描并计算可清理项目
+
+    扫描前先把所有规则的清理根合并成互不重叠的分组：相互嵌套的根再按清理根切成互不相交的分段，
+    每个文件只遍历一次，分段之间并行，嵌套在内层的规则自己的分段完成后即可先出结果。
+    每个文件归属到「最具体」（最深的根；同一目录下带过滤条件的规则优先）且接受它的规则，
+    整目录候选会剔除属于其它规则的子树，避免重复计入可释放空间。
+    """
 
-    def __init__(self, rules: List[CleanupRule]):
+    def __init__(self, rules: List[CleanupRule], cancel_event: Optional[threading.Event] = None,
+                 workers: int = RULE_WORKERS, cache: Optional[ScanCache] = None):
         self.rules = rules
+        self.cache = cache
         self.scan_results = []
-
-    def scan(self, progress_callback: Callable[[str], None] = None) -> List[Dict]:
+        self.rule_timings = []
+        self.cancel_event = cancel_event
+        self.workers = max(1, workers)
+        # 分组间已经并行，单个分组内部的遍历线程相应减少
+        self.walk_workers = max(2, DEFAULT_WORKERS // self.workers)
+
+    def cancelled(self) -> bool:
+        return bool(self.cancel_event and self.cancel_event.is_set())
+
+    def scan(self, progress_callback: Callable[[str], None] = None,
+             on_rule_done: Callable[[Optional[Dict], Dict], None] = None,
+             force: bool = False) -> List[Dict]:
         """
-        扫描所有清理规则，返回结果列表
+        在有界线程池中并行扫描所有清理规则，结果按规则顺序返回；
+        每条规则的全部分组扫描完后立即回调 on_rule_done(结果或 None, 耗时统计)。
+        设置了 cache 时根未变化的分组直接复用缓存结果；force=True 时全部重新遍历（结果仍写回缓存）
 
         返回格式:
         [
             {
                 'rule': CleanupRule对象,
                 'paths': [可清理的路径列表],
+                'sizes': [与 paths 一一对应的大小（字节）],
                 'total_size': 总大小（字节）,
-                'file_count': 文件数量
+                'file_count': 文件数量,
+                'elapsed': 扫描耗时（秒，含与其它规则共享的遍历）,
+                'entries_visited': 遍历的目录项数,
+                'bytes_counted': 遍历中统计过的文件总字节数,
+                'cached': 是否全部来自缓存
             }
         ]
+        每条规则（含没有命中的）的耗时统计另存于 self.rule_timings
         """
-        results = []
-
-        for rule in self.rules:
-            if progress_callback:
-                progress_callback(f"正在扫描: {rule.name}")
-
+        now = time.time()
+        self._matchers = [rule.compile_matcher(now) for rule in self.rules]
+        accumulators = [_RuleAccumulator() for _ in self.rules]
+        results: List[Optional[Dict]] = [None] * len(self.rules)
+        timings: List[Optional[Dict]] = [None] * len(self.rules)
+
+        def finish(index: int):
+            results[index], timings[index] = self._finish_rule(index, accumulators[index])
+            if on_rule_done and timings[index]:
+                on_rule_done(results[index], timings[index])
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            claim_lists = list(pool.map(self._rule_claims, range(len(self.rules)), accumulators))
+            groups = _group_overlapping_claims([claim for claims in claim_lists for claim in claims])
+            pieces = [piece for group in groups for piece in _split_overlapping_group(group)]
+            for piece in pieces:
+                for rule_index in {claim.rule_index for claim in piece.claims}:
+                    accumulators[rule_index].pending += 1
+                    accumulators[rule_index].groups += 1
+
+            for index, accumulator in enumerate(accumulators):
+                if accumulator.pending == 0:
+                    finish(index)
+
+            futures = [pool.submit(self._scan_group_cached, piece, progress_callback, force) for piece in pieces]
+            for future in as_completed(futures):
+                group_result, cached = future.result()
+                for rule_index, (units, elapsed, entries, size) in group_result.items():
+                    accumulator = accumulators[rule_index]
+                    accumulator.cached_groups += cached
+                    for path, unit_size, count, order in units:
+                        accumulator.add(path, unit_size, count, order)
+                    accumulator.elapsed += elapsed
+                    accumulator.entries += entries
+                    accumulator.bytes += size
+                    accumulator.pending -= 1
+                    if accumulator.pending == 0:
+                        finish(rule_index)
+
+        self.rule_timings = [timing for timing in timings if timing]
+        self.scan_results = [result for result in results if result]
+        return self.scan_results
+
+    def _rule_claims(self, rule_index: int, accumulator: _RuleAccumulator) -> List[_RootClaim]:
+        """取得规则的清理根（去掉不存在的与重复的）"""
+        if self.cancelled():
+            return []
+        rule = self.rules[rule_index]
+        started = time.perf_counter()
+        claims = []
+        seen = set()
+        try:
+            for order, path in enumerate(rule.get_paths()):
+                if not os.path.exists(path):
+                    continue
+                key = os.path.normcase(os.path.abspath(path))
+                if key in seen:
+                    continue
+                seen.add(key)
+                is_file = os.path.isfile(path)
+                whole = not is_file and rule.should_delete(path)
+                claims.append(_RootClaim(rule_index, order, path, key, is_file, whole))
+        except Exception as e:
+            print(f"扫描 {rule.name} 时出错: {e}")
+            claims = []
+        accumulator.elapsed += time.perf_counter() - started
+        return claims
+
+    def _finish_rule(self, rule_index: int, accumulator: _RuleAccumulator) -> tuple:
+        """把累计的候选整理成规则结果，返回 (结果或 None, 耗时统计或 None)"""
+        if self.cancelled():
+            return None, None
+        rule = self.rules[rule_index]
+        timing = {
+            'rule': rule.name,
+            'elapsed': round(accumulator.elapsed, 4),
+            'entries_visited': accumulator.entries,
+            'bytes_counted': accumulator.bytes,
+            'cached': accumulator.groups > 0 and accumulator.cached_groups == accumulator.groups,
+        }
+        units = sorted(
+            ((order, path, size, count) for path, (size, count, order) in accumulator.units.items() if size > 0),
+        )
+        if not units:
+            return None, timing
+        return {
+            'rule': rule,
+            'paths': [path for _, path, _, _ in units],
+            'sizes': [size for _, _, size, _ in units],
+            'total_size': sum(size for _, _, size, _ in units),
+            'file_count': sum(count for _, _, _, count in units),
+            'selected': False,  # 默认不选中
+            'elapsed': timing['elapsed'],
+            'entries_visited': timing['entries_visited'],
+            'bytes_counted': timing['bytes_counted'],
+            'cached': timing['cached'],
+        }, timing
+
+    def _scan_group_cached(self, piece: _GroupPiece, progress_callback: Callable[[str], None] = None,
+                           force: bool = False) -> tuple:
+        """带缓存的 _scan_group，返回 (分段结果, 是否命中缓存)"""
+        key = ScanCache.group_key(piece, self.rules) if self.cache is not None else None
+        if key is not None and not force:
+            cached = self.cache.get(key)
+            if cached is not None:
+                index_by_name = {self.rules[claim.rule_index].name: claim.rule_index for claim in piece.claims}
+                # 命中缓存的分组不计遍历耗时与目录项数
+                return {
+                    index_by_name[name]: (units, 0.0, 0, 0) for name, (units, *_rest) in cached.items()
+                }, True
+
+        result = self._scan_group(piece, progress_callback)
+        if key is not None and not self.cancelled():
+            self.cache.put(key, {self.rules[index].name: value for index, value in result.items()})
+        return result, False
+
+    def _scan_group(self, piece: _GroupPiece, progress_callback: Callable[[str], None] = None) -> Dict:
+        """
+        扫描分组中的一段，返回
+        {规则序号: ([(候选路径, 大小, 文件数, 根序号)], 耗时, 目录项数, 字节数)}
+        """
+        rule_indexes = sorted({claim.rule_index for claim in piece.claims})
+        if self.cancelled():
+            return {index: ([], 0.0, 0, 0) for index in rule_indexes}
+        if progress_callback:
+            progress_callback("正在扫描: " + "、".join(self.rules[index].name for index in rule_indexes))
+
+        started = time.perf_counter()
+        if len(piece.claims) == 1 and not piece.stop_dirs and not piece.stop_files:
+            claim = piece.root
             try:
-                paths = rule.get_paths()
-                total_size = 0
-                file_count = 0
-                valid_paths = []
-
-                for path in paths:
-                    candidates = self._collect_candidates(rule, path)
-                    for candidate in candidates:
-                        size = rule.get_size(candidate)
-                        if size > 0:
-                            total_size += size
-                            valid_paths.append(candidate)
-                            file_count += 1 if os.path.isfile(candidate) else self._count_files(candidate)
-
-                if valid_paths:
-                    results.append({
-                        'rule': rule,
-                        'paths': valid_paths,
-                        'total_size': total_size,
-                        'file_count': file_count,
-                        'selected': False  # 默认不选中
-                    })
+                candidates, stats = self._scan_path(self.rules[claim.rule_index], claim.path,
+                                                    self._matchers[claim.rule_index])
             except Exception as e:
-                print(f"扫描 {rule.name} 时出错: {e}")
-                continue
+                print(f"扫描 {self.rules[claim.rule_index].name} 时出错: {e}")
+                candidates, stats = [], WalkStats()
+            units = [(path, size, count, claim.order) for path, size, count in candidates]
+            return {claim.rule_index: (units, time.perf_counter() - started, stats.entries, stats.size)}
+
+        units_by_rule, stats = self._scan_overlapping(piece)
+        elapsed = time.perf_counter() - started
+        # 共享遍历的目录项数/字节数记在分段根所属的规则上
+        top_rules = {claim.rule_index for claim in piece.claims if claim.key == piece.root.key}
+        return {
+            index: (units_by_rule.get(index, []), elapsed,
+                    stats.entries if index in top_rules else 0,
+                    stats.size if index in top_rules else 0)
+            for index in rule_indexes
+        }
+
+    def _scan_overlapping(self, piece: _GroupPiece) -> tuple:
+        """遍历分段根一次（不进入组内更深的清理根），把每个文件归属到祖先链上最具体的接受规则"""
+        top = piece.claims[0]
+        root = piece.root
+        claims_by_key: Dict[str, List[_RootClaim]] = {}
+        for claim in piece.claims:
+            claims_by_key.setdefault(claim.key, []).append(claim)
+        for claims in claims_by_key.values():
+            # 同一目录下：带过滤条件的规则比整目录规则更具体，其次按规则顺序
+            claims.sort(key=lambda c: (c.whole, c.rule_index, c.order))
+
+        owned = []   # (路径, 大小, 规则序号, 根序号, 该规则最外层整目录根或 None)
+
+        def classify(path: str, st: os.stat_result):
+            owner = None
+            outer_whole = None
+            key = os.path.normcase(path)
+            current = path
+            while True:
+                for claim in claims_by_key.get(key, ()):
+                    accepts = claim.whole or self._matchers[claim.rule_index](path, st)
+                    if owner is None and accepts:
+                        owner = claim
+                    if owner is not None and claim.whole and claim.rule_index == owner.rule_index:
+                        outer_whole = claim.path
+                if len(current) <= len(top.path):
+                    break
+                parent = os.path.dirname(current)
+                if parent == current:
+                    break
+                current = parent
+                key = os.path.normcase(current)
+            if owner is not None:
+                owned.append((path, st.st_size, owner.rule_index, owner.order, outer_whole))
+
+        if root.is_file:
+            stats = WalkStats(entries=1)
+            try:
+                st = os.stat(root.path, follow_symlinks=False)
+                stats.size, stats.file_count = st.st_size, 1
+                classify(root.path, st)
+            except OSError:
+                pass
+        else:
+            def on_file(_root: str, entry: os.DirEntry, st: os.stat_result):
+                if not piece.stop_files or os.path.normcase(os.path.abspath(entry.path)) not in piece.stop_files:
+                    classify(entry.path, st)
+
+            def descend(entry: os.DirEntry, _depth: int) -> bool:
+                return os.path.normcase(os.path.abspath(entry.path)) not in piece.stop_dirs
+
+            walker = ParallelWalker(
+                workers=self.walk_workers,
+                on_file=on_file,
+                descend=descend if piece.stop_dirs else None,
+                cancel_event=self.cancel_event,
+            )
+            stats = walker.walk([root.path])[root.path]
+
+        # 目录归属：只含同一规则文件的目录记为该规则，否则记为 _MIXED；
+        # 跨越多个分段的目录本段看不全，一开始就记为 _MIXED
+        dir_owner: Dict[str, int] = dict.fromkeys(piece.shared, _MIXED)
+        for path, _, rule_index, _, _ in owned:
+            current = os.path.dirname(path)
+            while len(current) >= len(top.path):
+                key = os.path.normcase(current)
+                previous = dir_owner.get(key)
+                if previous is None:
+                    dir_owner[key] = rule_index
+                elif previous == rule_index or previous == _MIXED:
+                    break
+                else:
+                    dir_owner[key] = _MIXED
+                parent = os.path.dirname(current)
+                if parent == current:
+                    break
+                current = parent
+
+        units_by_rule: Dict[int, Dict[str, list]] = {}
+        for path, size, rule_index, order, outer_whole in owned:
+            unit = path
+            if outer_whole is not None:
+                # 从整目录根往下找第一个完全属于本规则的目录作为候选
+                chain = []
+                current = os.path.dirname(path)
+                while len(current) > len(outer_whole):
+                    chain.append(current)
+                    current = os.path.dirname(current)
+                chain.append(outer_whole)
+                for directory in reversed(chain):
+                    if dir_owner.get(os.path.normcase(directory)) == rule_index:
+                        unit = directory
+                        break
+            units = units_by_rule.setdefault(rule_index, {})
+            entry = units.get(unit)
+            if entry is None:
+                units[unit] = [size, 1, order]
+            else:
+                entry[0] += size
+                entry[1] += 1
 
-        self.scan_results = results
-        return results
+        return {
+            rule_index: [(path, size, count, order) for path, (size, count, order) in units.items()]
+            for rule_index, units in units_by_rule.items()
+        }, stats
 
-    def _collect_candidates(self, rule: CleanupRule, path: str) -> List[str]:
-        """收集实际可删除的路径，确保带过滤条件的规则不会把父目录整体交给执行器。"""
+    def _scan_path(self, rule: CleanupRule, path: str,
+                   matcher: Callable[[str, os.stat_result], bool]) -> tuple:
+        """
+        一次遍历收集 path 下实际可删除的路径及其大小、文件数，
+        返回 ([(路径, 大小, 文件数)], 本次遍历的 WalkStats)。
+        带过滤条件的规则只返回命中的文件，不会把父目录整体交给执行器。
+        """
         if not os.path.exists(path):
-            return []
+            return [], WalkStats()
 
         if os.path.isfile(path):
-            return [path] if rule.should_delete(path) else []
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except OSError:
+                return [], WalkStats(entries=1)
+            stats = WalkStats(size=st.st_size, file_count=1, entries=1)
+            if not matcher(path, st):
+                return [], stats
+            return [(path, st.st_size, 1)], stats
 
         if rule.should_delete(path):
-            return [path]
+            stats = walk_stats(path, workers=self.walk_workers, cancel_event=self.cancel_event)
+            return [(path, stats.size, stats.file_count)], stats
 
         candidates = []
-        stack = [path]
-        while stack:
-            current = stack.pop()
-            try:
-                with os.scandir(current) as entries:
-                    for entry in entries:
-                        try:
-                            if entry.is_dir(follow_symlinks=False):
-                                stack.append(entry.path)
-                            elif entry.is_file(follow_symlinks=False) and rule.should_delete(entry.path):
-                                candidates.append(entry.path)
-                        except OSError:
-                            continue
-            except OSError:
-                continue
-        return candidates
 
-    def _count_files(self, path: str) -> int:
-        """递归计算文件夹中的文件数量"""
-        count = 0
-        try:
-            for entry in os.scandir(path):
-                try:
-                    if entry.is_file(follow_symlinks=False):
-                        count += 1
-                    elif entry.is_dir(follow_symlinks=False):
-                        count += self._count_files(entry.path)
-                except:
-                    continue
-        except:
-            pass
-        return count
+        def on_file(_root: str, entry: os.DirEntry, st: os.stat_result):
+            if matcher(entry.path, st):
+                candidates.append((entry.path, st.st_size, 1))
+
+        walker = ParallelWalker(workers=self.walk_workers, on_file=on_file, cancel_event=self.cancel_event)
+        stats = walker.walk([path])[path]
+        candidates.sort()
+        return candidates, stats
 
 
 class CleanupExecutor:
     """清理执行器 - 执行实际的删除操作"""
 
     @staticmethod
-    def clean(scan_result: Dict, progress_callback: Callable[[str, int, int], None] = None) -> Dict:
+    def clean(scan_result: Dict, progress_callback: Callable[[str, int, int], None] = None,
+              cancel_event: Optional[threading.Event] = None, workers: Optional[int] = None) -> Dict:
         """
         执行清理操作
 
@@ -1577,24 +1944,25 @@ class CleanupExecutor:
         deleted_count = 0
         errors = []
         total_items = len(paths)
+        engine = DeleteEngine(workers=workers, cancel_event=cancel_event,
+                              file_filter=rule.compile_matcher(time.time()))
+        whole_engine = DeleteEngine(workers=workers, cancel_event=cancel_event)
 
         for idx, path in enumerate(paths):
+            if engine.cancelled():
+                break
             if progress_callback:
                 progress_callback(f"正在清理: {os.path.basename(path)}", idx + 1, total_items)
 
-            try:
-                if os.path.isfile(path):
-                    if rule.should_delete(path):
-                        size = os.path.getsize(path)
-                        os.remove(path)
-                        deleted_size += size
-                        deleted_count += 1
-                elif os.path.isdir(path):
-                    size, count = CleanupExecutor._delete_folder_contents(path, rule)
-                    deleted_size += size
-                    deleted_count += count
-            except Exception as e:
-                errors.append(f"{path}: {str(e)}")
+            # 与扫描一致：目录本身命中 should_delete 时整个删除，不再按文件逐个匹配
+            whole = os.path.isdir(path) and rule.should_delete(path)
+            result = (whole_engine if whole else engine).delete_path(path)
+            deleted_size += result.freed_bytes
+            deleted_count += result.files_deleted
+            if result.error and not result.missing:
+                errors.append(f"{path}: {result.error}")
+            elif result.files_failed:
+                errors.append(f"{path}: {result.files_failed} 个文件无法删除（被占用或无权限）")
 
         return {
             'success': len(errors) == 0,
@@ -1602,35 +1970,3 @@ class CleanupExecutor:
             'deleted_count': deleted_count,
             'errors': errors
         }
-
-    @staticmethod
-    def _delete_folder_contents(folder_path: str, rule: CleanupRule) -> tuple:
-        """删除文件夹内容，返回 (删除大小, 删除数量)"""
-        deleted_size = 0
-        deleted_count = 0
-
-        try:
-            for entry in os.scandir(folder_path):
-                try:
-                    if entry.is_file(follow_symlinks=False):
-                        if rule.should_delete(entry.path):
-                            size = entry.stat().st_size
-                            os.remove(entry.path)
-                            deleted_size += size
-                            deleted_count += 1
-                    elif entry.is_dir(follow_symlinks=False):
-                        size, count = CleanupExecutor._delete_folder_contents(entry.path, rule)
-                        deleted_size += size
-                        deleted_count += count
-
-                        # 尝试删除空文件夹
-                        try:
-                            os.rmdir(entry.path)
-                        except:
-                            pass
-                except Exception as e:
-                    continue
-        except:
-            pass
-
-        return deleted_size, deleted_count
@@ -0,0 +1,476 @@
+"""
+并行删除引擎
+在并行遍历的同时直接 unlink 文件（释放字节数取自遍历已有的 stat），
+遍历结束后自底向上删除已清空的目录，不再为测量大小额外遍历。
+清理页执行、C 盘体检动作与 CleanupExecutor 共用这一套删除逻辑。
+"""
+
+import errno
+import heapq
+import json
+import os
+import stat
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from core.fs_walker import DEFAULT_WORKERS, ParallelWalker
+from core.size_index import SizeIndex
+from core.system_detector import SystemConfig
+
+
+# 每删除多少个文件推送一次进度
+PROGRESS_BATCH = 500
+# 每个路径最多记录多少条被占用 / 无法删除的条目
+LOCKED_SAMPLE_LIMIT = 50
+
+# 删除吞吐量（文件/秒）的持久化记录，用于预估删除耗时
+THROUGHPUT_FILE_NAME = "delete_throughput.json"
+# 尚无实测数据时使用的保守估计
+DEFAULT_FILES_PER_SECOND = 2000.0
+# 删除文件数少于此值时耗时主要是固定开销，不计入吞吐量
+THROUGHPUT_MIN_FILES = 200
+# 新测量值在滑动平均中的权重
+THROUGHPUT_WEIGHT = 0.3
+# 预演（dry-run）时默认每个路径最多列出的文件数（按大小取最大的）；计数与字节数始终精确，
+# 需要完整清单时传 file_limit=None
+DRY_RUN_FILE_LIMIT = 200
+
+_throughput_lock = threading.Lock()
+
+
+@dataclass
+class DeleteResult:
+    """
+    单个路径的删除结果
+    deleted/failed 按路径下的顶层条目计（路径是文件时按文件本身计），
+    files_* 按实际处理的文件计，locked 为无法删除的条目样本
+    """
+    path: str
+    freed_bytes: int = 0
+    deleted: int = 0
+    failed: int = 0
+    files_deleted: int = 0
+    files_failed: int = 0
+    locked: list[str] = field(default_factory=list)
+    missing: bool = False
+    cancelled: bool = False
+    error: str = ""
+
+    def merge(self, other: "DeleteResult"):
+        self.freed_bytes += other.freed_bytes
+        self.deleted += other.deleted
+        self.failed += other.failed
+        self.files_deleted += other.files_deleted
+        self.files_failed += other.files_failed
+        room = LOCKED_SAMPLE_LIMIT - len(self.locked)
+        if room > 0:
+            self.locked.extend(other.locked[:room])
+        self.cancelled = self.cancelled or other.cancelled
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "freed_bytes": self.freed_bytes,
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "files_deleted": self.files_deleted,
+            "files_failed": self.files_failed,
+            "locked": list(self.locked),
+        }
+
+
+@dataclass
+class DeletePlan:
+    """单个路径的删除预演结果：将被删除的文件数与字节数，以及按大小排序的 files（完整清单或最大的样本）"""
+    path: str
+    total_bytes: int = 0
+    file_count: int = 0
+    files: list[tuple[str, int]] = field(default_factory=list)
+    truncated: bool = False
+    missing: bool = False
+    cached_dirs: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "path": self.path,
+            "total_bytes": self.total_bytes,
+            "file_count": self.file_count,
+            "files": [{"path": path, "size": size} for path, size in self.files],
+            "truncated": self.truncated,
+            "cached_dirs": self.cached_dirs,
+        }
+
+
+# ── 吞吐量记录 ────────────────────────────────────────────────────────────────
+
+def _throughput_file() -> str:
+    return os.path.join(SystemConfig.get_config_dir(), THROUGHPUT_FILE_NAME)
+
+
+def load_delete_throughput() -> dict:
+    """读取实测删除吞吐量；没有记录时 measured 为 False 并返回默认值"""
+    try:
+        with open(_throughput_file(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        rate = float(data.get("files_per_second", 0))
+        if rate > 0:
+            return {"files_per_second": rate, "samples": int(data.get("samples", 0)), "measured": True}
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+    return {"files_per_second": DEFAULT_FILES_PER_SECOND, "samples": 0, "measured": False}
+
+
+def record_delete_throughput(files: int, seconds: float):
+    """把一次删除的实测吞吐量并入滑动平均；样本过小时忽略"""
+    if files < THROUGHPUT_MIN_FILES or seconds <= 0:
+        return
+    rate = files / seconds
+    with _throughput_lock:
+        current = load_delete_throughput()
+        if current["measured"]:
+            rate = current["files_per_second"] * (1 - THROUGHPUT_WEIGHT) + rate * THROUGHPUT_WEIGHT
+        try:
+            os.makedirs(os.path.dirname(_throughput_file()), exist_ok=True)
+            with open(_throughput_file(), "w", encoding="utf-8") as f:
+                json.dump({"files_per_second": rate, "samples": current["samples"] + 1}, f)
+        except OSError:
+            pass
+
+
+def estimate_delete_seconds(file_count: int, throughput: Optional[dict] = None) -> float:
+    throughput = throughput or load_delete_throughput()
+    return round(file_count / throughput["files_per_second"], 2)
+
+
+# ── 删除预演 ──────────────────────────────────────────────────────────────────
+
+def plan_delete(path: str, file_filter: Optional[Callable[[str, os.stat_result], bool]] = None,
+                index: Optional[SizeIndex] = None, file_limit: Optional[int] = DRY_RUN_FILE_LIMIT,
+                workers: Optional[int] = None) -> DeletePlan:
+    """
+    统计 DeleteEngine.delete_path(path) 将会删除的内容，不改动磁盘。
+    file_limit 为 None 时 files 列出将删除的全部文件，否则只保留最大的 file_limit 个。
+    传入 index 且没有 file_filter 时复用磁盘分析留下的目录索引：
+    mtime 未变的目录直接使用索引中的文件列表，其余目录重新列举。
+    """
+    plan = DeletePlan(path)
+    heap: list[tuple[int, str]] = []
+    lock = threading.Lock()
+
+    def add(file_path: str, size: int):
+        with lock:
+            plan.file_count += 1
+            plan.total_bytes += size
+            if file_limit is None or len(heap) < file_limit:
+                heapq.heappush(heap, (size, file_path))
+            elif file_limit and size > heap[0][0]:
+                heapq.heapreplace(heap, (size, file_path))
+
+    def on_file(_root: str, entry: os.DirEntry, st: os.stat_result):
+        if file_filter is None or file_filter(entry.path, st):
+            add(entry.path, st.st_size)
+
+    try:
+        st = os.stat(path, follow_symlinks=False)
+    except OSError:
+        plan.missing = True
+        return plan
+
+    if not stat.S_ISDIR(st.st_mode) or _is_reparse(st):
+        if stat.S_ISREG(st.st_mode) and (file_filter is None or file_filter(path, st)):
+            add(path, st.st_size)
+    else:
+        walk_roots = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False) and not _is_link(entry):
+                            walk_roots.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            on_file(path, entry, entry.stat(follow_symlinks=False))
+                    except OSError:
+                        continue
+        except OSError:
+            plan.missing = True
+            return plan
+
+        cached = index.load(path) if index and file_filter is None else {}
+        unchanged, changed = SizeIndex.validate(cached) if cached else (set(), set())
+        known = unchanged | changed
+        walk_roots = [root for root in walk_roots if root not in known]
+        walk_roots.extend(sorted(changed))
+        for key in unchanged:
+            row = cached[key]
+            for name, size in row.files:
+                add(os.path.join(row.path, name), size)
+            walk_roots.extend(os.path.join(row.path, name) for name in row.dirs
+                              if os.path.join(row.path, name) not in known)
+        plan.cached_dirs = len(unchanged)
+
+        if walk_roots:
+            ParallelWalker(workers=workers, on_file=on_file,
+                           descend=(lambda entry, _depth: entry.path not in known and not _is_link(entry))
+                           ).walk(walk_roots)
+
+    plan.files = [(file_path, size) for size, file_path in sorted(heap, reverse=True)]
+    plan.truncated = plan.file_count > len(plan.files)
+    return plan
+
+
+def _is_reparse(st: os.stat_result) -> bool:
+    """符号链接或 Windows junction 等重解析点：只删除链接本身，绝不进入"""
+    if stat.S_ISLNK(st.st_mode):
+        return True
+    attributes = getattr(st, "st_file_attributes", 0)
+    return bool(attributes & getattr(stat, "FILE_ATTRIBUTE_REPARSE_POINT", 0))
+
+
+def _is_link(entry: os.DirEntry) -> bool:
+    if entry.is_symlink():
+        return True
+    try:
+        return _is_reparse(entry.stat(follow_symlinks=False))
+    except OSError:
+        return False
+
+
+def _retry_writable(func, path: str):
+    """删除失败时去掉只读属性再试一次（Windows 只读文件 / 目录）"""
+    try:
+        func(path)
+    except PermissionError:
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+        func(path)
+
+
+def _unlink(path: str):
+    _retry_writable(os.unlink, path)
+
+
+def _remove_link(path: str):
+    """删除链接本身；目录 junction 在 Windows 上需要 rmdir"""
+    try:
+        _unlink(path)
+    except OSError:
+        _retry_writable(os.rmdir, path)
+
+
+def _dir_not_empty(exc: OSError) -> bool:
+    # Windows 上为 ERROR_DIR_NOT_EMPTY(145)
+    return getattr(exc, "winerror", None) == 145 or exc.errno in (errno.ENOTEMPTY, errno.EEXIST)
+
+
+class DeleteEngine:
+    """
+    多线程删除：文件在遍历线程中直接删除，目录在遍历完成后由深到浅删除
+
+    - workers：单个路径内部的并发线程数
+    - cancel_event：置位后不再删除新的文件，已删除的不会恢复
+    - progress_callback(snapshot)：每处理 progress_batch 个文件调用一次（在删除线程中），
+      snapshot 为本引擎累计的 {"path", "freed_bytes", "files_deleted", "files_failed"}
+    - file_filter(path, stat)：返回 False 的文件保留不删（所在目录也随之保留）
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        file_filter: Optional[Callable[[str, os.stat_result], bool]] = None,
+        progress_batch: int = PROGRESS_BATCH,
+    ):
+        self.workers = max(1, workers or DEFAULT_WORKERS)
+        self.cancel_event = cancel_event
+        self.progress_callback = progress_callback
+        self.file_filter = file_filter
+        self.progress_batch = max(1, progress_batch)
+        self._lock = threading.Lock()
+        self._freed = 0
+        self._files_deleted = 0
+        self._files_failed = 0
+        self._since_report = 0
+
+    def cancelled(self) -> bool:
+        return bool(self.cancel_event and self.cancel_event.is_set())
+
+    # ── 对外接口 ──────────────────────────────────────────────────────────────
+
+    def delete_paths(self, paths: Iterable[str]) -> list[DeleteResult]:
+        """依次删除多个路径；取消后剩余路径不再处理"""
+        results = []
+        for path in paths:
+            if self.cancelled():
+                break
+            results.append(self.delete_path(path))
+        return results
+
+    def delete_path(self, path: str) -> DeleteResult:
+        """文件直接删除；目录清空其内容（保留目录本身）；不存在时记为失败"""
+        result = DeleteResult(path)
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            result.failed = 1
+            result.missing = True
+            result.error = "路径不存在"
+            return result
+
+        if stat.S_ISDIR(st.st_mode) and not _is_reparse(st):
+            result = self.clear_directory(path)
+        elif self.file_filter is None or self.file_filter(path, st):
+            if self._remove_entry(result, path, st):
+                result.deleted = 1
+            else:
+                result.failed = 1
+        return result
+
+    def clear_directory(self, path: str) -> DeleteResult:
+        """删除目录下的全部（符合 file_filter 的）内容"""
+        result = DeleteResult(path)
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except FileNotFoundError as exc:
+            result.failed = 1
+            result.missing = True
+            result.error = str(exc)
+            return result
+        except OSError as exc:
+            result.failed = 1
+            result.error = str(exc)
+            return result
+
+        started = time.monotonic()
+        lock = threading.Lock()
+        dirs: list[tuple[int, str, str]] = []
+        links: list[tuple[str, str]] = []
+        top_dirs = []
+        failed_roots: set[str] = set()
+
+        def on_file(root: str, entry: os.DirEntry, st: os.stat_result):
+            if self.cancelled():
+                return
+            if self.file_filter is not None and not self.file_filter(entry.path, st):
+                return
+            if not self._remove_entry(result, entry.path, st, lock):
+                with lock:
+                    failed_roots.add(root)
+
+        def on_other(root: str, entry: os.DirEntry):
+            with lock:
+                links.append((root, entry.path))
+
+        def descend(entry: os.DirEntry, depth: int) -> bool:
+            # descend 调用时还不知道所属遍历根，链接目录按路径前缀归属顶层条目
+            if _is_link(entry):
+                with lock:
+                    links.append((self._top_entry(path, entry.path), entry.path))
+                return False
+            with lock:
+                dirs.append((depth, self._top_entry(path, entry.path), entry.path))
+            return True
+
+        for entry in entries:
+            if self.cancelled():
+                break
+            try:
+                if entry.is_dir(follow_symlinks=False) and not _is_link(entry):
+                    top_dirs.append(entry.path)
+                    dirs.append((0, entry.path, entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    on_file(entry.path, entry, entry.stat(follow_symlinks=False))
+                else:
+                    links.append((entry.path, entry.path))
+            except OSError:
+                failed_roots.add(entry.path)
+
+        if top_dirs and not self.cancelled():
+            ParallelWalker(workers=self.workers, on_file=on_file, on_other=on_other,
+                           descend=descend, cancel_event=self.cancel_event).walk(top_dirs)
+
+        if self.file_filter is None and not self.cancelled():
+            for root, link in links:
+                try:
+                    _remove_link(link)
+                except OSError:
+                    failed_roots.add(root)
+                    self._record_locked(result, link)
+
+        # 深的目录先删，父目录才可能变空；带过滤条件时目录非空属于正常保留
+        for _, root, directory in sorted(dirs, key=lambda item: item[0], reverse=True):
+            try:
+                _retry_writable(os.rmdir, directory)
+            except OSError as exc:
+                if not _dir_not_empty(exc) and os.path.lexists(directory):
+                    failed_roots.add(root)
+                    self._record_locked(result, directory)
+
+        result.cancelled = self.cancelled()
+        if not result.cancelled:
+            record_delete_throughput(result.files_deleted, time.monotonic() - started)
+        for entry in entries:
+            if not os.path.lexists(entry.path):
+                result.deleted += 1
+            elif entry.path in failed_roots or (self.file_filter is None and not result.cancelled):
+                result.failed += 1
+        return result
+
+    # ── 内部实现 ──────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _top_entry(base: str, path: str) -> str:
+        relative = os.path.relpath(path, base)
+        return os.path.join(base, relative.split(os.sep, 1)[0])
+
+    @staticmethod
+    def _record_locked(result: DeleteResult, path: str):
+        if len(result.locked) < LOCKED_SAMPLE_LIMIT:
+            result.locked.append(path)
+
+    def _remove_entry(self, result: DeleteResult, path: str, st: os.stat_result,
+                      lock: Optional[threading.Lock] = None) -> bool:
+        """删除单个文件 / 链接并累计结果；lock 为 None 时在调用线程内独占 result"""
+        try:
+            if _is_reparse(st):
+                _remove_link(path)
+            else:
+                _unlink(path)
+            ok = True
+        except OSError:
+            ok = False
+        freed = st.st_size if ok and stat.S_ISREG(st.st_mode) else 0
+
+        with lock or self._lock:
+            if ok:
+                result.freed_bytes += freed
+                result.files_deleted += 1
+            else:
+                result.files_failed += 1
+                self._record_locked(result, path)
+        with self._lock:
+            if ok:
+                self._freed += freed
+                self._files_deleted += 1
+            else:
+                self._files_failed += 1
+            self._since_report += 1
+        self._report(path)
+        return ok
+
+    def _report(self, path: str):
+        if not self.progress_callback:
+            return
+        with self._lock:
+            if self._since_report < self.progress_batch:
+                return
+            self._since_report = 0
+            snapshot = {
+                "path": path,
+                "freed_bytes": self._freed,
+                "files_deleted": self._files_deleted,
+                "files_failed": self._files_failed,
+            }
+        self.progress_callback(snapshot)
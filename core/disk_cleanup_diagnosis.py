@@ -1,14 +1,98 @@
 import ctypes
 import os
 import shutil
-import subprocess
+import threading
 import time
-from dataclasses import dataclass
-from typing import Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Any, Callable, Optional
+
+from core.action_executor import ActionExecutor, ActionStep
+from core.artifact_scan import (cleanup_commands, cleanup_labels, configured_cleanup_paths,
+                                existing_android_image_dirs, existing_cache_paths, get_artifact_scan_config,
+                                scan_artifacts)
+from core.cache_migration import CacheMigrator, same_volume
+from core.delete_engine import (DRY_RUN_FILE_LIMIT, DeleteEngine, estimate_delete_seconds,
+                                load_delete_throughput, plan_delete)
+from core.fs_walker import WalkStats, path_size, walk_stats
+from core.process_runner import run_command
+from core.size_index import SizeIndex
 
 
 GB = 1024 ** 3
 
+# 同时计算大小的探测项数；每个探测项内部还会用并行遍历器，这里不宜过大
+PROBE_WORKERS = 4
+
+# 临时文件类探测项默认统计的修改时间分档（天）
+TEMP_AGE_BUCKETS = (7, 30)
+
+# 探测项遍历结果的缓存有效期（秒）：未列出的分类用默认值。
+# WinSxS / Installer 只在系统更新或 DISM 后变化，可以缓存很久；临时文件变化最快
+PROBE_CACHE_TTL = float(os.environ.get("TOOLPACK_DIAGNOSIS_CACHE_TTL", 600))
+PROBE_CACHE_TTLS = {
+    "临时文件": 60.0,
+    "开发缓存": 1800.0,
+    "AI/模型缓存": 1800.0,
+    "开发工具": 3600.0,
+    "创作工具": 3600.0,
+    "安装器缓存": 3600.0,
+    "系统备份": 6 * 3600.0,
+    "系统维护": 6 * 3600.0,
+}
+PROBE_CACHE_MAX_ENTRIES = 1024
+
+MEMORY_DUMP_PATH = r"C:\Windows\Memory.dmp"
+RECYCLE_BIN_PATH = r"C:\$Recycle.Bin"
+HIBERFIL_PATH = r"C:\hiberfil.sys"
+WINDOWS_UPDATE_DOWNLOAD = r"C:\Windows\SoftwareDistribution\Download"
+MIGRATE_CACHE_DIRS = [
+    "D:\\DevCache\\npm",
+    "D:\\DevCache\\pnpm-store",
+    "D:\\DevCache\\pip",
+    "D:\\DevCache\\huggingface",
+    "D:\\Temp",
+]
+
+# 各动作执行的固定命令：(说明, 参数, 超时秒数)
+SAFE_CLEANUP_COMMANDS = [
+    ("清理 npm 缓存", ["npm", "cache", "clean", "--force"], 180),
+    ("精简 pnpm store", ["pnpm", "store", "prune"], 180),
+    ("清理 pip 缓存", ["pip", "cache", "purge"], 180),
+]
+RECYCLE_BIN_COMMAND = ("清空回收站", ["powershell", "-NoProfile", "-Command",
+                                    "Clear-RecycleBin -Force -ErrorAction SilentlyContinue"], 180)
+AGGRESSIVE_CLEANUP_COMMANDS = SAFE_CLEANUP_COMMANDS + [
+    ("清理 yarn 缓存", ["yarn", "cache", "clean"], 180),
+    ("清理 Cargo 编译产物", ["cargo", "cache", "--autoclean"], 180),
+    ("清理 Go 构建缓存", ["go", "clean", "-cache"], 180),
+    RECYCLE_BIN_COMMAND,
+]
+MIGRATE_CACHE_COMMANDS = [
+    ("设置 npm 缓存目录", ["npm", "config", "set", "cache", "D:\\DevCache\\npm"], 120),
+    ("设置 pnpm store 目录", ["pnpm", "config", "set", "store-dir", "D:\\DevCache\\pnpm-store"], 120),
+    ("设置 pip 缓存目录", ["setx", "PIP_CACHE_DIR", "D:\\DevCache\\pip"], 120),
+    ("设置 Hugging Face 缓存目录", ["setx", "HF_HOME", "D:\\DevCache\\huggingface"], 120),
+    ("设置用户 TEMP", ["setx", "TEMP", "D:\\Temp"], 120),
+    ("设置用户 TMP", ["setx", "TMP", "D:\\Temp"], 120),
+]
+COMPONENT_CLEANUP_COMMANDS = [
+    ("Windows 组件存储清理", ["Dism.exe", "/Online", "/Cleanup-Image", "/StartComponentCleanup"], 1800),
+]
+DISABLE_HIBERNATION_COMMANDS = [
+    ("禁用休眠并删除 hiberfil.sys", ["powercfg.exe", "/hibernate", "off"], 60),
+]
+WINDOWS_UPDATE_STOP_COMMANDS = [
+    ("停止 Windows Update 服务", ["net.exe", "stop", "wuauserv"], 120),
+    ("停止 BITS 服务", ["net.exe", "stop", "bits"], 120),
+]
+WINDOWS_UPDATE_START_COMMANDS = [
+    ("启动 BITS 服务", ["net.exe", "start", "bits"], 120),
+    ("启动 Windows Update 服务", ["net.exe", "start", "wuauserv"], 120),
+]
+
 
 @dataclass
 class PathProbe:
@@ -20,6 +104,74 @@ class PathProbe:
     details: str
     cleanable: bool = False
     estimate_ratio: float = 1.0
+    age_buckets: tuple[int, ...] = ()   # 为空时临时文件类使用 TEMP_AGE_BUCKETS
+
+
+@dataclass
+class ActionContext:
+    """
+    动作执行期间的过程事件出口与取消信号；同步接口直接调用时两者都为空。
+    经 run 执行的步骤依次推送 plan、step_start、step_progress（删除 / 迁移进度）、step_done 事件，
+    其中 freed_bytes_total 为本次动作到目前为止释放的字节数（含进行中的删除）
+    """
+    emit: Optional[Callable[[dict[str, Any]], None]] = None
+    cancel_event: Optional[threading.Event] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _freed: int = field(default=0, init=False, repr=False)
+    _running_freed: dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _completed: int = field(default=0, init=False, repr=False)
+    _total: int = field(default=0, init=False, repr=False)
+
+    def send(self, event: dict[str, Any]):
+        if self.emit:
+            self.emit(event)
+
+    def run(self, steps: list[ActionStep]) -> list[dict[str, Any]]:
+        """按依赖关系执行步骤，结果按声明顺序返回"""
+        with self._lock:
+            self._total += len(steps)
+        self.send({
+            "type": "plan",
+            "steps": [{"key": step.key, "label": step.label, "after": list(step.after)} for step in steps],
+        })
+        executor = ActionExecutor(cancel_event=self.cancel_event,
+                                  on_start=self._step_started, on_finish=self._step_finished)
+        return executor.run(steps)
+
+    def step_progress(self, key: str, label: str) -> Callable[[dict[str, Any]], None]:
+        """步骤内部的进度回调；snapshot 带 freed_bytes 时计入 freed_bytes_total"""
+        def report(snapshot: dict[str, Any]):
+            with self._lock:
+                if "freed_bytes" in snapshot:
+                    self._running_freed[key] = snapshot["freed_bytes"]
+                total = self._freed + sum(self._running_freed.values())
+            self.send({**snapshot, "type": "step_progress", "key": key, "step": label, "freed_bytes_total": total})
+        return report
+
+    def delete_engine(self, key: str, label: str) -> DeleteEngine:
+        return DeleteEngine(cancel_event=self.cancel_event,
+                            progress_callback=self.step_progress(key, label) if self.emit else None)
+
+    def _step_started(self, step: ActionStep):
+        self.send({"type": "step_start", "key": step.key, "step": step.label})
+
+    def _step_finished(self, step: ActionStep, result: dict[str, Any], seconds: float):
+        with self._lock:
+            self._running_freed.pop(step.key, None)
+            self._freed += result.get("freed_bytes", 0)
+            self._completed += 1
+            total, completed, steps = self._freed + sum(self._running_freed.values()), self._completed, self._total
+        self.send({
+            "type": "step_done",
+            "key": step.key,
+            "step": step.label,
+            "status": result.get("status"),
+            "freed_bytes": result.get("freed_bytes", 0),
+            "seconds": round(seconds, 2),
+            "freed_bytes_total": total,
+            "completed": completed,
+            "total": steps,
+        })
 
 
 def _bytes_to_gb(value: int | float) -> float:
@@ -36,77 +188,120 @@ def _path_size(path: str) -> int:
             # 系统保护文件（hiberfil.sys、pagefile.sys、swapfile.sys）走 Win32 API
             return _protected_file_size(path)
 
-    total = 0
-    stack = [path]
-    while stack:
-        current = stack.pop()
-        try:
-            with os.scandir(current) as entries:
-                for entry in entries:
-                    try:
-                        if entry.is_file(follow_symlinks=False):
-                            total += entry.stat(follow_symlinks=False).st_size
-                        elif entry.is_dir(follow_symlinks=False):
-                            stack.append(entry.path)
-                    except OSError:
-                        continue
-        except OSError:
-            continue
-    return total
+    return path_size(path)
 
 
-def _find_d_project_targets() -> list[str]:
-    root = r"D:\Projects"
-    if not os.path.isdir(root):
-        return []
+def _probe_stats(path: str, age_buckets: tuple[int, ...] = (),
+                 cancel_event: Optional[threading.Event] = None) -> WalkStats:
+    """一次遍历同时得到大小、文件数以及按修改时间分档的大小/数量"""
+    stats = walk_stats(path, age_buckets=age_buckets, cancel_event=cancel_event)
+    if stats.size <= 0 and not os.path.isdir(path):
+        # 系统保护文件（hiberfil.sys、pagefile.sys）stat 会失败，走 Win32 API 只取大小
+        size = _protected_file_size(path)
+        if size > 0:
+            stats.size = size
+            stats.file_count = 1
+    return stats
 
-    matches: list[str] = []
-    stack: list[tuple[str, int]] = [(root, 0)]
-    max_depth = 5
-    skip_dirs = {
-        ".git", ".svn", ".hg", "node_modules", "Library", "Temp",
-        "Logs", "Assets", "Art", "dist", "build",
-    }
 
-    while stack:
-        current, depth = stack.pop()
-        try:
-            with os.scandir(current) as entries:
-                for entry in entries:
-                    if not entry.is_dir(follow_symlinks=False):
-                        continue
-                    if entry.name == "target":
-                        matches.append(entry.path)
-                        continue
-                    if depth < max_depth and entry.name not in skip_dirs:
-                        stack.append((entry.path, depth + 1))
-        except OSError:
-            continue
+class ProbeCache:
+    """
+    探测项遍历结果缓存，键为 (路径, 时间分档)。路径自身的 mtime 未变且未超过该分类的有效期时直接复用。
+    根 mtime 只反映直接子项的增删，更深层的变化依赖有效期兜底；执行清理动作后应调用 clear()。
+    """
 
-    return sorted(matches)
+    def __init__(self, max_entries: int = PROBE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple[float, Optional[int], WalkStats]]" = OrderedDict()
+        self._lock = threading.Lock()
 
+    @staticmethod
+    def key(path: str, age_buckets: tuple[int, ...]) -> tuple:
+        return os.path.normcase(os.path.abspath(path)), age_buckets
 
-def _build_probe_item(probe: PathProbe) -> dict[str, Any] | None:
+    @staticmethod
+    def mtime(path: str) -> Optional[int]:
+        """路径当前的 mtime；不存在或无法 stat（hiberfil.sys 等）时为 None，只靠有效期判断"""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, key: tuple, mtime: Optional[int], ttl: float) -> Optional[WalkStats]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] != mtime or time.time() - entry[0] > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def put(self, key: tuple, mtime: Optional[int], stats: WalkStats):
+        with self._lock:
+            self._entries[key] = (time.time(), mtime, stats)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_probe_cache = ProbeCache()
+
+
+def clear_diagnosis_cache():
+    """丢弃全部探测项缓存（删除文件或执行清理动作之后调用）"""
+    _probe_cache.clear()
+
+
+def _cached_probe_stats(probe: PathProbe, age_buckets: tuple[int, ...],
+                        cancel_event: Optional[threading.Event] = None, refresh: bool = False) -> WalkStats:
+    """按分类有效期与路径 mtime 复用上次的遍历结果；refresh=True 时强制重新遍历并更新缓存"""
+    key = ProbeCache.key(probe.path, age_buckets)
+    # 先取 mtime 再遍历：遍历期间发生的变化会让下次查找失效
+    mtime = ProbeCache.mtime(probe.path)
+    if not refresh:
+        stats = _probe_cache.get(key, mtime, PROBE_CACHE_TTLS.get(probe.category, PROBE_CACHE_TTL))
+        if stats is not None:
+            return stats
+    stats = _probe_stats(probe.path, age_buckets, cancel_event)
+    if cancel_event is None or not cancel_event.is_set():
+        _probe_cache.put(key, mtime, stats)
+    return stats
+
+
+def _age_stats(stats: WalkStats, age_buckets: tuple[int, ...]) -> dict[str, Any]:
+    result: dict[str, Any] = {"total_size": stats.size, "total_count": stats.file_count}
+    for index, days in enumerate(age_buckets):
+        result[f"older_{days}d_size"] = stats.age_sizes[index]
+        result[f"older_{days}d_count"] = stats.age_counts[index]
+    result["total_size_gb"] = _bytes_to_gb(stats.size)
+    for index, days in enumerate(age_buckets):
+        result[f"older_{days}d_size_gb"] = _bytes_to_gb(stats.age_sizes[index])
+    return result
+
+
+def _build_probe_item(probe: PathProbe,
+                      cancel_event: Optional[threading.Event] = None,
+                      refresh: bool = False) -> dict[str, Any] | None:
     if not probe.path:
         return None
 
-    # 系统保护文件可能 os.path.exists 返回 False，统一用 _path_size 探测
-    size = _path_size(probe.path)
-    if size <= 0 and not os.path.exists(probe.path):
-        size = _protected_file_size(probe.path)
+    is_temp = probe.category == "临时文件"
+    age_buckets = probe.age_buckets or (TEMP_AGE_BUCKETS if is_temp else ())
+    stats = _cached_probe_stats(probe, age_buckets, cancel_event, refresh)
+    size = stats.size
     if size <= 0:
         return None
 
     estimate = int(size * probe.estimate_ratio) if probe.cleanable else 0
     extra: dict[str, Any] = {}
-    if probe.category == "临时文件":
-        temp_stats = _count_temp_candidates(probe.path)
-        extra["temp_stats"] = {
-            **temp_stats,
-            "total_size_gb": _bytes_to_gb(temp_stats["total_size"]),
-            "older_7d_size_gb": _bytes_to_gb(temp_stats["older_7d_size"]),
-            "older_30d_size_gb": _bytes_to_gb(temp_stats["older_30d_size"]),
-        }
+    if age_buckets:
+        extra["temp_stats" if is_temp else "age_stats"] = _age_stats(stats, age_buckets)
 
     return {
         "path": probe.path,
@@ -124,42 +319,22 @@ def _build_probe_item(probe: PathProbe) -> dict[str, Any] | None:
     }
 
 
-def _d_drive_probe_items() -> list[dict[str, Any]]:
+def _d_drive_probes() -> list[PathProbe]:
+    """构建产物扫描配置生成的探测项，外加 Android 模拟器镜像（只提示，不自动清理）"""
+    config = get_artifact_scan_config()
     probes: list[PathProbe] = []
 
-    for path in _find_d_project_targets():
-        probes.append(PathProbe(
-            path,
-            "Rust/Tauri target",
-            "D盘构建缓存",
-            "low",
-            "D盘清理",
-            "Rust/Tauri 构建产物，可由 cargo/tauri 重新生成。",
-            True,
-        ))
+    for spec in config.artifacts:
+        for artifact in scan_artifacts(config, spec):
+            probes.append(PathProbe(artifact.path, spec.label, spec.category, spec.risk, "D盘清理",
+                                    spec.details, True))
+
+    for group in config.paths:
+        for item in existing_cache_paths(group):
+            probes.append(PathProbe(item.path, item.label, group.category, group.risk, "D盘清理",
+                                    item.details, True))
 
-    for path, label, detail in (
-        (
-            r"D:\Projects\visualize_ta\deploy\.stage",
-            "visualize_ta 上传暂存包",
-            "上传/部署过程产生的暂存软件包，确认没有任务正在使用时可清理。",
-        ),
-        (
-            r"D:\Projects\visualize_ta\deploy\releases",
-            "visualize_ta 历史 release 包",
-            "已生成的历史发布包，删除后不影响源码，但历史安装包需要重新打包。",
-        ),
-        (
-            r"D:\tmp\WXWork",
-            "企业微信 D盘缓存",
-            "企业微信文件缓存、CEF 缓存和临时数据，正在下载或打开的文件可能被占用。",
-        ),
-    ):
-        if os.path.isdir(path):
-            probes.append(PathProbe(path, label, "D盘缓存", "medium", "D盘清理", detail, True))
-
-    sdk_images = r"D:\Software\SDK\system-images"
-    if os.path.isdir(sdk_images):
+    for sdk_images in existing_android_image_dirs(config):
         probes.append(PathProbe(
             sdk_images,
             "Android 模拟器镜像",
@@ -170,23 +345,16 @@ def _d_drive_probe_items() -> list[dict[str, Any]]:
             False,
             0,
         ))
-
-    items = []
-    for probe in probes:
-        item = _build_probe_item(probe)
-        if item:
-            items.append(item)
-    return items
+    return probes
 
 
 def _d_drive_cleanup_candidates() -> list[str]:
-    candidates = _find_d_project_targets()
-    candidates.extend([
-        r"D:\Projects\visualize_ta\deploy\.stage",
-        r"D:\Projects\visualize_ta\deploy\releases",
-        r"D:\tmp\WXWork",
-    ])
-    return [path for path in candidates if os.path.isdir(path)]
+    return configured_cleanup_paths()
+
+
+def _d_drive_cleanup_summary() -> str:
+    labels = cleanup_labels()
+    return "、".join(labels) if labels else "构建产物和缓存"
 
 
 def _is_known_d_cleanup_path(path: str) -> bool:
@@ -223,62 +391,6 @@ def _protected_file_size(path: str) -> int:
         return 0
 
 
-def _count_temp_candidates(path: str) -> dict[str, Any]:
-    now = time.time()
-    total_size = 0
-    older_7d_size = 0
-    older_30d_size = 0
-    total_count = 0
-    older_7d_count = 0
-    older_30d_count = 0
-
-    if not path or not os.path.exists(path):
-        return {
-            "total_size": 0,
-            "older_7d_size": 0,
-            "older_30d_size": 0,
-            "total_count": 0,
-            "older_7d_count": 0,
-            "older_30d_count": 0,
-        }
-
-    stack = [path]
-    while stack:
-        current = stack.pop()
-        try:
-            with os.scandir(current) as entries:
-                for entry in entries:
-                    try:
-                        if entry.is_dir(follow_symlinks=False):
-                            stack.append(entry.path)
-                            continue
-                        if not entry.is_file(follow_symlinks=False):
-                            continue
-                        stat = entry.stat(follow_symlinks=False)
-                        total_count += 1
-                        total_size += stat.st_size
-                        age_days = (now - stat.st_mtime) / 86400
-                        if age_days >= 7:
-                            older_7d_count += 1
-                            older_7d_size += stat.st_size
-                        if age_days >= 30:
-                            older_30d_count += 1
-                            older_30d_size += stat.st_size
-                    except OSError:
-                        continue
-        except OSError:
-            continue
-
-    return {
-        "total_size": total_size,
-        "older_7d_size": older_7d_size,
-        "older_30d_size": older_30d_size,
-        "total_count": total_count,
-        "older_7d_count": older_7d_count,
-        "older_30d_count": older_30d_count,
-    }
-
-
 def _get_disk_snapshot() -> list[dict[str, Any]]:
     drives = []
     bitmask = ctypes.windll.kernel32.GetLogicalDrives()
@@ -386,13 +498,35 @@ def _root_probe_items() -> list[PathProbe]:
     ]
 
 
-def _scan_probe_items() -> list[dict[str, Any]]:
-    items = []
-    for probe in _root_probe_items():
-        item = _build_probe_item(probe)
-        if item:
-            items.append(item)
-    items.extend(_d_drive_probe_items())
+def _scan_probe_items(
+    progress_callback: Optional[Callable[[dict[str, Any]], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    workers: int = PROBE_WORKERS,
+    refresh: bool = False,
+) -> list[dict[str, Any]]:
+    """
+    在有界线程池中并行计算所有探测项（未变化的探测项直接取缓存），每算完一项回调
+    progress_callback({"stage": "probe", "item", "done", "total"})（item 可能为 None）。
+    结果顺序与串行时一致：按大小倒序，同大小保持探测项定义顺序。
+    """
+    probes = _root_probe_items() + _d_drive_probes()
+    total = len(probes)
+    results: list[dict[str, Any] | None] = [None] * total
+
+    def build(probe: PathProbe) -> dict[str, Any] | None:
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        return _build_probe_item(probe, cancel_event, refresh)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(build, probe): index for index, probe in enumerate(probes)}
+        for done, future in enumerate(as_completed(futures), 1):
+            item = future.result()
+            results[futures[future]] = item
+            if progress_callback:
+                progress_callback({"stage": "probe", "item": item, "done": done, "total": total})
+
+    items = [item for item in results if item]
     items.sort(key=lambda item: item["size"], reverse=True)
     return items
 
@@ -456,12 +590,30 @@ def _build_recommendations(c_drive: dict[str, Any] | None, d_drive: dict[str, An
     return recommendations
 
 
-def diagnose_c_drive() -> dict[str, Any]:
+def diagnose_c_drive(
+    progress_callback: Optional[Callable[[dict[str, Any]], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    workers: int = PROBE_WORKERS,
+    refresh: bool = False,
+) -> dict[str, Any]:
+    """
+    C 盘体检。progress_callback 先收到一次 {"stage": "snapshot", ...}（磁盘与页面文件信息），
+    之后每个探测项算完收到一次 {"stage": "probe", ...}。
+    探测项大小按分类有效期缓存，refresh=True 时全部重新计算
+    """
     drives = _get_disk_snapshot()
     c_drive = next((drive for drive in drives if drive["drive"].upper() == "C:\\"), None)
     d_drive = next((drive for drive in drives if drive["drive"].upper() == "D:\\"), None)
     pagefile = _get_pagefile_info()
-    items = _scan_probe_items()
+    if progress_callback:
+        progress_callback({
+            "stage": "snapshot",
+            "drives": drives,
+            "c_drive": c_drive,
+            "d_drive": d_drive,
+            "pagefile": pagefile,
+        })
+    items = _scan_probe_items(progress_callback, cancel_event, workers, refresh)
 
     safe_reclaim = sum(item["estimated_reclaim"] for item in items if item["cleanable"] and item["risk"] == "safe")
     cautious_reclaim = sum(item["estimated_reclaim"] for item in items if item["cleanable"] and item["risk"] in ("low", "medium"))
@@ -521,69 +673,46 @@ def diagnose_c_drive() -> dict[str, Any]:
                 "Dism.exe /Online /Cleanup-Image /StartComponentCleanup",
                 "cleanmgr",
             ],
-            "d_drive_cleanup": [
-                "Remove-Item D:\\Projects\\*\\target -Recurse -Force",
-                "Remove-Item D:\\Projects\\visualize_ta\\deploy\\.stage\\* -Recurse -Force",
-                "Remove-Item D:\\Projects\\visualize_ta\\deploy\\releases\\* -Recurse -Force",
-                "Remove-Item D:\\tmp\\WXWork\\* -Recurse -Force",
-            ],
+            "d_drive_cleanup": cleanup_commands(),
         },
     }
 
 
-def _delete_path_contents(path: str) -> dict[str, Any]:
-    before = _path_size(path)
-    deleted = 0
-    failed = 0
-
+def _delete_path_contents(path: str, engine: Optional[DeleteEngine] = None) -> dict[str, Any]:
     if not path or not os.path.isdir(path):
         return {
             "path": path,
-            "deleted": deleted,
-            "failed": failed,
+            "deleted": 0,
+            "failed": 0,
             "freed_bytes": 0,
             "freed_gb": 0,
             "status": "skipped",
             "message": "目录不存在",
         }
 
-    try:
-        entries = list(os.scandir(path))
-    except OSError as exc:
-        return {
-            "path": path,
-            "deleted": deleted,
-            "failed": 1,
-            "freed_bytes": 0,
-            "freed_gb": 0,
-            "status": "failed",
-            "message": str(exc),
-        }
-
-    for entry in entries:
-        try:
-            if entry.is_dir(follow_symlinks=False):
-                shutil.rmtree(entry.path, ignore_errors=False)
-            else:
-                os.remove(entry.path)
-            deleted += 1
-        except OSError:
-            failed += 1
-
-    after = _path_size(path)
-    freed = max(0, before - after)
+    result = (engine or DeleteEngine()).clear_directory(path)
+    if result.error:
+        status, message = "failed", result.error
+    elif result.cancelled:
+        status, message = "partial", "已取消，已删除的部分不会恢复"
+    elif result.failed == 0:
+        status, message = "done", "已清理"
+    else:
+        status, message = "partial", "部分文件被占用，已跳过"
     return {
-        "path": path,
-        "deleted": deleted,
-        "failed": failed,
-        "freed_bytes": freed,
-        "freed_gb": _bytes_to_gb(freed),
-        "status": "done" if failed == 0 else "partial",
-        "message": "已清理" if failed == 0 else "部分文件被占用，已跳过",
+        **result.to_dict(),
+        "freed_gb": _bytes_to_gb(result.freed_bytes),
+        "status": status,
+        "message": message,
     }
 
 
-def _run_fixed_command(label: str, args: list[str], timeout: int = 180) -> dict[str, Any]:
+def _run_fixed_command(label: str, args: list[str], timeout: int = 180,
+                       ctx: Optional[ActionContext] = None, cancellable: bool = True) -> dict[str, Any]:
+    """
+    执行固定命令；输出逐行推送到 ctx（动作 WebSocket），结果只保留最后 1000 个字符。
+    cancellable=False 的命令（重新启动服务等收尾命令）不响应取消，只受超时限制
+    """
     executable = shutil.which(args[0]) or args[0]
     if os.path.sep not in args[0] and shutil.which(args[0]) is None:
         return {
@@ -593,70 +722,121 @@ def _run_fixed_command(label: str, args: list[str], timeout: int = 180) -> dict[
             "message": f"未找到 {args[0]}",
         }
 
+    ctx = ctx or ActionContext()
     try:
-        proc = subprocess.run(
+        result = run_command(
             [executable, *args[1:]],
-            capture_output=True,
-            text=True,
             timeout=timeout,
-            shell=False,
+            on_line=lambda stream, line: ctx.send({"type": "output", "step": label, "stream": stream, "line": line}),
+            cancel_event=ctx.cancel_event if cancellable else None,
         )
-        output = (proc.stdout or proc.stderr or "").strip()
-        return {
-            "label": label,
-            "command": " ".join(args),
-            "status": "done" if proc.returncode == 0 else "failed",
-            "return_code": proc.returncode,
-            "message": output[-1000:] if output else ("已完成" if proc.returncode == 0 else "执行失败"),
-        }
-    except subprocess.TimeoutExpired:
+    except OSError as exc:
         return {
             "label": label,
             "command": " ".join(args),
             "status": "failed",
-            "message": "执行超时",
+            "message": str(exc),
         }
-    except OSError as exc:
+    if result.timed_out or result.cancelled:
         return {
             "label": label,
             "command": " ".join(args),
             "status": "failed",
-            "message": str(exc),
+            "message": "执行超时" if result.timed_out else "已取消",
         }
+    output = (result.tail("stdout") or result.tail("stderr")).strip()
+    return {
+        "label": label,
+        "command": " ".join(args),
+        "status": "done" if result.return_code == 0 else "failed",
+        "return_code": result.return_code,
+        "message": output[-1000:] if output else ("已完成" if result.return_code == 0 else "执行失败"),
+    }
 
 
-def _run_powershell(label: str, script: str, timeout: int = 300) -> dict[str, Any]:
+def _run_powershell(label: str, script: str, timeout: int = 300,
+                    ctx: Optional[ActionContext] = None) -> dict[str, Any]:
     return _run_fixed_command(
         label,
         ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", script],
         timeout=timeout,
+        ctx=ctx,
+    )
+
+
+def _command_steps(ctx: ActionContext, commands: list[tuple[str, list[str], int]], prefix: str,
+                   after: tuple[str, ...] = (), chain: bool = False, always_run: bool = False) -> list[ActionStep]:
+    """
+    命令步骤；chain=True 时按列表顺序依次执行（如先停 wuauserv 再停 BITS）。
+    always_run=True 的是收尾命令：取消后依然执行，且执行中不会被取消终止
+    """
+    steps: list[ActionStep] = []
+    for index, (label, args, timeout) in enumerate(commands):
+        deps = after + ((steps[-1].key,) if chain and steps else ())
+        run = partial(_run_fixed_command, label, args, timeout, ctx, not always_run)
+        steps.append(ActionStep(f"{prefix}:{index}", label, run, deps, always_run))
+    return steps
+
+
+def _paths_overlap(first: str, second: str) -> bool:
+    if not first or not second:
+        return False
+    first = os.path.normcase(os.path.abspath(first)).rstrip(os.sep) + os.sep
+    second = os.path.normcase(os.path.abspath(second)).rstrip(os.sep) + os.sep
+    return first.startswith(second) or second.startswith(first)
+
+
+def _clean_path_step(ctx: ActionContext, key: str, path: str) -> dict[str, Any]:
+    label = f"清理 {path}"
+    return {"label": label, **_delete_path_contents(path, ctx.delete_engine(key, label))}
+
+
+def _clean_steps(ctx: ActionContext, paths: list[str], prefix: str = "clean") -> list[ActionStep]:
+    """清空目录的步骤：互不相交的目录并发，相同或互相包含的目录按列表顺序依次清理"""
+    steps: list[ActionStep] = []
+    for index, path in enumerate(paths):
+        key = f"{prefix}:{index}"
+        after = tuple(step.key for step, other in zip(steps, paths) if _paths_overlap(path, other))
+        steps.append(ActionStep(key, f"清理 {path}", partial(_clean_path_step, ctx, key, path), after))
+    return steps
+
+
+def _sum_results(results: list[dict[str, Any]]) -> tuple[int, int, int]:
+    """(释放字节数, 删除项数, 失败项数)"""
+    return (
+        sum(result.get("freed_bytes", 0) for result in results),
+        sum(result.get("deleted", 0) for result in results),
+        sum(result.get("failed", 0) for result in results),
     )
 
 
-def _safe_cleanup_action() -> dict[str, Any]:
-    temp_paths = [
+def _safe_cleanup_targets() -> list[str]:
+    return [
         os.environ.get("TEMP", ""),
         "C:\\Windows\\Temp",
         os.path.join(os.environ.get("LOCALAPPDATA", ""), "CrashDumps"),
     ]
 
-    steps = []
-    freed = 0
-    deleted = 0
-    failed = 0
-    for path in temp_paths:
-        result = _delete_path_contents(path)
-        steps.append({"label": f"清理 {path}", **result})
-        freed += result.get("freed_bytes", 0)
-        deleted += result.get("deleted", 0)
-        failed += result.get("failed", 0)
-
-    command_steps = [
-        _run_fixed_command("清理 npm 缓存", ["npm", "cache", "clean", "--force"], timeout=180),
-        _run_fixed_command("精简 pnpm store", ["pnpm", "store", "prune"], timeout=180),
-        _run_fixed_command("清理 pip 缓存", ["pip", "cache", "purge"], timeout=180),
+
+def _aggressive_cleanup_targets() -> list[str]:
+    return [
+        os.environ.get("TEMP", ""),
+        "C:\\Windows\\Temp",
+        os.path.join(os.environ.get("LOCALAPPDATA", ""), "CrashDumps"),
+        os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "WER"),
+        r"C:\Windows\Logs\CBS",
+        r"C:\Windows\Logs\DISM",
+        r"C:\Windows\Logs\WindowsUpdate",
+        r"C:\Windows\Minidump",
+        r"C:\ProgramData\Microsoft\Windows Defender\Scans\History\Service",
+        RECYCLE_BIN_PATH,
     ]
-    steps.extend(command_steps)
+
+
+def _safe_cleanup_action(ctx: ActionContext) -> dict[str, Any]:
+    clean = _clean_steps(ctx, _safe_cleanup_targets())
+    steps = ctx.run(clean + _command_steps(ctx, SAFE_CLEANUP_COMMANDS, "command"))
+    freed, deleted, failed = _sum_results(steps[:len(clean)])
 
     return {
         "action": "safe_cleanup",
@@ -671,48 +851,76 @@ def _safe_cleanup_action() -> dict[str, Any]:
     }
 
 
-def _migrate_caches_action() -> dict[str, Any]:
-    targets = [
-        "D:\\DevCache\\npm",
-        "D:\\DevCache\\pnpm-store",
-        "D:\\DevCache\\pip",
-        "D:\\DevCache\\huggingface",
-        "D:\\Temp",
-    ]
+def _cache_migration_pairs() -> list[tuple[str, str, str]]:
+    """迁移开发缓存时搬运的已有缓存：(说明, 现有目录, 目标目录)；TEMP 正在使用，只改路径不搬内容"""
+    local = os.environ.get("LOCALAPPDATA", "")
+    user_profile = os.environ.get("USERPROFILE", "")
+    pairs = []
+    if local:
+        pairs.extend([
+            ("npm 缓存", os.path.join(local, "npm-cache"), "D:\\DevCache\\npm"),
+            ("pnpm store", os.path.join(local, "pnpm", "store"), "D:\\DevCache\\pnpm-store"),
+            ("pip 缓存", os.path.join(local, "pip", "Cache"), "D:\\DevCache\\pip"),
+        ])
+    if user_profile:
+        pairs.append(("Hugging Face 缓存", os.path.join(user_profile, ".cache", "huggingface"),
+                      "D:\\DevCache\\huggingface"))
+    return pairs
+
+
+def _migrate_cache_contents(ctx: ActionContext, key: str, label: str, source: str, target: str) -> dict[str, Any]:
+    label = f"迁移 {label}"
+    migrator = CacheMigrator(cancel_event=ctx.cancel_event,
+                             progress_callback=ctx.step_progress(key, label) if ctx.emit else None)
+    result = migrator.migrate(source, target)
+    return {
+        "label": label,
+        "path": source,
+        **result.to_dict(),
+        "freed_gb": _bytes_to_gb(result.freed_bytes),
+    }
 
+
+def _migrate_caches_action(ctx: ActionContext) -> dict[str, Any]:
     steps = []
-    for path in targets:
+    for path in MIGRATE_CACHE_DIRS:
         try:
             os.makedirs(path, exist_ok=True)
             steps.append({"label": f"创建目录 {path}", "status": "done", "message": "已创建或已存在"})
         except OSError as exc:
             steps.append({"label": f"创建目录 {path}", "status": "failed", "message": str(exc)})
 
-    steps.extend([
-        _run_fixed_command("设置 npm 缓存目录", ["npm", "config", "set", "cache", "D:\\DevCache\\npm"], timeout=120),
-        _run_fixed_command("设置 pnpm store 目录", ["pnpm", "config", "set", "store-dir", "D:\\DevCache\\pnpm-store"], timeout=120),
-        _run_fixed_command("设置 pip 缓存目录", ["setx", "PIP_CACHE_DIR", "D:\\DevCache\\pip"], timeout=120),
-        _run_fixed_command("设置 Hugging Face 缓存目录", ["setx", "HF_HOME", "D:\\DevCache\\huggingface"], timeout=120),
-        _run_fixed_command("设置用户 TEMP", ["setx", "TEMP", "D:\\Temp"], timeout=120),
-        _run_fixed_command("设置用户 TMP", ["setx", "TMP", "D:\\Temp"], timeout=120),
-    ])
-
-    failed = sum(1 for step in steps if step.get("status") == "failed")
+    # 各缓存的搬运互相独立、并发进行；全部搬完后再把各工具的缓存路径指向新位置
+    pairs = _cache_migration_pairs()
+    plan = [
+        ActionStep(f"migrate:{index}", f"迁移 {label}",
+                   partial(_migrate_cache_contents, ctx, f"migrate:{index}", label, source, target))
+        for index, (label, source, target) in enumerate(pairs)
+    ]
+    plan.extend(_command_steps(ctx, MIGRATE_CACHE_COMMANDS, "command", after=tuple(step.key for step in plan)))
+    results = ctx.run(plan)
+    migrations = results[:len(pairs)]
+    steps.extend(results)
+
+    # 取消前未开始或抛出异常的步骤只有执行器给的占位结果
+    freed = sum(step.get("freed_bytes", 0) for step in migrations)
+    moved = sum(step.get("bytes_moved", 0) for step in migrations)
+    failed = sum(1 for step in steps if step.get("status") in ("failed", "partial"))
     return {
         "action": "migrate_caches",
         "title": "迁移开发缓存",
         "status": "done" if failed == 0 else "partial",
-        "freed_bytes": 0,
-        "freed_gb": 0,
+        "freed_bytes": freed,
+        "freed_gb": _bytes_to_gb(freed),
         "deleted": 0,
         "failed": failed,
         "restart_required": True,
         "steps": steps,
-        "message": "环境变量对新打开的终端和应用生效。",
+        "message": f"已迁移 {_bytes_to_gb(moved)} GB 已有缓存。环境变量对新打开的终端和应用生效。",
     }
 
 
-def _optimize_pagefile_action() -> dict[str, Any]:
+def _optimize_pagefile_action(ctx: ActionContext) -> dict[str, Any]:
     script = r"""
 $ErrorActionPreference = 'Stop'
 $computer = Get-CimInstance -ClassName Win32_ComputerSystem
@@ -733,7 +941,7 @@ if (Test-Path 'D:\') {
 }
 '页面文件已设置：C 盘 4-8GB，D 盘 8-16GB（如 D 盘存在）。重启后释放空间。'
 """
-    step = _run_powershell("优化页面文件", script, timeout=300)
+    step = ctx.run([ActionStep("pagefile", "优化页面文件", partial(_run_powershell, "优化页面文件", script, 300, ctx))])[0]
     return {
         "action": "optimize_pagefile",
         "title": "优化页面文件",
@@ -748,14 +956,8 @@ if (Test-Path 'D:\') {
     }
 
 
-def _component_cleanup_action() -> dict[str, Any]:
-    steps = [
-        _run_fixed_command(
-            "Windows 组件存储清理",
-            ["Dism.exe", "/Online", "/Cleanup-Image", "/StartComponentCleanup"],
-            timeout=1800,
-        ),
-    ]
+def _component_cleanup_action(ctx: ActionContext) -> dict[str, Any]:
+    steps = ctx.run(_command_steps(ctx, COMPONENT_CLEANUP_COMMANDS, "command", chain=True))
     failed = sum(1 for step in steps if step.get("status") == "failed")
     return {
         "action": "component_cleanup",
@@ -771,15 +973,11 @@ def _component_cleanup_action() -> dict[str, Any]:
     }
 
 
-def _disable_hibernation_action() -> dict[str, Any]:
+def _disable_hibernation_action(ctx: ActionContext) -> dict[str, Any]:
     """关闭休眠，释放 hiberfil.sys（等于物理内存大小）。需要管理员权限。"""
-    before_size = _protected_file_size(r"C:\hiberfil.sys")
-    step = _run_fixed_command(
-        "禁用休眠并删除 hiberfil.sys",
-        ["powercfg.exe", "/hibernate", "off"],
-        timeout=60,
-    )
-    after_size = _protected_file_size(r"C:\hiberfil.sys")
+    before_size = _protected_file_size(HIBERFIL_PATH)
+    step = ctx.run(_command_steps(ctx, DISABLE_HIBERNATION_COMMANDS, "command"))[0]
+    after_size = _protected_file_size(HIBERFIL_PATH)
     freed = max(0, before_size - after_size)
     return {
         "action": "disable_hibernation",
@@ -799,23 +997,17 @@ def _disable_hibernation_action() -> dict[str, Any]:
     }
 
 
-def _windows_update_cleanup_action() -> dict[str, Any]:
+def _windows_update_cleanup_action(ctx: ActionContext) -> dict[str, Any]:
     """停止 wuauserv，清空 SoftwareDistribution\\Download，再重启服务。"""
-    download = r"C:\Windows\SoftwareDistribution\Download"
-    before = _path_size(download)
-    steps = [
-        _run_fixed_command("停止 Windows Update 服务", ["net.exe", "stop", "wuauserv"], timeout=120),
-        _run_fixed_command("停止 BITS 服务", ["net.exe", "stop", "bits"], timeout=120),
-    ]
-    clean_step = _delete_path_contents(download)
-    clean_step["label"] = f"清理 {download}"
-    steps.append(clean_step)
-    steps.extend([
-        _run_fixed_command("启动 BITS 服务", ["net.exe", "start", "bits"], timeout=120),
-        _run_fixed_command("启动 Windows Update 服务", ["net.exe", "start", "wuauserv"], timeout=120),
-    ])
-    after = _path_size(download)
-    freed = max(0, before - after)
+    stop = _command_steps(ctx, WINDOWS_UPDATE_STOP_COMMANDS, "stop", chain=True)
+    clean = _clean_steps(ctx, [WINDOWS_UPDATE_DOWNLOAD])[0]
+    clean = replace(clean, after=(stop[-1].key,))
+    # 取消时也要把服务启动回来
+    start = _command_steps(ctx, WINDOWS_UPDATE_START_COMMANDS, "start", after=(clean.key,), chain=True,
+                           always_run=True)
+    steps = ctx.run(stop + [clean] + start)
+    clean_step = steps[len(stop)]
+    freed = clean_step.get("freed_bytes", 0)
     failed = sum(1 for step in steps if step.get("status") in ("failed", "partial"))
     return {
         "action": "windows_update_cleanup",
@@ -831,34 +1023,28 @@ def _windows_update_cleanup_action() -> dict[str, Any]:
     }
 
 
-def _d_drive_cleanup_action() -> dict[str, Any]:
+def _skipped_d_cleanup_step(path: str) -> dict[str, Any]:
+    return {
+        "label": f"跳过 {path}",
+        "path": path,
+        "status": "skipped",
+        "freed_bytes": 0,
+        "freed_gb": 0,
+        "deleted": 0,
+        "failed": 0,
+        "message": "不在 D 盘清理白名单内",
+    }
+
+
+def _d_drive_cleanup_action(ctx: ActionContext) -> dict[str, Any]:
     """清理刚定位出的 D 盘可重建构建产物和缓存。"""
     targets = _d_drive_cleanup_candidates()
-    steps = []
-    freed = 0
-    deleted = 0
-    failed = 0
-
-    for path in targets:
+    plan = _clean_steps(ctx, targets)
+    for index, path in enumerate(targets):
         if not _is_known_d_cleanup_path(path):
-            steps.append({
-                "label": f"跳过 {path}",
-                "path": path,
-                "status": "skipped",
-                "freed_bytes": 0,
-                "freed_gb": 0,
-                "deleted": 0,
-                "failed": 0,
-                "message": "不在 D 盘清理白名单内",
-            })
-            continue
-
-        result = _delete_path_contents(path)
-        result["label"] = f"清理 {path}"
-        steps.append(result)
-        freed += result.get("freed_bytes", 0)
-        deleted += result.get("deleted", 0)
-        failed += result.get("failed", 0)
+            plan[index] = replace(plan[index], label=f"跳过 {path}", run=partial(_skipped_d_cleanup_step, path))
+    steps = ctx.run(plan)
+    freed, deleted, failed = _sum_results(steps)
 
     if not steps:
         return {
@@ -871,7 +1057,7 @@ def _d_drive_cleanup_action() -> dict[str, Any]:
             "failed": 0,
             "restart_required": False,
             "steps": [],
-            "message": "没有找到可清理的 D 盘 target、部署暂存或企业微信缓存。",
+            "message": f"没有找到可清理的 {_d_drive_cleanup_summary()}。",
         }
 
     return {
@@ -884,67 +1070,37 @@ def _d_drive_cleanup_action() -> dict[str, Any]:
         "failed": failed,
         "restart_required": False,
         "steps": steps,
-        "message": "已清理 D 盘 Rust/Tauri target、visualize_ta 部署暂存/历史包和企业微信缓存；Android 模拟器镜像未自动删除。",
+        "message": f"已清理 {_d_drive_cleanup_summary()}"
+                   + ("；Android 模拟器镜像未自动删除。" if existing_android_image_dirs() else "。"),
     }
 
 
-def _aggressive_cleanup_action() -> dict[str, Any]:
-    """一键激进清理：聚合临时文件、CrashDumps、回收站、Defender 历史、Memory.dmp、CBS 日志。"""
-    targets = [
-        os.environ.get("TEMP", ""),
-        "C:\\Windows\\Temp",
-        os.path.join(os.environ.get("LOCALAPPDATA", ""), "CrashDumps"),
-        os.path.join(os.environ.get("LOCALAPPDATA", ""), "Microsoft", "Windows", "WER"),
-        r"C:\Windows\Logs\CBS",
-        r"C:\Windows\Logs\DISM",
-        r"C:\Windows\Logs\WindowsUpdate",
-        r"C:\Windows\Minidump",
-        r"C:\ProgramData\Microsoft\Windows Defender\Scans\History\Service",
-        r"C:\$Recycle.Bin",
-    ]
+def _delete_memory_dump() -> dict[str, Any]:
+    result = DeleteEngine().delete_path(MEMORY_DUMP_PATH)
+    return {"label": f"删除 {MEMORY_DUMP_PATH}", "status": "done" if result.deleted else "failed",
+            "freed_bytes": result.freed_bytes, "freed_gb": _bytes_to_gb(result.freed_bytes),
+            "deleted": result.deleted, "failed": result.failed,
+            "message": "已删除" if result.deleted else "文件被占用或无权限"}
 
-    steps = []
-    freed = 0
-    deleted = 0
-    failed = 0
-    for path in targets:
-        if not path:
-            continue
-        result = _delete_path_contents(path)
-        result["label"] = f"清理 {path}"
-        steps.append(result)
-        freed += result.get("freed_bytes", 0)
-        deleted += result.get("deleted", 0)
-        failed += result.get("failed", 0)
+
+def _aggressive_cleanup_action(ctx: ActionContext) -> dict[str, Any]:
+    """一键激进清理：聚合临时文件、CrashDumps、回收站、Defender 历史、Memory.dmp、CBS 日志。"""
+    targets = [path for path in _aggressive_cleanup_targets() if path]
+    plan = _clean_steps(ctx, targets)
 
     # 单文件型
-    if os.path.exists(r"C:\Windows\Memory.dmp"):
-        try:
-            size = _path_size(r"C:\Windows\Memory.dmp")
-            os.remove(r"C:\Windows\Memory.dmp")
-            freed += size
-            deleted += 1
-            steps.append({"label": "删除 C:\\Windows\\Memory.dmp", "status": "done",
-                          "freed_bytes": size, "freed_gb": _bytes_to_gb(size), "deleted": 1, "failed": 0,
-                          "message": "已删除"})
-        except OSError as exc:
-            failed += 1
-            steps.append({"label": "删除 C:\\Windows\\Memory.dmp", "status": "failed",
-                          "freed_bytes": 0, "freed_gb": 0, "deleted": 0, "failed": 1,
-                          "message": str(exc)})
-
-    # 命令型清理
-    command_steps = [
-        _run_fixed_command("清理 npm 缓存", ["npm", "cache", "clean", "--force"], timeout=180),
-        _run_fixed_command("精简 pnpm store", ["pnpm", "store", "prune"], timeout=180),
-        _run_fixed_command("清理 pip 缓存", ["pip", "cache", "purge"], timeout=180),
-        _run_fixed_command("清理 yarn 缓存", ["yarn", "cache", "clean"], timeout=180),
-        _run_fixed_command("清理 Cargo 编译产物", ["cargo", "cache", "--autoclean"], timeout=180),
-        _run_fixed_command("清理 Go 构建缓存", ["go", "clean", "-cache"], timeout=180),
-        _run_fixed_command("清空回收站", ["powershell", "-NoProfile", "-Command",
-                                       "Clear-RecycleBin -Force -ErrorAction SilentlyContinue"], timeout=180),
-    ]
-    steps.extend(command_steps)
+    if os.path.exists(MEMORY_DUMP_PATH):
+        plan.append(ActionStep("memory_dump", f"删除 {MEMORY_DUMP_PATH}", _delete_memory_dump))
+    deletions = len(plan)
+
+    # 命令型清理；清空回收站要等 $Recycle.Bin 目录清理结束，避免两边同时删同一批文件
+    recycle_bin = tuple(step.key for step, path in zip(plan, targets) if path == RECYCLE_BIN_PATH)
+    plan.extend(
+        replace(step, after=recycle_bin) if command is RECYCLE_BIN_COMMAND else step
+        for step, command in zip(_command_steps(ctx, AGGRESSIVE_CLEANUP_COMMANDS, "command"), AGGRESSIVE_CLEANUP_COMMANDS)
+    )
+    steps = ctx.run(plan)
+    freed, deleted, failed = _sum_results(steps[:deletions])
 
     return {
         "action": "aggressive_cleanup",
@@ -960,17 +1116,170 @@ def _aggressive_cleanup_action() -> dict[str, Any]:
     }
 
 
-def run_cleanup_diagnosis_action(action: str) -> dict[str, Any]:
-    actions = {
-        "safe_cleanup": _safe_cleanup_action,
-        "aggressive_cleanup": _aggressive_cleanup_action,
-        "migrate_caches": _migrate_caches_action,
-        "optimize_pagefile": _optimize_pagefile_action,
-        "component_cleanup": _component_cleanup_action,
-        "disable_hibernation": _disable_hibernation_action,
-        "windows_update_cleanup": _windows_update_cleanup_action,
-        "d_drive_cleanup": _d_drive_cleanup_action,
+def _dry_run_spec(action: str) -> dict[str, Any]:
+    """各动作将清理的路径与将执行的命令（与实际执行顺序一致），供预演使用"""
+    specs = {
+        "safe_cleanup": lambda: {
+            "title": "安全清理", "paths": _safe_cleanup_targets(), "commands": SAFE_CLEANUP_COMMANDS,
+        },
+        "aggressive_cleanup": lambda: {
+            "title": "一键激进清理", "paths": _aggressive_cleanup_targets() + [MEMORY_DUMP_PATH],
+            "commands": AGGRESSIVE_CLEANUP_COMMANDS,
+        },
+        "migrate_caches": lambda: {
+            "title": "迁移开发缓存", "migrations": _cache_migration_pairs(), "commands": MIGRATE_CACHE_COMMANDS,
+            "restart_required": True,
+        },
+        "optimize_pagefile": lambda: {
+            "title": "优化页面文件", "restart_required": True,
+            "commands": [("优化页面文件", ["powershell", "-NoProfile", "-Command", "<页面文件配置脚本>"], 300)],
+        },
+        "component_cleanup": lambda: {
+            "title": "Windows 系统组件清理", "commands": COMPONENT_CLEANUP_COMMANDS,
+        },
+        "disable_hibernation": lambda: {
+            "title": "禁用休眠（释放 hiberfil.sys）", "commands": DISABLE_HIBERNATION_COMMANDS,
+            "protected_files": [HIBERFIL_PATH],
+        },
+        "windows_update_cleanup": lambda: {
+            "title": "Windows 更新缓存清理", "paths": [WINDOWS_UPDATE_DOWNLOAD],
+            "commands": WINDOWS_UPDATE_STOP_COMMANDS + WINDOWS_UPDATE_START_COMMANDS,
+        },
+        "d_drive_cleanup": lambda: {
+            "title": "D盘项目清理", "paths": _d_drive_cleanup_candidates(),
+        },
     }
-    if action not in actions:
+    if action not in specs:
         raise ValueError(f"未知动作: {action}")
-    return actions[action]()
+    return specs[action]()
+
+
+def _dry_run_action(action: str, full_file_list: bool = False) -> dict[str, Any]:
+    """
+    预演动作：统计将删除的文件数、字节数与最大的若干文件（full_file_list=True 时为将删除的全部文件），
+    并按实测删除吞吐量预估耗时，不改动磁盘。
+    目录统计复用磁盘分析的目录索引（mtime 未变的目录不再列举）；命令类步骤释放的空间无法预估。
+    """
+    spec = _dry_run_spec(action)
+    file_limit = None if full_file_list else DRY_RUN_FILE_LIMIT
+    throughput = load_delete_throughput()
+    index = SizeIndex()
+
+    steps = []
+    files: list[dict[str, Any]] = []
+    freed = 0
+    file_count = 0
+    for path in spec.get("paths", []):
+        if not path:
+            continue
+        plan = plan_delete(path, index=index, file_limit=file_limit)
+        seconds = estimate_delete_seconds(plan.file_count, throughput)
+        freed += plan.total_bytes
+        file_count += plan.file_count
+        files.extend(plan.to_dict()["files"])
+        steps.append({
+            "label": f"清理 {path}",
+            "path": path,
+            "status": "skipped" if plan.missing else "planned",
+            "freed_bytes": plan.total_bytes,
+            "freed_gb": _bytes_to_gb(plan.total_bytes),
+            "file_count": plan.file_count,
+            "predicted_seconds": seconds,
+            "message": "路径不存在" if plan.missing else f"{plan.file_count} 个文件，预计 {seconds} 秒",
+        })
+
+    for label, source, target in spec.get("migrations", []):
+        plan = plan_delete(source, index=index)
+        # 同卷改名不释放空间；跨卷复制校验后释放原目录
+        frees = 0 if plan.missing or same_volume(source, target) else plan.total_bytes
+        freed += frees
+        steps.append({
+            "label": f"迁移 {label}",
+            "path": source,
+            "target": target,
+            "status": "skipped" if plan.missing else "planned",
+            "freed_bytes": frees,
+            "freed_gb": _bytes_to_gb(frees),
+            "file_count": plan.file_count,
+            "message": "目录不存在" if plan.missing
+                       else f"{plan.file_count} 个文件（{_bytes_to_gb(plan.total_bytes)} GB）迁移到 {target}",
+        })
+
+    for path in spec.get("protected_files", []):
+        size = _protected_file_size(path)
+        freed += size
+        steps.append({
+            "label": f"释放 {path}",
+            "path": path,
+            "status": "planned" if size else "skipped",
+            "freed_bytes": size,
+            "freed_gb": _bytes_to_gb(size),
+            "message": "由系统命令删除" if size else "文件不存在",
+        })
+
+    for label, args, timeout in spec.get("commands", []):
+        steps.append({
+            "label": label,
+            "status": "planned",
+            "command": " ".join(args),
+            "message": f"将执行命令（超时 {timeout} 秒）",
+        })
+
+    files.sort(key=lambda item: item["size"], reverse=True)
+    predicted_seconds = estimate_delete_seconds(file_count, throughput)
+    return {
+        "action": action,
+        "title": spec["title"],
+        "dry_run": True,
+        "status": "planned",
+        "freed_bytes": freed,
+        "freed_gb": _bytes_to_gb(freed),
+        "deleted": 0,
+        "failed": 0,
+        "file_count": file_count,
+        "files": files[:file_limit],
+        "files_truncated": file_count > len(files[:file_limit]),
+        "predicted_seconds": predicted_seconds,
+        "throughput": throughput,
+        "restart_required": spec.get("restart_required", False),
+        "steps": steps,
+        "message": f"预演：未改动磁盘。删除文件预计耗时约 {predicted_seconds} 秒"
+                   + ("" if throughput["measured"] else "（尚无实测吞吐量，按默认值估算）")
+                   + "，命令类步骤的耗时与释放空间未计入。",
+    }
+
+
+_ACTIONS: dict[str, Callable[[ActionContext], dict[str, Any]]] = {
+    "safe_cleanup": _safe_cleanup_action,
+    "aggressive_cleanup": _aggressive_cleanup_action,
+    "migrate_caches": _migrate_caches_action,
+    "optimize_pagefile": _optimize_pagefile_action,
+    "component_cleanup": _component_cleanup_action,
+    "disable_hibernation": _disable_hibernation_action,
+    "windows_update_cleanup": _windows_update_cleanup_action,
+    "d_drive_cleanup": _d_drive_cleanup_action,
+}
+
+
+def is_diagnosis_action(action: str) -> bool:
+    return action in _ACTIONS
+
+
+def run_cleanup_diagnosis_action(action: str, dry_run: bool = False,
+                                 emit: Optional[Callable[[dict[str, Any]], None]] = None,
+                                 cancel_event: Optional[threading.Event] = None,
+                                 full_file_list: bool = False) -> dict[str, Any]:
+    """
+    执行（或预演）体检动作。emit 收到命令输出等过程事件（在执行线程中调用）；
+    cancel_event 置位后正在运行的命令被终止，尚未开始的步骤跳过；
+    full_file_list=True 时预演结果列出将删除的全部文件，而不只是最大的 DRY_RUN_FILE_LIMIT 个
+    """
+    if dry_run:
+        return _dry_run_action(action, full_file_list)
+    if action not in _ACTIONS:
+        raise ValueError(f"未知动作: {action}")
+    try:
+        return _ACTIONS[action](ActionContext(emit, cancel_event))
+    finally:
+        # DISM、包管理器命令等改动不一定反映在探测目录的 mtime 上
+        clear_diagnosis_cache()
@@ -0,0 +1,317 @@
+"""
+并行目录遍历器
+多线程 os.scandir + 工作窃取，disk / cleanup / 诊断共用同一套遍历逻辑
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+
+# 元数据遍历主要受 IO 延迟限制，线程数可以明显多于 CPU 核数
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 4) * 2)
+
+
+@dataclass
+class WalkStats:
+    """一个遍历根的聚合统计；age_sizes/age_counts 与 age_buckets 一一对应（修改时间 >= N 天）"""
+    size: int = 0
+    file_count: int = 0
+    dir_count: int = 0
+    entries: int = 0
+    age_sizes: list[int] = field(default_factory=list)
+    age_counts: list[int] = field(default_factory=list)
+
+    def merge(self, other: "WalkStats"):
+        self.size += other.size
+        self.file_count += other.file_count
+        self.dir_count += other.dir_count
+        self.entries += other.entries
+        if len(self.age_sizes) < len(other.age_sizes):
+            pad = len(other.age_sizes) - len(self.age_sizes)
+            self.age_sizes.extend([0] * pad)
+            self.age_counts.extend([0] * pad)
+        for i, value in enumerate(other.age_sizes):
+            self.age_sizes[i] += value
+            self.age_counts[i] += other.age_counts[i]
+
+
+@dataclass
+class DirListing:
+    """单个目录的一次列举结果（仅在设置了 on_dir 时收集）"""
+    root: str
+    path: str
+    depth: int
+    mtime: float                          # 目录自身的修改时间（列举前读取）
+    files: list[tuple[str, int, float]]   # (name, size, mtime)
+    dirs: list[str]                       # 全部子目录名（含未进入遍历的）
+    others: list[str] = field(default_factory=list)   # 既非文件也非目录的目录项名（符号链接等）
+
+
+class ParallelWalker:
+    """
+    多线程目录遍历器
+
+    每个工作线程持有自己的双端队列：从尾部取任务（深度优先，局部性好），
+    自己没活时从其它线程队列头部窃取（通常是靠近根的大子树）。线程按需启动，
+    小目录树不会付出建线程的开销。
+
+    回调均在工作线程中执行，需自行保证线程安全：
+    - on_file(root, entry, stat)：每个普通文件一次
+    - on_other(root, entry)：既不是普通文件也不是目录的目录项（符号链接等）一次
+    - on_dir(listing)：每个目录列举完成后一次
+    - descend(entry, depth)：返回 False 则不进入该子目录
+    - on_root_done(root, stats)：某个遍历根的整棵子树完成时一次
+    - on_error(root, path, exc)：目录无法列举或目录项无法 stat 时一次（默认静默跳过）
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        skip_dirs: Iterable[str] = (),
+        age_buckets: Iterable[float] = (),
+        on_file: Optional[Callable] = None,
+        on_dir: Optional[Callable[[DirListing], None]] = None,
+        descend: Optional[Callable[[os.DirEntry, int], bool]] = None,
+        on_root_done: Optional[Callable[[str, WalkStats], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+        on_other: Optional[Callable[[str, os.DirEntry], None]] = None,
+        on_error: Optional[Callable[[str, str, OSError], None]] = None,
+    ):
+        self.workers = max(1, workers or DEFAULT_WORKERS)
+        self.max_depth = max_depth
+        self.skip_dirs = frozenset(skip_dirs)
+        self.age_buckets = tuple(age_buckets)
+        self.on_file = on_file
+        self.on_dir = on_dir
+        self.descend = descend
+        self.on_root_done = on_root_done
+        self.cancel_event = cancel_event
+        self.on_other = on_other
+        self.on_error = on_error
+
+    # ── 对外接口 ──────────────────────────────────────────────────────────────
+
+    def walk(self, roots: Iterable[str]) -> dict[str, WalkStats]:
+        """遍历所有根，返回 {root: WalkStats}；根为文件时直接统计该文件"""
+        self._now = time.time()
+        self._cond = threading.Condition()
+        self._deques: list[deque] = []
+        self._locals: list[dict[str, WalkStats]] = []
+        self._threads: list[threading.Thread] = []
+        self._pending = 0
+        self._idle = 0
+        self._root_pending: dict[str, int] = {}
+        self._error: Optional[BaseException] = None
+
+        results: dict[str, WalkStats] = {}
+        dir_roots = []
+        for root in roots:
+            results[root] = self._new_stats()
+            try:
+                if os.path.isdir(root):
+                    dir_roots.append(root)
+                    continue
+                if os.path.isfile(root):
+                    st = os.stat(root)
+                    self._count_file(results[root], st)
+            except OSError:
+                pass
+            if self.on_root_done:
+                self.on_root_done(root, results[root])
+
+        if dir_roots:
+            self._deques.append(deque())
+            self._locals.append({})
+            for root in dir_roots:
+                self._root_pending[root] = self._root_pending.get(root, 0) + 1
+                self._pending += 1
+                self._deques[0].append((root, root, 0))
+            # 调用线程自身作为 0 号工作线程
+            self._run_worker(0)
+            for thread in list(self._threads):
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+        for local in self._locals:
+            for root, stats in local.items():
+                results[root].merge(stats)
+        return results
+
+    def cancelled(self) -> bool:
+        return bool(self.cancel_event and self.cancel_event.is_set())
+
+    # ── 调度 ──────────────────────────────────────────────────────────────────
+
+    def _new_stats(self) -> WalkStats:
+        n = len(self.age_buckets)
+        return WalkStats(age_sizes=[0] * n, age_counts=[0] * n)
+
+    def _push(self, index: int, task: tuple):
+        with self._cond:
+            self._pending += 1
+            self._root_pending[task[0]] += 1
+            self._deques[index].append(task)
+            if self._idle:
+                self._cond.notify()
+            elif len(self._threads) + 1 < self.workers:
+                self._spawn()
+
+    def _spawn(self):
+        index = len(self._deques)
+        self._deques.append(deque())
+        self._locals.append({})
+        thread = threading.Thread(target=self._run_worker, args=(index,), daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _take(self, index: int) -> Optional[tuple]:
+        try:
+            return self._deques[index].pop()
+        except IndexError:
+            pass
+        count = len(self._deques)
+        if count <= 1:
+            return None
+        start = random.randrange(count)
+        for offset in range(count):
+            victim = (start + offset) % count
+            if victim == index:
+                continue
+            try:
+                return self._deques[victim].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def _run_worker(self, index: int):
+        while True:
+            task = self._take(index)
+            if task is None:
+                with self._cond:
+                    if self._pending == 0:
+                        self._cond.notify_all()
+                        return
+                    self._idle += 1
+                    self._cond.wait(0.05)
+                    self._idle -= 1
+                continue
+
+            root = task[0]
+            try:
+                if self._error is None and not self.cancelled():
+                    self._scan(index, task)
+            except BaseException as exc:  # 回调异常：记录后让所有线程尽快退出
+                self._error = exc
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self._root_pending[root] -= 1
+                    root_done = self._root_pending[root] == 0
+                    if self._pending == 0:
+                        self._cond.notify_all()
+            if root_done and self.on_root_done and self._error is None:
+                try:
+                    self.on_root_done(root, self._root_stats(root))
+                except BaseException as exc:
+                    self._error = exc
+
+    def _root_stats(self, root: str) -> WalkStats:
+        stats = self._new_stats()
+        for local in list(self._locals):
+            if root in local:
+                stats.merge(local[root])
+        return stats
+
+    # ── 单目录列举 ────────────────────────────────────────────────────────────
+
+    def _count_file(self, stats: WalkStats, st: os.stat_result):
+        stats.size += st.st_size
+        stats.file_count += 1
+        if self.age_buckets:
+            age_days = (self._now - st.st_mtime) / 86400
+            for i, days in enumerate(self.age_buckets):
+                if age_days >= days:
+                    stats.age_sizes[i] += st.st_size
+                    stats.age_counts[i] += 1
+
+    def _scan(self, index: int, task: tuple):
+        root, path, depth = task
+        local = self._locals[index]
+        stats = local.get(root)
+        if stats is None:
+            stats = local[root] = self._new_stats()
+
+        collect = self.on_dir is not None
+        files: list[tuple[str, int, float]] = []
+        dirs: list[str] = []
+        others: list[str] = []
+        child_depth = depth + 1
+        can_descend = self.max_depth is None or child_depth <= self.max_depth
+
+        mtime = 0.0
+        if collect:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError as exc:
+                if self.on_error:
+                    self.on_error(root, path, exc)
+                return
+
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    stats.entries += 1
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stats.dir_count += 1
+                            if collect:
+                                dirs.append(entry.name)
+                            if not can_descend or entry.name in self.skip_dirs:
+                                continue
+                            if self.descend and not self.descend(entry, child_depth):
+                                continue
+                            self._push(index, (root, entry.path, child_depth))
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            self._count_file(stats, st)
+                            if collect:
+                                files.append((entry.name, st.st_size, st.st_mtime))
+                            if self.on_file:
+                                self.on_file(root, entry, st)
+                        else:
+                            if collect:
+                                others.append(entry.name)
+                            if self.on_other:
+                                self.on_other(root, entry)
+                    except OSError as exc:
+                        if self.on_error:
+                            self.on_error(root, entry.path, exc)
+                        continue
+        except OSError as exc:
+            if self.on_error:
+                self.on_error(root, path, exc)
+            return
+
+        if collect:
+            self.on_dir(DirListing(root, path, depth, mtime, files, dirs, others))
+
+
+def walk_stats(path: str, **kwargs) -> WalkStats:
+    """统计单个路径（文件或目录）的大小、文件数与可选的修改时间分布"""
+    return ParallelWalker(**kwargs).walk([path])[path]
+
+
+def path_size(path: str, workers: Optional[int] = None,
+              cancel_event: Optional[threading.Event] = None) -> int:
+    """路径总大小（字节）；不存在或无法访问时返回 0"""
+    if not path:
+        return 0
+    return walk_stats(path, workers=workers, cancel_event=cancel_event).size
@@ -0,0 +1,161 @@
+"""
+流式子进程执行
+基于 asyncio 启动外部命令，stdout / stderr 到达一行推送一行（on_line 回调），
+只在环形缓冲里保留最近的若干行，DISM 这类运行半小时、输出很多的命令不会占用无上限的内存。
+支持取消（threading.Event）与超时，超时 / 取消时先 terminate，宽限期后仍未退出再 kill。
+
+run_command 在调用线程里新建事件循环执行，供线程池中的同步代码调用；
+已在事件循环中的代码直接 await run_streaming。
+"""
+
+import asyncio
+import codecs
+import locale
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Sequence
+
+
+# 每个输出流保留的最近行数
+OUTPUT_RING_LINES = int(os.environ.get("TOOLPACK_COMMAND_OUTPUT_LINES", 200))
+# 单行最长字符数；没有换行的超长输出按此长度切分
+MAX_LINE_CHARS = 2000
+READ_CHUNK_SIZE = 8192
+# 检查取消与超时的间隔（秒）
+POLL_INTERVAL = 0.2
+# terminate 之后等待进程退出的秒数，超过后 kill
+KILL_GRACE_SECONDS = 5.0
+
+# \r 单独出现时是进度条刷新（DISM 的百分比），也按一行处理
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+@dataclass
+class CommandResult:
+    args: list[str]
+    return_code: Optional[int] = None
+    stdout: deque = field(default_factory=deque)   # 最近的输出行
+    stderr: deque = field(default_factory=deque)
+    dropped_lines: int = 0                         # 被环形缓冲挤掉的行数
+    timed_out: bool = False
+    cancelled: bool = False
+    seconds: float = 0.0
+
+    def tail(self, stream: str = "stdout") -> str:
+        return "\n".join(getattr(self, stream))
+
+
+async def _pump(reader: asyncio.StreamReader, emit: Callable[[str], None], encoding: str):
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    while True:
+        chunk = await reader.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        *lines, pending = _LINE_BREAK.split(pending)
+        for line in lines:
+            for start in range(0, len(line), MAX_LINE_CHARS):
+                emit(line[start:start + MAX_LINE_CHARS])
+        while len(pending) > MAX_LINE_CHARS:
+            emit(pending[:MAX_LINE_CHARS])
+            pending = pending[MAX_LINE_CHARS:]
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        emit(pending)
+
+
+async def _stop(proc: asyncio.subprocess.Process):
+    try:
+        proc.terminate()
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(proc.wait(), KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+
+
+async def run_streaming(
+    args: Sequence[str],
+    timeout: Optional[float] = None,
+    on_line: Optional[Callable[[str, str], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    ring_lines: int = OUTPUT_RING_LINES,
+    encoding: Optional[str] = None,
+) -> CommandResult:
+    """
+    执行命令直到退出、超时或取消。on_line(stream, line) 在事件循环线程中调用，stream 为 stdout / stderr；
+    空行不推送也不保留。启动失败（找不到程序等）抛出 OSError。
+    """
+    started = time.monotonic()
+    encoding = encoding or locale.getpreferredencoding(False)
+    result = CommandResult(list(args), stdout=deque(maxlen=ring_lines), stderr=deque(maxlen=ring_lines))
+
+    def emitter(stream: str) -> Callable[[str], None]:
+        ring = getattr(result, stream)
+
+        def emit(line: str):
+            line = line.rstrip()
+            if not line:
+                return
+            if len(ring) == ring.maxlen:
+                result.dropped_lines += 1
+            ring.append(line)
+            if on_line:
+                on_line(stream, line)
+        return emit
+
+    proc = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    pumps = asyncio.gather(
+        _pump(proc.stdout, emitter("stdout"), encoding),
+        _pump(proc.stderr, emitter("stderr"), encoding),
+    )
+    waiter = asyncio.ensure_future(proc.wait())
+    deadline = started + timeout if timeout else None
+    while not waiter.done():
+        await asyncio.wait({waiter}, timeout=POLL_INTERVAL)
+        if waiter.done():
+            break
+        if cancel_event is not None and cancel_event.is_set():
+            result.cancelled = True
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            result.timed_out = True
+            break
+    if not waiter.done():
+        await _stop(proc)
+    result.return_code = await waiter
+
+    # 子进程派生的后台进程可能继续占着管道，进程退出后最多再等一个宽限期
+    try:
+        await asyncio.wait_for(pumps, KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def run_command(args: Sequence[str], **kwargs) -> CommandResult:
+    """同步版本：在当前线程新建事件循环执行 run_streaming（不可在事件循环线程中调用）"""
+    if sys.platform == "win32":
+        # 服务端可能把全局策略设成了不支持子进程的 SelectorEventLoop，这里固定用 Proactor
+        loop = asyncio.ProactorEventLoop()
+        try:
+            return loop.run_until_complete(run_streaming(args, **kwargs))
+        finally:
+            loop.close()
+    return asyncio.run(run_streaming(args, **kwargs))
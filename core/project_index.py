@@ -0,0 +1,167 @@
+"""
+项目构建产物索引
+对每个项目根做一次并行遍历，找出 target / node_modules / build 等可重建的产物目录；
+结果按根缓存，记录遍历过的全部目录 mtime，目录增删（mtime 变化）后才重新遍历。
+清理规则与 C 盘体检的探测项共用这一份索引。
+"""
+
+import fnmatch
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from core.fs_walker import DEFAULT_WORKERS, ParallelWalker
+
+
+# 识别为构建产物的目录名；命中后不再进入其内部
+ARTIFACT_NAMES = frozenset({"target", "node_modules", ".gradle", "build", "dist", "__pycache__", ".venv"})
+
+# 不进入的目录（版本库元数据、Unity 工程的大资源目录等）
+DEFAULT_SKIP_DIRS = frozenset({".git", ".svn", ".hg", "Library", "Temp", "Logs", "Assets", "Art"})
+
+DEFAULT_MAX_DEPTH = 5
+
+# D 盘项目目录（Rust/Tauri target 规则与体检探测项共用）
+D_PROJECTS_ROOT = r"D:\Projects"
+
+
+def _is_glob(pattern: str) -> bool:
+    return any(char in pattern for char in "*?[")
+
+
+def name_matcher(patterns: Iterable[str]) -> Callable[[str], bool]:
+    """目录名匹配函数：不含通配符的按原样比较，含 * ? [ 的按 fnmatch 区分大小写匹配"""
+    patterns = frozenset(patterns)
+    literal = frozenset(pattern for pattern in patterns if not _is_glob(pattern))
+    globs = tuple(pattern for pattern in patterns if _is_glob(pattern))
+    if not globs:
+        return literal.__contains__
+    return lambda name: name in literal or any(fnmatch.fnmatchcase(name, pattern) for pattern in globs)
+
+
+@dataclass(frozen=True)
+class ProjectArtifact:
+    path: str
+    name: str      # 产物目录名（target、node_modules 等）
+    depth: int     # 相对项目根的深度（根的直接子目录为 1）
+    root: str
+
+
+@dataclass
+class _RootEntry:
+    artifacts: list[ProjectArtifact]
+    dir_mtimes: dict[str, float]   # 遍历过的目录 -> 遍历时的 mtime
+
+
+class ProjectIndex:
+    """按 (根, 深度, 跳过目录, 产物目录名) 缓存的构建产物索引；进程内单例"""
+
+    _instance = None
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or DEFAULT_WORKERS
+        self._entries: dict[tuple, _RootEntry] = {}
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+
+    @classmethod
+    def get_instance(cls) -> "ProjectIndex":
+        if cls._instance is None:
+            cls._instance = ProjectIndex()
+        return cls._instance
+
+    # ── 对外接口 ──────────────────────────────────────────────────────────────
+
+    def artifacts(self, roots: Iterable[str], names: Optional[Iterable[str]] = None,
+                  max_depth: int = DEFAULT_MAX_DEPTH,
+                  skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS,
+                  artifact_names: Iterable[str] = ARTIFACT_NAMES) -> list[ProjectArtifact]:
+        """
+        返回 roots 下的构建产物（按路径排序），names 为空时返回全部类型。
+        artifact_names 决定遍历时哪些目录算作产物（可含通配符），命中后不再进入其内部；
+        names 只筛选结果，同样支持通配符。
+        遍历深度与原先各规则一致：深度不超过 max_depth 的目录会被列举，
+        因此产物最深可出现在 max_depth + 1 层。
+        """
+        wanted = name_matcher(names) if names else None
+        skip = frozenset(skip_dirs)
+        stop = frozenset(artifact_names)
+        result = []
+        for root in roots:
+            if not os.path.isdir(root):
+                continue
+            for artifact in self._root_entry(root, max_depth, skip, stop).artifacts:
+                if wanted is None or wanted(artifact.name):
+                    result.append(artifact)
+        return sorted(result, key=lambda artifact: artifact.path)
+
+    def invalidate(self, root: Optional[str] = None):
+        """丢弃某个根（None 表示全部）的缓存"""
+        with self._lock:
+            if root is None:
+                self._entries.clear()
+                return
+            key = os.path.normcase(os.path.abspath(root))
+            for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == key]:
+                del self._entries[cache_key]
+
+    # ── 内部实现 ──────────────────────────────────────────────────────────────
+
+    def _root_entry(self, root: str, max_depth: int, skip: frozenset, stop: frozenset) -> _RootEntry:
+        key = (os.path.normcase(os.path.abspath(root)), max_depth, skip, stop)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # 同一个根同时只遍历一次，并发的调用方等待并复用结果
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and self._unchanged(entry):
+                return entry
+            entry = self._walk(root, max_depth, skip, stop)
+            with self._lock:
+                self._entries[key] = entry
+            return entry
+
+    def _unchanged(self, entry: _RootEntry) -> bool:
+        """并行 stat 遍历过的目录；任一目录消失或 mtime 变化即视为失效"""
+        def same(item: tuple[str, float]) -> bool:
+            try:
+                return os.stat(item[0]).st_mtime == item[1]
+            except OSError:
+                return False
+
+        items = list(entry.dir_mtimes.items())
+        if len(items) <= 64:
+            return all(map(same, items))
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return all(pool.map(same, items, chunksize=256))
+
+    def _walk(self, root: str, max_depth: int, skip: frozenset, stop: frozenset) -> _RootEntry:
+        is_artifact = name_matcher(stop)
+        lock = threading.Lock()
+        artifacts: list[ProjectArtifact] = []
+        dir_mtimes: dict[str, float] = {}
+        try:
+            dir_mtimes[root] = os.stat(root).st_mtime
+        except OSError:
+            return _RootEntry([], {})
+
+        def descend(entry: os.DirEntry, depth: int) -> bool:
+            if is_artifact(entry.name):
+                with lock:
+                    artifacts.append(ProjectArtifact(entry.path, entry.name, depth, root))
+                return False
+            if depth > max_depth or entry.name in skip:
+                return False
+            try:
+                mtime = entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                return False
+            with lock:
+                dir_mtimes[entry.path] = mtime
+            return True
+
+        ParallelWalker(workers=self.workers, descend=descend).walk([root])
+        return _RootEntry(artifacts, dir_mtimes)
@@ -0,0 +1,143 @@
+"""
+目录大小索引
+SQLite 持久化每个目录的聚合大小、自身 mtime 与直接子项，
+重复扫描时只重新列举 mtime 发生变化的目录
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from core.fs_walker import DEFAULT_WORKERS
+from core.system_detector import SystemConfig
+
+
+INDEX_FILE_NAME = "disk_size_index.sqlite3"
+
+
+@dataclass
+class IndexedDir:
+    path: str
+    mtime: float
+    size: int
+    files: list[tuple[str, int]]   # 直接文件 (name, size)
+    dirs: list[str]                # 直接子目录名
+    links: list[str] = field(default_factory=list)   # 直接的符号链接等其它目录项名
+
+
+class SizeIndex:
+    """按路径索引的目录大小缓存；sqlite 出错时静默降级为无缓存"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(SystemConfig.get_config_dir(), INDEX_FILE_NAME)
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dirs ("
+                " path TEXT PRIMARY KEY,"
+                " mtime REAL NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " files TEXT NOT NULL,"
+                " subdirs TEXT NOT NULL,"
+                " links TEXT)"
+            )
+            # 旧版本索引没有 links 列；补上后旧记录的 links 为 NULL，读取时视为未索引
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(dirs)")}
+            if "links" not in columns:
+                conn.execute("ALTER TABLE dirs ADD COLUMN links TEXT")
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def _prefix_range(root: str) -> tuple[str, str]:
+        prefix = os.path.join(root, "")
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def load(self, root: str) -> dict[str, IndexedDir]:
+        """读取 root 之下（不含 root 本身）的全部已索引目录"""
+        low, high = self._prefix_range(root)
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    rows = conn.execute(
+                        "SELECT path, mtime, size, files, subdirs, links FROM dirs WHERE path >= ? AND path < ?",
+                        (low, high),
+                    ).fetchall()
+                finally:
+                    conn.close()
+        except (sqlite3.Error, OSError):
+            return {}
+
+        cached = {}
+        for path, mtime, size, files, subdirs, links in rows:
+            if links is None:
+                continue
+            try:
+                cached[path] = IndexedDir(path, mtime, size,
+                                          [tuple(item) for item in json.loads(files)],
+                                          json.loads(subdirs), json.loads(links))
+            except (ValueError, TypeError):
+                continue
+        return cached
+
+    @staticmethod
+    def validate(cached: dict[str, IndexedDir], workers: Optional[int] = None) -> tuple[set[str], set[str]]:
+        """并行 stat 所有已索引目录，返回 (mtime 未变的目录, mtime 已变的目录)；已消失的目录两者都不含"""
+        def check(item: IndexedDir) -> Optional[bool]:
+            try:
+                return os.stat(item.path).st_mtime == item.mtime
+            except OSError:
+                return None
+
+        unchanged: set[str] = set()
+        changed: set[str] = set()
+        items = list(cached.values())
+        with ThreadPoolExecutor(max_workers=workers or DEFAULT_WORKERS) as pool:
+            for item, same in zip(items, pool.map(check, items, chunksize=256)):
+                if same is True:
+                    unchanged.add(item.path)
+                elif same is False:
+                    changed.add(item.path)
+        return unchanged, changed
+
+    def store(self, root: str, rows: Iterable[IndexedDir], keep: set[str]):
+        """写入/更新 rows，并删除 root 之下不在 keep 中的旧记录"""
+        low, high = self._prefix_range(root)
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO dirs (path, mtime, size, files, subdirs, links) VALUES (?, ?, ?, ?, ?, ?)",
+                            (
+                                (row.path, row.mtime, row.size,
+                                 json.dumps(row.files, ensure_ascii=False),
+                                 json.dumps(row.dirs, ensure_ascii=False),
+                                 json.dumps(row.links, ensure_ascii=False))
+                                for row in rows
+                            ),
+                        )
+                        stale = [
+                            (path,) for (path,) in conn.execute(
+                                "SELECT path FROM dirs WHERE path >= ? AND path < ?", (low, high)
+                            )
+                            if path not in keep
+                        ]
+                        conn.executemany("DELETE FROM dirs WHERE path = ?", stale)
+                finally:
+                    conn.close()
+        except (sqlite3.Error, OSError):
+            pass
@@ -0,0 +1,219 @@
+"""
+后台任务管理器
+统一各路由里「task_id → asyncio.Queue」的写法：按任务类型限流的优先级工作池、
+取消令牌、无人读取队列的 TTL 回收，以及全局任务列表
+"""
+
+import asyncio
+import itertools
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+
+# 各类任务的并发上限；未列出的类型使用 default
+TASK_KIND_LIMITS = {
+    "disk_scan": 2,
+    "cleanup_scan": 1,
+    "cleanup_execute": 1,
+    "cleanup_diagnose": 1,
+    "cleanup_action": 1,
+    "gallery_scan": 2,
+    "download_info": 4,
+    "download": 3,
+    "ffmpeg_install": 1,
+    "default": 2,
+}
+
+# 任务结束后保留的秒数（供重连 / 任务列表查看），到期后连同队列一起回收
+FINISHED_TTL = 600
+
+# 没有 WebSocket 读取时队列最多积压的消息数，超出后丢弃最旧的进度消息
+MAX_BACKLOG = 1000
+
+TERMINAL_TYPES = ("done", "error")
+
+
+class TaskCancelled(Exception):
+    """任务被取消"""
+
+
+class BackgroundTask:
+    """一个后台任务：消息队列 + 取消令牌 + 状态"""
+
+    def __init__(self, kind: str, label: str, priority: int, loop: asyncio.AbstractEventLoop,
+                 task_id: Optional[str] = None):
+        self.task_id = task_id or str(uuid.uuid4())
+        self.kind = kind
+        self.label = label
+        self.priority = priority
+        self.status = "queued"   # queued / running / done / error / cancelled
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.loop = loop
+        self.result: Optional[dict] = None   # 终态消息，供重连时补发
+        self.dropped = 0
+        # 保证「开始执行」与「排队中被取消」二者只发生其一
+        self._start_lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """在任务函数中调用：已取消则抛出 TaskCancelled"""
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+    def _start(self) -> bool:
+        """工作线程取到任务时调用：未取消且尚无终态时标记为 running 并返回 True"""
+        with self._start_lock:
+            if self.cancel_event.is_set() or self.result is not None:
+                return False
+            self.status = "running"
+            self.started_at = time.time()
+            return True
+
+    def emit(self, msg: dict, final: bool = False):
+        """线程安全地推送一条消息；type 为 done / error 或 final=True 时作为终态消息"""
+        self.loop.call_soon_threadsafe(self._put, msg, final)
+
+    def _put(self, msg: dict, final: bool = False):
+        if self.result is not None:
+            return
+        if final or msg.get("type") in TERMINAL_TYPES:
+            self.result = msg
+            self.finished_at = time.time()
+            if msg.get("cancelled"):
+                self.status = "cancelled"
+            else:
+                self.status = "error" if msg.get("type") == "error" else "done"
+        elif self.queue.qsize() >= MAX_BACKLOG:
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(msg)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "task_id": self.task_id,
+            "kind": self.kind,
+            "label": self.label,
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "backlog": self.queue.qsize(),
+            "dropped": self.dropped,
+        }
+
+
+class _KindPool:
+    """某一类任务的有界工作池：优先级高的先执行，同优先级先进先出"""
+
+    def __init__(self, kind: str, limit: int):
+        self.kind = kind
+        self.limit = max(1, limit)
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def put(self, task: BackgroundTask, fn: Callable):
+        self._queue.put((-task.priority, next(self._seq), task, fn))
+        with self._lock:
+            if len(self._threads) < self.limit:
+                thread = threading.Thread(target=self._worker, name=f"task-{self.kind}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _worker(self):
+        while True:
+            _, _, task, fn = self._queue.get()
+            if not task._start():
+                continue
+            try:
+                result = fn(task)
+                task.emit(result if result is not None else {"type": "done"}, final=True)
+            except TaskCancelled:
+                task.emit(_cancelled_message())
+            except Exception as exc:
+                if task.cancelled:
+                    task.emit(_cancelled_message())
+                else:
+                    task.emit({"type": "error", "message": str(exc)})
+
+
+def _cancelled_message() -> dict:
+    return {"type": "error", "message": "任务已取消", "cancelled": True}
+
+
+class TaskManager:
+    """全局后台任务管理器（单例），submit/cancel 需在事件循环线程中调用"""
+
+    _instance = None
+
+    def __init__(self, limits: Optional[dict[str, int]] = None, finished_ttl: float = FINISHED_TTL):
+        self.limits = dict(TASK_KIND_LIMITS, **(limits or {}))
+        self.finished_ttl = finished_ttl
+        self._tasks: dict[str, BackgroundTask] = {}
+        self._pools: dict[str, _KindPool] = {}
+
+    @classmethod
+    def get_instance(cls) -> "TaskManager":
+        if cls._instance is None:
+            cls._instance = TaskManager()
+        return cls._instance
+
+    def submit(self, kind: str, fn: Callable[[BackgroundTask], Optional[dict]], *,
+               label: str = "", priority: int = 0, task_id: Optional[str] = None) -> BackgroundTask:
+        """
+        提交任务：fn(task) 在该类型的工作池中执行，返回值作为终态消息推送
+        （返回 None 时推送 {"type": "done"}）；抛出的异常转为 error 消息。
+        task_id 可由调用方预先生成，便于在任务开始前登记自己的记录
+        """
+        self.evict_finished()
+        task = BackgroundTask(kind, label, priority, asyncio.get_running_loop(), task_id)
+        self._tasks[task.task_id] = task
+        pool = self._pools.get(kind)
+        if pool is None:
+            pool = self._pools[kind] = _KindPool(kind, self.limits.get(kind, self.limits["default"]))
+        pool.put(task, fn)
+        return task
+
+    def get(self, task_id: str) -> Optional[BackgroundTask]:
+        return self._tasks.get(task_id)
+
+    def cancel(self, task_id: str) -> bool:
+        task = self._tasks.get(task_id)
+        if task is None:
+            return False
+        with task._start_lock:
+            task.cancel_event.set()
+            if task.status == "queued":
+                # 还没开始执行：直接给出终态，工作线程取到时会跳过
+                task._put(_cancelled_message())
+        return True
+
+    def list(self, kind: Optional[str] = None) -> list[dict[str, Any]]:
+        self.evict_finished()
+        return [
+            task.to_dict()
+            for task in sorted(self._tasks.values(), key=lambda t: t.created_at)
+            if kind is None or task.kind == kind
+        ]
+
+    def evict_finished(self):
+        """回收已结束超过 TTL 的任务（含从未被 WebSocket 读取的孤儿队列）"""
+        now = time.time()
+        expired = [
+            task_id for task_id, task in self._tasks.items()
+            if task.finished_at is not None and now - task.finished_at > self.finished_ttl
+        ]
+        for task_id in expired:
+            self._tasks.pop(task_id, None)
@@ -1,11 +1,17 @@
 import { api, createWs } from './client.js'
 
 export const cleanupApi = {
-  diagnose:    ()           => api.get('/api/cleanup/diagnose'),
-  runAction:   (action)     => api.post('/api/cleanup/diagnose/action', { body: { action } }),
+  diagnose:    (refresh = false) => api.get('/api/cleanup/diagnose', { params: { refresh } }),
+  startDiagnose: (refresh = false) => api.post('/api/cleanup/diagnose/start', { params: { refresh } }),
+  diagnoseWs:  (taskId)     => createWs(`/api/cleanup/diagnose/ws/${taskId}`),
+  runAction:   (action, dryRun = false) => api.post('/api/cleanup/diagnose/action', { body: { action, dry_run: dryRun } }),
+  startAction: (action, dryRun = false) => api.post('/api/cleanup/diagnose/action/start', { body: { action, dry_run: dryRun } }),
+  actionWs:    (taskId)     => createWs(`/api/cleanup/diagnose/action/ws/${taskId}`),
   listRules:   ()           => api.get('/api/cleanup/rules'),
-  startScan:   (ruleNames)  => api.post('/api/cleanup/scan',    { body: { rule_names: ruleNames } }),
+  startScan:   (ruleNames, force = false) => api.post('/api/cleanup/scan', { body: { rule_names: ruleNames, force } }),
   scanWs:      (taskId)     => createWs(`/api/cleanup/scan/ws/${taskId}`),
   startExecute:(paths)      => api.post('/api/cleanup/execute', { body: { paths } }),
   executeWs:   (taskId)     => createWs(`/api/cleanup/execute/ws/${taskId}`),
+  getArtifactSettings:    ()     => api.get('/api/cleanup/artifact-settings'),
+  updateArtifactSettings: (data) => api.put('/api/cleanup/artifact-settings', { body: data }),
 }
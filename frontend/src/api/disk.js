@@ -1,6 +1,7 @@
 import { api, createWs } from './client.js'
 
 export const diskApi = {
-  startScan: (path) => api.post('/api/disk/scan', { body: { path } }),
+  startScan: (path, refresh = false) => api.post('/api/disk/scan', { body: { path, refresh } }),
   openWs:    (taskId) => createWs(`/api/disk/ws/${taskId}`),
+  getTree:   (taskId, path, limit = 50) => api.get(`/api/disk/tree/${taskId}`, { params: { path, limit } }),
 }
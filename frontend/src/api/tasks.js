@@ -0,0 +1,6 @@
+import { api } from './client.js'
+
+export const tasksApi = {
+  list:   (kind)   => api.get('/api/tasks', { params: kind ? { kind } : undefined }),
+  cancel: (taskId) => api.post(`/api/tasks/${taskId}/cancel`),
+}